@@ -6,13 +6,23 @@ Sử dụng Playwright để tải trang và trích xuất tất cả ảnh tron
 import asyncio
 import json
 import os
-import random
 from datetime import datetime
 from typing import Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
 from playwright.async_api import async_playwright, Browser
 
+from browser_pool import BrowserPool
+from crawl_journal import CrawlJournal
+from http_fetcher import HTTP_AVAILABLE, HttpFetcher
+from page_ready import scroll_and_wait, wait_for_count_stable, wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, limited_goto, rate_from_delay
+from refresh_store import RECORD_UNCHANGED, RefreshStore, check_not_modified, fetched_validators
+from resource_blocker import ResourceBlocker
+
+if HTTP_AVAILABLE:
+    from html_parsers import parse_album_images
+
 
 class AlbumCrawler:
     def __init__(
@@ -20,29 +30,54 @@ class AlbumCrawler:
         delay_min: float = 1.0,
         delay_max: float = 2.5,
         headless: bool = False,  # mở Chrome thật khi cần debug
+        pool_size: int = 5,  # số page dùng chung tối đa
+        block_resources: bool = False,  # chặn ảnh/font/video/tracker
+        use_http: bool = True,  # fetch HTML bằng httpx, chỉ mở browser khi cần
     ):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.delay_min = delay_min
         self.delay_max = delay_max
         self.headless = headless
+        self.pool_size = pool_size
+        self.block_resources = block_resources
+        self.browser_lock = asyncio.Lock()
+        # delay_min/delay_max chỉ là tốc độ ban đầu, rate limiter tự điều chỉnh sau đó
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
+        self.fetcher: Optional[HttpFetcher] = None
+        if use_http and HTTP_AVAILABLE:
+            self.fetcher = HttpFetcher(max_connections=pool_size * 2, rate_limiter=self.rate_limiter)
 
     async def init_browser(self):
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
+                )
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=self.pool_size,
+                    blocker=ResourceBlocker.for_crawler("album") if self.block_resources else None,
+                )
         return self.browser
 
     async def close_browser(self):
         try:
+            if self.fetcher:
+                await self.fetcher.close()
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
 
     async def crawl_album_images(self, url: str) -> Dict:
         """
@@ -60,20 +95,32 @@ class AlbumCrawler:
         Returns:
             Dict chứa thông tin album và danh sách ảnh
         """
+        # Fast path: lấy src/data-src từ HTML, không cần browser
+        if self.fetcher:
+            html = await self.fetcher.fetch(url)
+            if html is not None:
+                album = parse_album_images(html, url)
+                if album:
+                    print(f"✅ [HTTP] Thu được {len(album['images'])} ảnh từ album")
+                    return {
+                        "url": url,
+                        "title": album["title"],
+                        "description": album["description"],
+                        "images": album["images"],
+                        "total_images": len(album["images"]),
+                        "crawled_at": datetime.now().isoformat(),
+                    }
+                print("⚠️  Không tìm thấy ảnh trong HTML, fallback Playwright...")
+
         await self.init_browser()
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
             print(f"🔍 Đang crawl album: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(1)  # Giảm thời gian chờ
+            await limited_goto(page, url, self.rate_limiter, wait_until="domcontentloaded", timeout=30000)
+            # Đợi ảnh có trong DOM và số lượng ngừng tăng (thay cho sleep cố định)
+            if await wait_for_selector_or_fallback(page, "img", timeout=10000, fallback_ms=1000):
+                await wait_for_count_stable(page, "img", timeout=2000)
 
             # Lấy thông tin album (title, description, etc.)
             album_info = await page.evaluate(
@@ -175,8 +222,7 @@ class AlbumCrawler:
             if len(images) < 10:  # Nếu có ít ảnh, thử scroll
                 print("📜 Đang scroll để load thêm ảnh...")
                 for i in range(3):  # Giảm số lần scroll
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-                    await page.wait_for_timeout(1000)  # Giảm thời gian chờ
+                    await scroll_and_wait(page, "img", timeout=1000)
                     
                     # Lấy lại danh sách ảnh sau khi scroll
                     new_images = await page.evaluate(
@@ -237,7 +283,7 @@ class AlbumCrawler:
                 "total_images": 0,
             }
         finally:
-            await page.close()
+            await self.pool.release(page)
 
     def save_to_json(self, data: Dict, filename: Optional[str] = None, output_folder: Optional[str] = None) -> str:
         """Lưu dữ liệu album vào file JSON. Mỗi album = 1 file JSON riêng."""
@@ -270,10 +316,17 @@ class AlbumCrawler:
         print(f"💾 Đã lưu album vào: {filepath}")
         return filepath
 
-    async def crawl_single_album(self, url: str, idx: int, total: int, output_folder: str) -> Dict:
-        """Crawl một album đơn lẻ."""
+    async def crawl_single_album(self, url: str, idx: int, total: int, output_folder: str, refresh: Optional[RefreshStore] = None) -> Dict:
+        """Crawl một album đơn lẻ (refresh: bỏ qua album 304 / không đổi so với lần trước)."""
         try:
             print(f"📦 Album {idx}/{total}: {url}")
+            validators = {}
+            if refresh:
+                not_modified, validators = await check_not_modified(refresh, self.fetcher, url)
+                if not_modified:
+                    print(f"⏭️  Album {idx}/{total} không đổi (304)")
+                    return {"url": url, "success": True, "unchanged": True, "total_images": 0}
+
             album_data = await self.crawl_album_images(url)
             
             if album_data.get("error"):
@@ -283,6 +336,14 @@ class AlbumCrawler:
                     "success": False,
                     "error": album_data.get("error"),
                 }
+            elif refresh and refresh.commit(url, album_data, validators or fetched_validators(self.fetcher, url)) == RECORD_UNCHANGED:
+                print(f"⏭️  Album {idx}/{total} không đổi")
+                return {
+                    "url": url,
+                    "success": True,
+                    "unchanged": True,
+                    "total_images": album_data.get("total_images", 0),
+                }
             else:
                 filepath = self.save_to_json(album_data, output_folder=output_folder)
                 return {
@@ -299,7 +360,7 @@ class AlbumCrawler:
                 "error": str(e),
             }
 
-    async def crawl_multiple_albums(self, urls: List[str], output_folder: Optional[str] = None, max_concurrent: int = 3) -> List[Dict]:
+    async def crawl_multiple_albums(self, urls: List[str], output_folder: Optional[str] = None, max_concurrent: int = 3, journal_file: Optional[str] = None, refresh_db: Optional[str] = None) -> List[Dict]:
         """
         Crawl nhiều album, mỗi album lưu thành 1 file JSON riêng.
         Hỗ trợ crawl đồng thời để tăng tốc độ.
@@ -308,10 +369,30 @@ class AlbumCrawler:
             urls: Danh sách URL các album cần crawl
             output_folder: Tên folder để lưu các album (tùy chọn)
             max_concurrent: Số lượng album crawl đồng thời (mặc định: 3)
+            journal_file: File SQLite journal (None = không dùng). Album đã crawl xong
+                          ở lần chạy trước sẽ được bỏ qua, album lỗi được thử lại có giới hạn
+            refresh_db: File SQLite của chế độ refresh (None = tắt). Album không đổi không
+                        ghi lại file; album mới / thay đổi ghi thêm vào data/albums_delta_<timestamp>.jsonl
             
         Returns:
             Danh sách kết quả crawl của từng album
         """
+        # Journal: bỏ qua album đã xong / đã hết lượt thử từ các lần chạy trước
+        journal = None
+        if journal_file:
+            journal = CrawlJournal(journal_file)
+            journal.print_progress("Journal trước khi chạy")
+            before_count = len(urls)
+            urls = [url for url in urls if journal.should_crawl(url)]
+            print(f"⏭️  Bỏ qua {before_count - len(urls)} album theo journal, còn {len(urls)} cần crawl")
+
+        # Refresh: chỉ ghi album mới / thay đổi so với lần crawl trước
+        refresh = None
+        if refresh_db:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            delta_file = os.path.join(os.path.dirname(__file__), "data", f"albums_delta_{timestamp}.jsonl")
+            refresh = RefreshStore(refresh_db, delta_file=delta_file)
+
         total = len(urls)
         
         # Tạo folder riêng nếu chưa có
@@ -329,17 +410,30 @@ class AlbumCrawler:
         
         async def crawl_with_semaphore(url: str, idx: int):
             async with semaphore:
-                # Delay ngẫu nhiên nhỏ để tránh quá tải
-                if idx > 1:
-                    delay = random.uniform(self.delay_min, self.delay_max)
-                    await asyncio.sleep(delay)
-                return await self.crawl_single_album(url, idx, total, output_folder)
+                # Không cần delay ở đây: rate limiter giãn request trong crawl_album_images
+                if journal:
+                    journal.mark_started(url)
+                result = await self.crawl_single_album(url, idx, total, output_folder, refresh)
+                if journal:
+                    if result.get("success"):
+                        journal.mark_done(url, result.get("filepath"))
+                    else:
+                        journal.mark_failed(url, result.get("error"))
+                return result
         
         # Tạo tất cả tasks
         tasks = [crawl_with_semaphore(url, idx) for idx, url in enumerate(urls, 1)]
         
         # Chạy tất cả tasks và đợi kết quả
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if journal:
+                journal.print_progress("Journal sau khi chạy")
+                journal.close()
+            if refresh:
+                refresh.print_summary("Refresh album")
+                refresh.close()
         
         # Xử lý exceptions
         processed_results = []
@@ -363,10 +457,33 @@ async def main():
     # Cách 1: Truyền nhiều URL làm tham số
     # python album_crawler.py "url1" "url2" "url3"
     urls = []
+
+    # --journal FILE: SQLite journal để chạy tiếp khi bị dừng giữa chừng
+    journal_file = None
+    argv = sys.argv[1:]
+    if '--journal' in argv:
+        i = argv.index('--journal')
+        if i + 1 < len(argv):
+            journal_file = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+
+    # --refresh FILE: chỉ ghi album mới / thay đổi so với lần crawl trước
+    refresh_db = None
+    if '--refresh' in argv:
+        i = argv.index('--refresh')
+        if i + 1 < len(argv):
+            refresh_db = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+
+    # --block-resources: không tải bytes ảnh/font/video (chỉ cần src của <img>)
+    block_resources = '--block-resources' in argv
+    # --browser-only: tắt fast path HTTP, luôn dùng Playwright
+    use_http = '--browser-only' not in argv
+    argv = [arg for arg in argv if arg not in ('--block-resources', '--browser-only')]
     
-    if len(sys.argv) > 1:
+    if len(argv) > 0:
         # Nếu tham số đầu tiên là file (có extension .txt hoặc .json)
-        first_arg = sys.argv[1]
+        first_arg = argv[0]
         if first_arg.endswith('.txt') or first_arg.endswith('.json'):
             # Đọc danh sách URL từ file
             try:
@@ -387,7 +504,7 @@ async def main():
                 return
         else:
             # Lấy tất cả tham số làm URL
-            urls = sys.argv[1:]
+            urls = argv
     else:
         # URL mặc định để test
         urls = ["https://gaigu1.net/album-anh-sex/24062/m%E1%BB%B9-anh-t%C3%A2y-ninh-nyc-b%E1%BB%93n-ch%E1%BB%A9a-tinh-n%C4%83m-c3"]
@@ -398,17 +515,19 @@ async def main():
         print("  python album_crawler.py <url1> <url2> <url3> ...")
         print("  python album_crawler.py urls.txt  # Đọc từ file txt (mỗi dòng 1 URL)")
         print("  python album_crawler.py urls.json  # Đọc từ file json (array URLs)")
+        print("  python album_crawler.py urls.txt --journal data/albums_journal.sqlite  # Resume")
+        print("  python album_crawler.py urls.txt --refresh data/albums_refresh.sqlite  # Chỉ ghi album thay đổi")
         return
 
     # Bật headless mode và giảm delay để tăng tốc độ
-    crawler = AlbumCrawler(headless=True, delay_min=0.5, delay_max=1.0)
+    crawler = AlbumCrawler(headless=True, delay_min=0.5, delay_max=1.0, pool_size=5, block_resources=block_resources, use_http=use_http)
     try:
         # Tạo tên folder riêng cho batch này
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_folder = f"albums_batch_{timestamp}"
         
         # Crawl với 5 luồng đồng thời để tăng tốc độ
-        results = await crawler.crawl_multiple_albums(urls, output_folder=output_folder, max_concurrent=5)
+        results = await crawler.crawl_multiple_albums(urls, output_folder=output_folder, max_concurrent=5, journal_file=journal_file, refresh_db=refresh_db)
         
         # Tổng kết
         print(f"\n{'='*60}")
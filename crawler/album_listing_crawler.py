@@ -6,7 +6,6 @@ Sử dụng Playwright để crawl nhiều trang và trích xuất tất cả li
 import asyncio
 import json
 import os
-import random
 import re
 from datetime import datetime
 from typing import List, Optional, Set
@@ -14,6 +13,20 @@ from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlunparse
 
 from playwright.async_api import async_playwright, Browser
 
+from browser_pool import BrowserPool, DEFAULT_HEADERS
+from http_fetcher import HTTP_AVAILABLE, HttpFetcher
+from page_ready import scroll_and_wait, wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, limited_goto, rate_from_delay
+from resource_blocker import ResourceBlocker
+
+if HTTP_AVAILABLE:
+    from html_parsers import parse_album_links
+
+# Link album trên trang listing (dùng để biết trang đã render xong)
+ALBUM_LINK_SELECTOR = 'a[href*="/album-anh-sex/"]'
+# Crawl song song: dừng khi có chừng này trang liên tiếp tải được nhưng không có link mới
+EMPTY_PAGES_TO_STOP = 2
+
 
 class AlbumListingCrawler:
     def __init__(
@@ -21,29 +34,54 @@ class AlbumListingCrawler:
         delay_min: float = 1.0,
         delay_max: float = 2.5,
         headless: bool = False,
+        pool_size: int = 3,  # số page dùng chung tối đa
+        block_resources: bool = False,  # chặn ảnh/font/video/tracker
+        use_http: bool = True,  # fetch HTML bằng httpx, chỉ mở browser khi cần
     ):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.delay_min = delay_min
         self.delay_max = delay_max
         self.headless = headless
+        self.pool_size = pool_size
+        self.block_resources = block_resources
+        self.browser_lock = asyncio.Lock()
+        # delay_min/delay_max chỉ là tốc độ ban đầu, rate limiter tự điều chỉnh sau đó
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
+        self.fetcher: Optional[HttpFetcher] = None
+        if use_http and HTTP_AVAILABLE:
+            self.fetcher = HttpFetcher(max_connections=pool_size * 2, rate_limiter=self.rate_limiter)
 
     async def init_browser(self):
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
+                )
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=self.pool_size,
+                    blocker=ResourceBlocker.for_crawler("album_listing") if self.block_resources else None,
+                )
         return self.browser
 
     async def close_browser(self):
         try:
+            if self.fetcher:
+                await self.fetcher.close()
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
 
     async def extract_album_links_from_page(self, page, base_url: str) -> Set[str]:
         """
@@ -131,6 +169,21 @@ class AlbumListingCrawler:
             print(f"⚠️  Không tìm thấy pagination: {e}")
             return 1
 
+    async def _fetch_album_links_http(self, page_url: str) -> Optional[Set[str]]:
+        """Lấy link album bằng HTTP thuần
+
+        Returns:
+            Set link album, hoặc None nếu cần fallback Playwright
+        """
+        if not self.fetcher:
+            return None
+        html = await self.fetcher.fetch(page_url)
+        if html is None:
+            return None
+        links = parse_album_links(html, page_url)
+        # Trang listing SSR luôn có link album; rỗng thường là trang render bằng JS
+        return links or None
+
     async def crawl_listing_page(self, url: str, page_num: Optional[int] = None) -> Set[str]:
         """
         Crawl một trang listing để lấy các link album.
@@ -140,41 +193,38 @@ class AlbumListingCrawler:
             page_num: Số trang (nếu None thì crawl trang hiện tại)
             
         Returns:
-            Set các URL album
+            Set các URL album, None nếu tải trang lỗi (khác với trang rỗng)
         """
+        # Xây dựng URL với page number nếu có
+        if page_num and page_num > 1:
+            # Format mới: luôn dùng ?page=2
+            parsed = urlparse(url)
+            query_params = parse_qs(parsed.query)
+            query_params['page'] = [str(page_num)]
+            new_query = urlencode(query_params, doseq=True)
+            page_url = urlunparse((
+                parsed.scheme, parsed.netloc, parsed.path,
+                parsed.params, new_query, parsed.fragment
+            ))
+        else:
+            page_url = url
+
+        # Fast path: HTTP + lxml
+        album_links = await self._fetch_album_links_http(page_url)
+        if album_links is not None:
+            print(f"  ✅ [HTTP] {page_url}: {len(album_links)} album link(s)")
+            return album_links
+
         await self.init_browser()
-        page = await self.browser.new_page()
-        
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
-            # Xây dựng URL với page number nếu có
-            if page_num and page_num > 1:
-                # Format mới: luôn dùng ?page=2
-                parsed = urlparse(url)
-                query_params = parse_qs(parsed.query)
-                query_params['page'] = [str(page_num)]
-                new_query = urlencode(query_params, doseq=True)
-                page_url = urlunparse((
-                    parsed.scheme, parsed.netloc, parsed.path,
-                    parsed.params, new_query, parsed.fragment
-                ))
-            else:
-                page_url = url
-
             print(f"🔍 Đang crawl trang: {page_url}")
-            await page.goto(page_url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)  # Đợi trang load đầy đủ
+            await limited_goto(page, page_url, self.rate_limiter, wait_until="domcontentloaded", timeout=60000)
+            await wait_for_selector_or_fallback(page, ALBUM_LINK_SELECTOR, timeout=15000, fallback_ms=2000)
 
             # Scroll để load lazy content
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-            await page.wait_for_timeout(1500)
+            await scroll_and_wait(page, ALBUM_LINK_SELECTOR, timeout=1500)
 
             # Trích xuất link album
             album_links = await self.extract_album_links_from_page(page, page_url)
@@ -184,15 +234,82 @@ class AlbumListingCrawler:
 
         except Exception as e:
             print(f"❌ Lỗi crawl trang {page_url}: {e}")
-            return set()
+            return None
+        finally:
+            await self.pool.release(page)
+
+    async def _crawl_pages_concurrently(
+        self,
+        base_url: str,
+        page_nums: List[int],
+        all_links: Set[str],
+        concurrency: int,
+        start_page: int = 1,
+    ):
+        """
+        Crawl nhiều trang ?page=N bằng `concurrency` worker, merge link vào all_links
+        ngay khi mỗi trang xong. EMPTY_PAGES_TO_STOP trang liên tiếp không có link mới → dừng các worker.
+        Trang lỗi (timeout, 5xx...) chỉ được ghi lại, không tính là trang rỗng.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for page_num in page_nums:
+            queue.put_nowait(page_num)
+        stop = asyncio.Event()
+        total_pages = page_nums[-1] if page_nums else 0
+        empty_pages: Set[int] = set()
+        failed_pages: List[int] = []
+
+        def empty_run(page_num: int) -> int:
+            """Độ dài dãy trang rỗng liên tiếp chứa page_num (các trang xong không theo thứ tự)"""
+            low = page_num
+            while low - 1 in empty_pages:
+                low -= 1
+            high = page_num
+            while high + 1 in empty_pages:
+                high += 1
+            return high - low + 1
+
+        async def worker():
+            while not stop.is_set():
+                try:
+                    page_num = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                # Không cần delay: rate limiter giãn request giữa các worker
+                page_links = await self.crawl_listing_page(base_url, page_num)
+                if page_links is None:
+                    failed_pages.append(page_num)
+                    continue
+                before_count = len(all_links)
+                all_links.update(page_links)
+                new_count = len(all_links) - before_count
+
+                print(f"  ✅ Trang {page_num}/{total_pages}: {len(page_links)} album(s), mới: {new_count}, tổng: {len(all_links)}")
+
+                # Nhiều trang liên tiếp không có link mới thì có thể đã hết → báo các worker khác dừng
+                if new_count == 0 and page_num > start_page + 2:
+                    empty_pages.add(page_num)
+                    if empty_run(page_num) >= EMPTY_PAGES_TO_STOP and not stop.is_set():
+                        print(f"⚠️  {EMPTY_PAGES_TO_STOP} trang liên tiếp không có link mới (tới trang {page_num}), có thể đã hết. Dừng crawl.")
+                        stop.set()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(page_nums)))]
+        try:
+            await asyncio.gather(*workers)
         finally:
-            await page.close()
+            for task in workers:
+                task.cancel()
+
+        if failed_pages:
+            print(f"⚠️  {len(failed_pages)} trang lỗi, chưa lấy được link: {sorted(failed_pages)}")
 
     async def crawl_all_albums(
         self, 
         base_url: str, 
         max_pages: Optional[int] = None,
-        start_page: int = 1
+        start_page: int = 1,
+        concurrency: int = 1,
     ) -> List[str]:
         """
         Crawl tất cả album từ trang listing, có thể crawl nhiều trang.
@@ -201,28 +318,22 @@ class AlbumListingCrawler:
             base_url: URL trang listing (ví dụ: https://gaigu1.net/anh-sex)
             max_pages: Số trang tối đa để crawl (None = crawl tất cả)
             start_page: Trang bắt đầu crawl
+            concurrency: Số trang crawl đồng thời (1 = tuần tự như cũ,
+                         thực tế bị giới hạn bởi pool_size)
             
         Returns:
             Danh sách tất cả URL album (đã loại bỏ duplicate)
         """
         await self.init_browser()
-        page = await self.browser.new_page()
-        
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         all_links: Set[str] = set()
         
         try:
             # Crawl trang đầu tiên để lấy thông tin pagination
             print(f"🔍 Đang crawl trang đầu tiên: {base_url}")
-            await page.goto(base_url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)
+            await limited_goto(page, base_url, self.rate_limiter, wait_until="domcontentloaded", timeout=60000)
+            await wait_for_selector_or_fallback(page, ALBUM_LINK_SELECTOR, timeout=15000, fallback_ms=2000)
             
             # Lấy link từ trang đầu
             first_page_links = await self.extract_album_links_from_page(page, base_url)
@@ -236,61 +347,65 @@ class AlbumListingCrawler:
             
             print(f"📄 Tổng số trang cần crawl: {total_pages}")
 
-            # Crawl các trang tiếp theo
-            for page_num in range(start_page + 1, total_pages + 1):
-                await page.close()  # Đóng page cũ
-                page = await self.browser.new_page()  # Tạo page mới
-                await page.set_extra_http_headers(
-                    {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                        "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                        "Referer": base_url,
-                    }
+            # Đã biết tổng số trang → fan out ?page=N cho nhiều worker
+            if concurrency > 1:
+                await self.pool.release(page)
+                page = None
+                print(f"🔄 Crawl song song {concurrency} trang cùng lúc")
+                await self._crawl_pages_concurrently(
+                    base_url,
+                    list(range(start_page + 1, total_pages + 1)),
+                    all_links,
+                    concurrency,
+                    start_page,
                 )
+            else:
+                # Crawl các trang tiếp theo
+                # Các trang tiếp theo dùng lại cùng 1 page, chỉ đổi Referer một lần
+                await self.pool.release(page)
+                page = await self.pool.acquire({**DEFAULT_HEADERS, "Referer": base_url})
+
+                for page_num in range(start_page + 1, total_pages + 1):
+                    # Xây dựng URL trang - Format mới: luôn dùng ?page=2
+                    parsed = urlparse(base_url)
+                    query_params = parse_qs(parsed.query)
+                    query_params['page'] = [str(page_num)]
+                    new_query = urlencode(query_params, doseq=True)
+                    page_url = urlunparse((
+                        parsed.scheme, parsed.netloc, parsed.path,
+                        parsed.params, new_query, parsed.fragment
+                    ))
+
+                    try:
+                        print(f"🔍 Đang crawl trang {page_num}/{total_pages}: {page_url}")
+                        page_links = await self._fetch_album_links_http(page_url)
+                        if page_links is None:
+                            await limited_goto(page, page_url, self.rate_limiter, wait_until="domcontentloaded", timeout=60000)
+                            await wait_for_selector_or_fallback(page, ALBUM_LINK_SELECTOR, timeout=15000, fallback_ms=2000)
+
+                            # Scroll để load lazy content
+                            await scroll_and_wait(page, ALBUM_LINK_SELECTOR, timeout=1500)
+
+                            # Trích xuất link
+                            page_links = await self.extract_album_links_from_page(page, page_url)
+                        before_count = len(all_links)
+                        all_links.update(page_links)
+                        new_count = len(all_links) - before_count
+                        
+                        print(f"  ✅ Trang {page_num}: {len(page_links)} album(s), mới: {new_count}, tổng: {len(all_links)}")
 
-                # Xây dựng URL trang - Format mới: luôn dùng ?page=2
-                parsed = urlparse(base_url)
-                query_params = parse_qs(parsed.query)
-                query_params['page'] = [str(page_num)]
-                new_query = urlencode(query_params, doseq=True)
-                page_url = urlunparse((
-                    parsed.scheme, parsed.netloc, parsed.path,
-                    parsed.params, new_query, parsed.fragment
-                ))
-
-                try:
-                    print(f"🔍 Đang crawl trang {page_num}/{total_pages}: {page_url}")
-                    await page.goto(page_url, wait_until="networkidle", timeout=60000)
-                    await asyncio.sleep(2)
-                    
-                    # Scroll để load lazy content
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-                    await page.wait_for_timeout(1500)
-
-                    # Trích xuất link
-                    page_links = await self.extract_album_links_from_page(page, page_url)
-                    before_count = len(all_links)
-                    all_links.update(page_links)
-                    new_count = len(all_links) - before_count
-                    
-                    print(f"  ✅ Trang {page_num}: {len(page_links)} album(s), mới: {new_count}, tổng: {len(all_links)}")
-
-                    # Nếu không có link mới nào thì có thể đã hết
-                    if new_count == 0 and page_num > start_page + 2:
-                        print(f"⚠️  Không có link mới ở trang {page_num}, có thể đã hết. Dừng crawl.")
-                        break
-
-                    # Delay giữa các trang
-                    if page_num < total_pages:
-                        delay = random.uniform(self.delay_min, self.delay_max)
-                        await asyncio.sleep(delay)
+                        # Nếu không có link mới nào thì có thể đã hết
+                        if new_count == 0 and page_num > start_page + 2:
+                            print(f"⚠️  Không có link mới ở trang {page_num}, có thể đã hết. Dừng crawl.")
+                            break
 
-                except Exception as e:
-                    print(f"❌ Lỗi crawl trang {page_num}: {e}")
-                    continue
+                    except Exception as e:
+                        print(f"❌ Lỗi crawl trang {page_num}: {e}")
+                        continue
 
         finally:
-            await page.close()
+            if page:
+                await self.pool.release(page)
 
         # Chuyển từ Set sang List và sắp xếp
         result = sorted(list(all_links))
@@ -339,6 +454,12 @@ async def main():
     max_pages = 32  # Mặc định chỉ crawl 32 trang
     start_page = 1
 
+    # --block-resources: chặn ảnh/font/video/tracker (bỏ khỏi tham số vị trí)
+    block_resources = '--block-resources' in sys.argv
+    # --browser-only: tắt fast path HTTP, luôn dùng Playwright
+    use_http = '--browser-only' not in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg not in ('--block-resources', '--browser-only')]
+
     if len(sys.argv) > 1:
         base_url = sys.argv[1]
     if len(sys.argv) > 2:
@@ -351,18 +472,27 @@ async def main():
             start_page = int(sys.argv[3])
         except ValueError:
             pass
+    concurrency = 1  # Số trang crawl song song (tham số thứ 4)
+    if len(sys.argv) > 4:
+        try:
+            concurrency = int(sys.argv[4])
+        except ValueError:
+            pass
 
-    crawler = AlbumListingCrawler(headless=False, delay_min=1.5, delay_max=3.0)
+    crawler = AlbumListingCrawler(headless=False, delay_min=1.5, delay_max=3.0, pool_size=max(3, concurrency), block_resources=block_resources, use_http=use_http)
     try:
         print(f"\n🚀 Bắt đầu crawl album links từ: {base_url}")
         if max_pages:
             print(f"📄 Số trang tối đa: {max_pages}")
+        if concurrency > 1:
+            print(f"🔄 Số trang crawl song song: {concurrency}")
         print(f"{'='*60}\n")
 
         links = await crawler.crawl_all_albums(
             base_url=base_url,
             max_pages=max_pages,
-            start_page=start_page
+            start_page=start_page,
+            concurrency=concurrency
         )
 
         # Lưu vào cả 2 format
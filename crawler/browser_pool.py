@@ -0,0 +1,143 @@
+"""
+Pool các page Playwright dùng chung cho tất cả crawler.
+Giữ sẵn page "ấm" (mỗi page 1 context riêng) để không phải new_page() +
+set headers lại cho từng URL, và tái tạo page sau N lần navigate.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+from playwright.async_api import Browser, Page
+
+from resource_blocker import ResourceBlocker
+
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Headers chung của các crawler album / chat sex / review
+DEFAULT_HEADERS = {
+    "User-Agent": DEFAULT_USER_AGENT,
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Referer": "https://gaigu1.net/",
+}
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        browser: Browser,
+        size: int = 3,
+        max_uses: int = 50,
+        headers: Optional[Dict[str, str]] = None,
+        reset_cookies: bool = True,
+        blocker: Optional[ResourceBlocker] = None,
+    ):
+        """
+        Args:
+            browser: Browser Playwright đã launch
+            size: Số page tối đa được mượn cùng lúc
+            max_uses: Số lần sử dụng trước khi đóng page/context và tạo mới
+            headers: Headers mặc định cho page (dùng khi acquire() không truyền headers)
+            reset_cookies: Xóa cookie của context mỗi khi trả page về pool
+            blocker: Nếu có, chặn ảnh/font/video/tracker ở mọi context do pool tạo ra
+        """
+        self.browser = browser
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.reset_cookies = reset_cookies
+        self.blocker = blocker
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.size)
+        self._uses: Dict[Page, int] = {}
+        self._page_headers: Dict[Page, Dict[str, str]] = {}
+        self._closed = False
+
+    async def _new_page(self) -> Page:
+        """Tạo context + page mới với headers mặc định"""
+        context = await self.browser.new_context()
+        if self.blocker:
+            await self.blocker.attach(context)
+        page = await context.new_page()
+        await page.set_extra_http_headers(self.headers)
+        self._uses[page] = 0
+        self._page_headers[page] = self.headers
+        return page
+
+    async def _dispose(self, page: Page):
+        """Đóng hẳn page (và context của nó)"""
+        self._uses.pop(page, None)
+        self._page_headers.pop(page, None)
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    async def acquire(self, headers: Optional[Dict[str, str]] = None) -> Page:
+        """Mượn 1 page từ pool (đợi nếu đã đủ `size` page đang được dùng)
+
+        Args:
+            headers: Bộ headers đầy đủ cho lần dùng này (None = headers mặc định).
+                     Chỉ gọi set_extra_http_headers khi khác với headers hiện tại của page.
+        """
+        if self._closed:
+            raise RuntimeError("BrowserPool đã đóng")
+
+        await self._slots.acquire()
+        try:
+            page = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.is_closed():
+                    await self._dispose(candidate)
+                    continue
+                page = candidate
+                break
+
+            if page is None:
+                page = await self._new_page()
+
+            wanted = headers if headers is not None else self.headers
+            if self._page_headers.get(page) != wanted:
+                await page.set_extra_http_headers(wanted)
+                self._page_headers[page] = wanted
+            return page
+        except Exception:
+            self._slots.release()
+            raise
+
+    async def release(self, page: Page, discard: bool = False):
+        """Trả page về pool
+
+        Args:
+            page: Page đã mượn bằng acquire()
+            discard: True để đóng hẳn page (ví dụ page bị lỗi/captcha)
+        """
+        try:
+            self._uses[page] = self._uses.get(page, 0) + 1
+            if discard or self._closed or page.is_closed() or self._uses[page] >= self.max_uses:
+                await self._dispose(page)
+                return
+
+            # Reset trạng thái trước khi cho lần dùng tiếp theo
+            try:
+                if self.reset_cookies:
+                    await page.context.clear_cookies()
+                await page.goto('about:blank')
+            except Exception:
+                await self._dispose(page)
+                return
+
+            self._idle.put_nowait(page)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """Đóng tất cả page đang rảnh trong pool"""
+        self._closed = True
+        while not self._idle.empty():
+            await self._dispose(self._idle.get_nowait())
+        for page in list(self._uses):
+            await self._dispose(page)
+        if self.blocker and self.blocker.summary():
+            print(self.blocker.summary())
@@ -6,13 +6,18 @@ Sử dụng Playwright để tải trang và trích xuất thông tin.
 import asyncio
 import json
 import os
-import random
 from datetime import datetime
 from typing import Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
 from playwright.async_api import async_playwright, Browser
 
+from browser_pool import BrowserPool
+from page_ready import wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, limited_goto, rate_from_delay
+from resource_blocker import ResourceBlocker
+from work_queue import run_work_queue
+
 
 class ChatSexDetailCrawler:
     def __init__(
@@ -20,29 +25,48 @@ class ChatSexDetailCrawler:
         delay_min: float = 0.3,
         delay_max: float = 0.8,
         headless: bool = True,
+        pool_size: int = 5,  # số page dùng chung tối đa (nên >= batch_size)
+        block_resources: bool = False,  # chặn ảnh/font/video/tracker
     ):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.delay_min = delay_min
         self.delay_max = delay_max
         self.headless = headless
+        self.pool_size = pool_size
+        self.block_resources = block_resources
+        self.browser_lock = asyncio.Lock()
+        # delay_min/delay_max chỉ là tốc độ ban đầu, rate limiter tự điều chỉnh sau đó
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
 
     async def init_browser(self):
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
+                )
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=self.pool_size,
+                    blocker=ResourceBlocker.for_crawler("chat_sex") if self.block_resources else None,
+                )
         return self.browser
 
     async def close_browser(self):
         try:
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
 
     async def crawl_chat_sex_detail(self, url: str) -> Dict:
         """
@@ -55,19 +79,12 @@ class ChatSexDetailCrawler:
             Dict chứa thông tin chi tiết
         """
         await self.init_browser()
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
             print(f"🔍 Đang crawl: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=20000)
-            await asyncio.sleep(random.uniform(self.delay_min, self.delay_max))
+            await limited_goto(page, url, self.rate_limiter, wait_until="domcontentloaded", timeout=20000)
+            await wait_for_selector_or_fallback(page, "h1", timeout=8000, fallback_ms=500)
 
             # Lấy thông tin chi tiết từ container XPath: /html/body/div[5]/div[4]/div[3]
             detail_info = await page.evaluate(
@@ -342,7 +359,7 @@ class ChatSexDetailCrawler:
                 'crawled_at': datetime.now().isoformat()
             }
         finally:
-            await page.close()
+            await self.pool.release(page)
 
     async def crawl_multiple(self, urls: List[str], output_dir: str = "data/chat_sex_details", batch_size: int = 5) -> List[Dict]:
         """
@@ -351,51 +368,47 @@ class ChatSexDetailCrawler:
         Args:
             urls: List các URL cần crawl
             output_dir: Thư mục để lưu file JSON
-            batch_size: Số request đồng thời
+            batch_size: Số request đồng thời (số worker của hàng đợi)
             
         Returns:
-            List các dict chứa thông tin chi tiết
+            List các dict chứa thông tin chi tiết (theo thứ tự urls)
         """
         os.makedirs(output_dir, exist_ok=True)
-        results = []
-        
-        # Crawl theo batch để tăng tốc
-        for batch_start in range(0, len(urls), batch_size):
-            batch_end = min(batch_start + batch_size, len(urls))
-            batch_urls = urls[batch_start:batch_end]
-            
-            print(f"[{batch_start + 1}-{batch_end}/{len(urls)}] Đang crawl batch {batch_start // batch_size + 1}...")
-            
-            # Crawl đồng thời trong batch
-            batch_tasks = [self.crawl_chat_sex_detail(url) for url in batch_urls]
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            
-            for idx, (url, detail) in enumerate(zip(batch_urls, batch_results)):
-                if isinstance(detail, Exception):
-                    print(f"   ❌ Lỗi {url}: {detail}")
-                    detail = {'url': url, 'error': str(detail), 'crawled_at': datetime.now().isoformat()}
-                
-                results.append(detail)
-                
-                # Lưu từng file riêng
-                if 'error' not in detail:
-                    filename = url.split('/')[-1] or url.split('/')[-2]
-                    filename = filename.replace('/', '_').replace('?', '_')
-                    output_file = os.path.join(output_dir, f"chat_sex_{filename}.json")
-                    with open(output_file, "w", encoding="utf-8") as f:
-                        json.dump(detail, f, ensure_ascii=False, indent=2)
-            
-            # Delay ngắn giữa các batch
-            if batch_end < len(urls):
-                await asyncio.sleep(0.5)
-        
-        return results
+        results: Dict[int, Dict] = {}
+        total = len(urls)
+
+        def save_result(item, detail):
+            idx, url = item
+            if isinstance(detail, Exception):
+                print(f"   ❌ Lỗi {url}: {detail}")
+                detail = {'url': url, 'error': str(detail), 'crawled_at': datetime.now().isoformat()}
+
+            results[idx] = detail
+            print(f"[{len(results)}/{total}] Xong: {url}")
+
+            # Lưu từng file riêng ngay khi item xong
+            if 'error' not in detail:
+                filename = url.split('/')[-1] or url.split('/')[-2]
+                filename = filename.replace('/', '_').replace('?', '_')
+                output_file = os.path.join(output_dir, f"chat_sex_{filename}.json")
+                with open(output_file, "w", encoding="utf-8") as f:
+                    json.dump(detail, f, ensure_ascii=False, indent=2)
+
+        # batch_size worker luôn bận, không đợi URL chậm nhất của từng batch
+        await run_work_queue(
+            enumerate(urls),
+            lambda item: self.crawl_chat_sex_detail(item[1]),
+            workers=batch_size,
+            on_result=save_result,
+        )
 
+        return [results[idx] for idx in sorted(results)]
 
 async def main():
     """Main function để chạy crawler."""
     # Đọc danh sách links từ file JSON
     import glob
+    import sys
     
     # Tìm file links mới nhất
     link_files = glob.glob("data/chat_sex_links_*.json")
@@ -414,7 +427,8 @@ async def main():
     crawler = ChatSexDetailCrawler(
         delay_min=0.3,
         delay_max=0.8,
-        headless=True  # Không mở Chrome
+        headless=True,  # Không mở Chrome
+        block_resources='--block-resources' in sys.argv,  # Chặn ảnh/font/CSS/tracker
     )
 
     try:
@@ -6,7 +6,6 @@ Sử dụng Playwright để crawl nhiều trang và trích xuất tất cả li
 import asyncio
 import json
 import os
-import random
 import re
 from datetime import datetime
 from typing import List, Optional, Set
@@ -14,6 +13,11 @@ from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlunparse
 
 from playwright.async_api import async_playwright, Browser
 
+from browser_pool import BrowserPool
+from page_ready import wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, limited_goto, rate_from_delay
+from resource_blocker import ResourceBlocker
+
 
 class ChatSexListingCrawler:
     def __init__(
@@ -21,29 +25,48 @@ class ChatSexListingCrawler:
         delay_min: float = 1.0,
         delay_max: float = 2.5,
         headless: bool = False,
+        pool_size: int = 3,  # số page dùng chung tối đa
+        block_resources: bool = False,  # chặn ảnh/font/video/tracker
     ):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.delay_min = delay_min
         self.delay_max = delay_max
         self.headless = headless
+        self.pool_size = pool_size
+        self.block_resources = block_resources
+        self.browser_lock = asyncio.Lock()
+        # delay_min/delay_max chỉ là tốc độ ban đầu, rate limiter tự điều chỉnh sau đó
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
 
     async def init_browser(self):
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
+                )
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=self.pool_size,
+                    blocker=ResourceBlocker.for_crawler("chat_sex") if self.block_resources else None,
+                )
         return self.browser
 
     async def close_browser(self):
         try:
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
 
     async def extract_chat_sex_links_from_page(self, page, base_url: str) -> Set[str]:
         """
@@ -189,17 +212,10 @@ class ChatSexListingCrawler:
             page_num: Số trang cần crawl
             
         Returns:
-            Set các URL gái chat sex
+            Set các URL gái chat sex, None nếu tải trang lỗi (khác với trang rỗng)
         """
         await self.init_browser()
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
             # Tạo URL với page number
@@ -220,8 +236,8 @@ class ChatSexListingCrawler:
                 full_url = url
 
             print(f"📄 Đang crawl trang {page_num}: {full_url}")
-            await page.goto(full_url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(random.uniform(self.delay_min, self.delay_max))
+            await limited_goto(page, full_url, self.rate_limiter, wait_until="domcontentloaded", timeout=30000)
+            await wait_for_selector_or_fallback(page, 'a[href*="/chat-sex/"]', timeout=10000, fallback_ms=1000)
 
             # Trích xuất links
             links = await self.extract_chat_sex_links_from_page(page, full_url)
@@ -231,66 +247,127 @@ class ChatSexListingCrawler:
 
         except Exception as e:
             print(f"❌ Lỗi khi crawl trang {page_num}: {e}")
-            return set()
+            return None
         finally:
-            await page.close()
+            await self.pool.release(page)
+
+    async def _crawl_pages_concurrently(
+        self,
+        base_url: str,
+        page_nums: List[int],
+        all_links: Set[str],
+        concurrency: int,
+    ):
+        """
+        Crawl nhiều trang ?page=N bằng `concurrency` worker, merge link vào all_links
+        ngay khi mỗi trang xong. Giống bản tuần tự: crawl hết total_pages, không dừng sớm.
 
-    async def crawl_all_pages(self, base_url: str, max_pages: Optional[int] = None) -> List[str]:
+        Returns:
+            Các trang bị lỗi
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for page_num in page_nums:
+            queue.put_nowait(page_num)
+        failed_pages: List[int] = []
+
+        async def worker():
+            while True:
+                try:
+                    page_num = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                links = await self.crawl_listing_page(base_url, page_num)
+                if links is None:
+                    failed_pages.append(page_num)
+                    continue
+                before_count = len(all_links)
+                all_links.update(links)
+                new_count = len(all_links) - before_count
+                print(f"📊 Tổng cộng: {len(all_links)} link (trang {page_num}, mới: {new_count})")
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(page_nums)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return sorted(failed_pages)
+
+    async def crawl_all_pages(self, base_url: str, max_pages: Optional[int] = None, concurrency: int = 1) -> List[str]:
         """
         Crawl tất cả các trang listing.
         
         Args:
             base_url: URL base của trang listing (ví dụ: https://gaigu1.net/chat-sex)
             max_pages: Số trang tối đa cần crawl (None = crawl tất cả)
+            concurrency: Số trang crawl đồng thời (1 = tuần tự như cũ,
+                         thực tế bị giới hạn bởi pool_size)
             
         Returns:
             List các URL gái chat sex (đã loại bỏ duplicate)
         """
         await self.init_browser()
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
             print(f"🔍 Đang kiểm tra tổng số trang: {base_url}")
-            await page.goto(base_url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(1)
+            await limited_goto(page, base_url, self.rate_limiter, wait_until="domcontentloaded", timeout=30000)
+            await wait_for_selector_or_fallback(page, '.pagination, .page-numbers, .paging, [class*="pagination"], [class*="paging"]', timeout=5000, fallback_ms=1000)
 
             total_pages = await self.get_total_pages(page)
             if max_pages:
                 total_pages = min(total_pages, max_pages)
             
             print(f"📊 Tổng số trang: {total_pages}")
-            await page.close()
 
         except Exception as e:
             print(f"⚠️  Không thể xác định tổng số trang: {e}")
             total_pages = 1
-            await page.close()
+        finally:
+            await self.pool.release(page)
 
-        # Crawl từng trang
         all_links = set()
-        for page_num in range(1, total_pages + 1):
-            links = await self.crawl_listing_page(base_url, page_num)
-            all_links.update(links)
-            print(f"📊 Tổng cộng: {len(all_links)} link (sau trang {page_num})")
+        if concurrency > 1:
+            # Đã biết tổng số trang → fan out ?page=N cho nhiều worker
+            print(f"🔄 Crawl song song {concurrency} trang cùng lúc")
+            failed_pages = await self._crawl_pages_concurrently(base_url, list(range(1, total_pages + 1)), all_links, concurrency)
+        else:
+            # Crawl từng trang
+            failed_pages = []
+            for page_num in range(1, total_pages + 1):
+                links = await self.crawl_listing_page(base_url, page_num)
+                if links is None:
+                    failed_pages.append(page_num)
+                    continue
+                all_links.update(links)
+                print(f"📊 Tổng cộng: {len(all_links)} link (sau trang {page_num})")
+
+        if failed_pages:
+            print(f"⚠️  {len(failed_pages)} trang lỗi, chưa lấy được link: {failed_pages}")
 
         return sorted(list(all_links))
 
 
 async def main():
     """Main function để chạy crawler."""
+    import sys
+
     base_url = "https://gaigu1.net/chat-sex"
+
+    # --workers N: số trang crawl song song (mặc định 1 = tuần tự)
+    concurrency = 1
+    for i, arg in enumerate(sys.argv):
+        if arg == '--workers' and i + 1 < len(sys.argv):
+            concurrency = int(sys.argv[i + 1])
+    block_resources = '--block-resources' in sys.argv  # Chặn ảnh/font/CSS/tracker
     
     crawler = ChatSexListingCrawler(
         delay_min=1.0,
         delay_max=2.5,
-        headless=False  # Set True nếu không muốn thấy browser
+        headless=False,  # Set True nếu không muốn thấy browser
+        pool_size=max(3, concurrency),
+        block_resources=block_resources,
     )
 
     try:
@@ -299,7 +376,7 @@ async def main():
         print("=" * 60)
         
         # Crawl tất cả trang (hoặc set max_pages để test)
-        links = await crawler.crawl_all_pages(base_url, max_pages=None)
+        links = await crawler.crawl_all_pages(base_url, max_pages=None, concurrency=concurrency)
         
         print("=" * 60)
         print(f"✅ HOÀN TẤT! Tổng cộng: {len(links)} link gái chat sex")
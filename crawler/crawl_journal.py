@@ -0,0 +1,157 @@
+"""
+Journal crawl lưu bằng SQLite (key = detailUrl) để chạy tiếp khi bị dừng giữa chừng.
+Mỗi URL lưu: trạng thái, số lần thử, file output, lỗi gần nhất.
+
+Xem tiến độ của 1 journal:
+    python crawl_journal.py data/girls_journal.sqlite
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, Optional
+
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class CrawlJournal:
+    def __init__(self, db_path: str, max_attempts: int = 3):
+        """
+        Args:
+            db_path: Đường dẫn file SQLite (tự tạo nếu chưa có)
+            max_attempts: Số lần thử tối đa cho 1 URL trước khi bỏ qua hẳn
+        """
+        self.db_path = db_path
+        self.max_attempts = max(1, max_attempts)
+
+        data_dir = os.path.dirname(db_path)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS crawl_journal (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        # Lần chạy trước bị kill giữa chừng → các URL đang "running" coi như thất bại
+        self._conn.execute(
+            "UPDATE crawl_journal SET status = ?, error = ? WHERE status = ?",
+            (STATUS_FAILED, "interrupted", STATUS_RUNNING),
+        )
+        self._conn.commit()
+
+    def _now(self) -> str:
+        return datetime.now().isoformat()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Lấy thông tin journal của 1 URL (None nếu chưa có)"""
+        row = self._conn.execute(
+            "SELECT status, attempts, output, error, updated_at FROM crawl_journal WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "url": url,
+            "status": row[0],
+            "attempts": row[1],
+            "output": row[2],
+            "error": row[3],
+            "updated_at": row[4],
+        }
+
+    def should_crawl(self, url: str) -> bool:
+        """True nếu URL chưa xong và chưa vượt quá số lần thử"""
+        entry = self.get(url)
+        if not entry:
+            return True
+        if entry["status"] == STATUS_DONE:
+            return False
+        return entry["attempts"] < self.max_attempts
+
+    def mark_started(self, url: str):
+        """Đánh dấu bắt đầu crawl (tăng số lần thử)"""
+        self._conn.execute(
+            """
+            INSERT INTO crawl_journal (url, status, attempts, updated_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                status = excluded.status,
+                attempts = crawl_journal.attempts + 1,
+                updated_at = excluded.updated_at
+            """,
+            (url, STATUS_RUNNING, self._now()),
+        )
+        self._conn.commit()
+
+    def mark_done(self, url: str, output: Optional[str] = None):
+        """Đánh dấu crawl thành công, lưu vị trí output (file JSON/JSONL)"""
+        self._conn.execute(
+            "UPDATE crawl_journal SET status = ?, output = ?, error = NULL, updated_at = ? WHERE url = ?",
+            (STATUS_DONE, output, self._now(), url),
+        )
+        self._conn.commit()
+
+    def mark_failed(self, url: str, error: Optional[str] = None):
+        """Đánh dấu crawl thất bại (sẽ được thử lại nếu chưa vượt max_attempts)"""
+        self._conn.execute(
+            "UPDATE crawl_journal SET status = ?, error = ?, updated_at = ? WHERE url = ?",
+            (STATUS_FAILED, (error or "")[:500], self._now(), url),
+        )
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Đếm số URL theo trạng thái (failed tách thành retry được / đã hết lượt)"""
+        result = {STATUS_DONE: 0, STATUS_FAILED: 0, "exhausted": 0, STATUS_RUNNING: 0}
+        rows = self._conn.execute(
+            "SELECT status, attempts >= ?, COUNT(*) FROM crawl_journal GROUP BY status, attempts >= ?",
+            (self.max_attempts, self.max_attempts),
+        ).fetchall()
+        for status, exhausted, count in rows:
+            if status == STATUS_FAILED and exhausted:
+                result["exhausted"] += count
+            else:
+                result[status] = result.get(status, 0) + count
+        result["total"] = sum(count for _, _, count in rows)
+        return result
+
+    def print_progress(self, label: str = "Journal"):
+        """In tiến độ đọc từ journal"""
+        s = self.stats()
+        print(
+            f"📒 {label}: ✅ {s[STATUS_DONE]} xong, 🔁 {s[STATUS_FAILED]} lỗi (sẽ thử lại), "
+            f"⛔ {s['exhausted']} hết lượt thử, tổng {s['total']} URL ({self.db_path})"
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python crawl_journal.py journal.sqlite")
+        sys.exit(1)
+    with CrawlJournal(sys.argv[1]) as journal:
+        journal.print_progress()
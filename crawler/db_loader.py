@@ -0,0 +1,335 @@
+"""
+Load thẳng dữ liệu crawl vào MySQL bằng mysql.connector (không qua file SQL + import_*.sh).
+
+Dùng lại đúng mapping của các script generate SQL:
+- albums:   generate_sql.build_album_rows (albums + album_images)
+- chat_sex: generate_chat_sex_sql.build_chat_sex_row (upsert ON DUPLICATE KEY UPDATE như file SQL)
+- reviews:  reviews_to_sql.build_review_rows (users + girls + reviews)
+
+Mỗi bảng ghi theo chunk: executemany (connector gộp thành 1 INSERT nhiều dòng, giá trị truyền qua
+tham số nên không phải tự escape), commit sau mỗi chunk. Chunk bị giới hạn cả số dòng lẫn số byte
+(ước lượng như sql_batch.BatchedInsert) để câu INSERT không vượt max_allowed_packet.
+Chunk lỗi → rollback rồi ghi lại từng dòng để tìm đúng dòng lỗi; dòng lỗi được báo cáo (và ghi ra
+--errors FILE dạng JSONL), các dòng khác vẫn vào DB. Mất kết nối giữa chừng → cả chunk được báo lỗi.
+
+Usage:
+    python db_loader.py albums data/albums_batch_20251212_003851 --created-by-id <admin_id>
+    python db_loader.py chat_sex data/chat_sex_details.json --managed-by-id <admin_id>
+    python db_loader.py reviews data/reviews.json
+
+Options:
+    --chunk-size N   Số dòng mỗi executemany / commit (mặc định: 1000)
+    --errors FILE    Ghi các dòng lỗi ra file JSONL
+
+Kết nối DB: biến môi trường DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+Cần cài thêm: pip install mysql-connector-python
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from generate_chat_sex_sql import CHAT_SEX_COLUMNS, CHAT_SEX_UPDATE_COLUMNS, build_chat_sex_row
+from generate_sql import ALBUM_COLUMNS, IMAGE_COLUMNS, build_album_rows, sql_value
+from jsonl_sink import JsonlSink
+from listing_reader import iter_listing
+from reviews_to_sql import GIRL_COLUMNS, REVIEW_COLUMNS, USER_COLUMNS, build_review_rows
+from sql_batch import DEFAULT_MAX_PACKET, PACKET_MARGIN
+
+try:
+    import mysql.connector
+    MYSQL_AVAILABLE = True
+except ImportError:
+    mysql = None
+    MYSQL_AVAILABLE = False
+
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', '1001'),
+    'database': os.getenv('DB_NAME', 'girl_pick_db'),
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class BulkLoader:
+    def __init__(
+        self,
+        connection,
+        table: str,
+        columns: Sequence[str],
+        update_columns: Optional[Sequence[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        parent: Optional["BulkLoader"] = None,
+        errors: Optional[JsonlSink] = None,
+        max_packet: int = DEFAULT_MAX_PACKET,
+    ):
+        """
+        Args:
+            connection: Connection mysql.connector (autocommit tắt)
+            table: Tên bảng
+            columns: Thứ tự cột của mỗi dòng
+            update_columns: Cột cập nhật khi trùng key (None = INSERT thường)
+            chunk_size: Số dòng mỗi lần executemany + commit
+            parent: Loader của bảng cha (FK) → luôn được flush trước bảng này
+            errors: Sink ghi các dòng lỗi (None = chỉ giữ trong self.errors)
+            max_packet: Giới hạn byte mỗi câu INSERT (max_allowed_packet của server)
+        """
+        self.connection = connection
+        self.table = table
+        self.columns = list(columns)
+        self.chunk_size = max(1, chunk_size)
+        self.parent = parent
+        self.errors_sink = errors
+        self.max_packet = max_packet
+
+        column_list = ", ".join(f"`{column}`" for column in self.columns)
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        self.sql = f"INSERT INTO `{table}` ({column_list}) VALUES ({placeholders})"
+        if update_columns:
+            updates = ", ".join(f"`{column}` = VALUES(`{column}`)" for column in update_columns)
+            self.sql += f" ON DUPLICATE KEY UPDATE {updates}"
+        # executemany viết lại thành "INSERT ... VALUES (...),(...) ON DUPLICATE ..." → phần cố định
+        self._base_size = len(self.sql.encode("utf-8")) + PACKET_MARGIN
+
+        self._rows: List[tuple] = []
+        self._sources: List[str] = []
+        self._size = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+
+    def add(self, row: Sequence, source: str = ""):
+        """Thêm 1 dòng (source: file / vị trí trong input, dùng cho báo cáo lỗi)"""
+        row = tuple(row)
+        # Ước lượng như BatchedInsert: độ dài utf-8 của dòng đã render thành literal SQL
+        row_size = len(("(" + ", ".join(sql_value(value) for value in row) + ")").encode("utf-8")) + 1  # ","
+        if self._rows and self._base_size + self._size + row_size > self.max_packet:
+            self.flush()
+        if not self._rows and self._base_size + row_size > self.max_packet:
+            print(f"⚠️  {self.table}: 1 dòng {row_size} byte > max_packet {self.max_packet} ({source})")
+
+        self._rows.append(row)
+        self._sources.append(source)
+        self._size += row_size
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.parent:
+            self.parent.flush()
+        if not self._rows:
+            return
+        rows, sources = self._rows, self._sources
+        self._rows, self._sources = [], []
+        self._size = 0
+
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.executemany(self.sql, rows)
+            self.connection.commit()
+            self.inserted += len(rows)
+            return
+        except mysql.connector.Error:
+            pass
+        finally:
+            self._close_cursor(cursor)
+
+        try:
+            self.connection.rollback()
+        except mysql.connector.Error as e:
+            # Mất kết nối: không ghi lại từng dòng được → báo cả chunk là lỗi, chạy tiếp
+            print(f"❌ {self.table}: mất kết nối DB, bỏ chunk {len(rows)} dòng: {e}")
+            for row, source in zip(rows, sources):
+                self._record_error(row, source, e)
+            return
+
+        # Chunk lỗi: ghi lại từng dòng để biết dòng nào hỏng, dòng tốt vẫn được commit
+        written = []
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            for row, source in zip(rows, sources):
+                try:
+                    cursor.execute(self.sql, row)
+                    written.append((row, source))
+                except mysql.connector.Error as e:
+                    self._record_error(row, source, e)
+            self.connection.commit()
+            self.inserted += len(written)
+        except mysql.connector.Error as e:
+            # Mất kết nối giữa chừng: các dòng chưa commit cũng là lỗi
+            print(f"❌ {self.table}: mất kết nối DB khi ghi lại chunk: {e}")
+            uncommitted = written if cursor is not None else list(zip(rows, sources))
+            for row, source in uncommitted:
+                self._record_error(row, source, e)
+        finally:
+            self._close_cursor(cursor)
+
+    @staticmethod
+    def _close_cursor(cursor):
+        if cursor is None:
+            return
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            pass
+
+    def _record_error(self, row: tuple, source: str, error: Exception):
+        self.failed += 1
+        error_info = {
+            "table": self.table,
+            "source": source,
+            "id": row[0],
+            "error": str(error),
+        }
+        self.errors.append(error_info)
+        if self.errors_sink:
+            self.errors_sink.write(error_info)
+
+    def print_summary(self):
+        print(f"   {self.table}: ✅ {self.inserted} dòng, ❌ {self.failed} lỗi")
+
+
+def load_albums(connection, folder_path: str, created_by_id: str, chunk_size: int, errors: Optional[JsonlSink]):
+    files = sorted(glob.glob(os.path.join(folder_path, "*.json")))
+    print(f"📂 {len(files)} file album trong {folder_path}")
+
+    albums = BulkLoader(connection, "albums", ALBUM_COLUMNS, chunk_size=chunk_size, errors=errors)
+    # album_images flush → albums flush trước (FK albumId)
+    album_images = BulkLoader(connection, "album_images", IMAGE_COLUMNS, chunk_size=chunk_size, parent=albums, errors=errors)
+
+    skipped = 0
+    for idx, file_path in enumerate(files, 1):
+        source = os.path.basename(file_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = build_album_rows(data, created_by_id)
+        except Exception as e:
+            print(f"  ❌ {source}: {e}")
+            skipped += 1
+            continue
+        if rows is None:
+            skipped += 1
+            continue
+
+        album_row, image_rows = rows
+        albums.add(album_row, source)
+        for image_row in image_rows:
+            album_images.add(image_row, source)
+
+        if idx % 500 == 0:
+            print(f"  ✓ Đã xử lý: {idx}/{len(files)} file")
+
+    album_images.flush()
+    print(f"   ⚠️  Bỏ qua: {skipped} file (lỗi / không có ảnh)")
+    return [albums, album_images]
+
+
+def load_chat_sex(connection, json_file: str, managed_by_id: Optional[str], chunk_size: int, errors: Optional[JsonlSink]):
+    print(f"📂 Đang đọc file: {json_file}")
+    girls = BulkLoader(
+        connection, "chat_sex_girls", CHAT_SEX_COLUMNS,
+        update_columns=CHAT_SEX_UPDATE_COLUMNS, chunk_size=chunk_size, errors=errors,
+    )
+
+    skipped = 0
+    used_slugs = {}  # Track slugs để tránh duplicate
+    for idx, item in iter_listing(json_file):
+        try:
+            row = build_chat_sex_row(item, used_slugs, managed_by_id)
+        except Exception as e:
+            print(f"  ❌ Item {idx}: {e}")
+            skipped += 1
+            continue
+        if row is None:
+            skipped += 1
+            continue
+        girls.add(row, f"{os.path.basename(json_file)}#{idx}")
+
+    girls.flush()
+    print(f"   ⚠️  Bỏ qua: {skipped} items (lỗi / không có name)")
+    return [girls]
+
+
+def load_reviews(connection, json_file: str, chunk_size: int, errors: Optional[JsonlSink]):
+    print(f"📂 Đang đọc file: {json_file}")
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    user_row, girl_row, review_rows = build_review_rows((item for _, item in iter_listing(json_file)), now)
+
+    users = BulkLoader(connection, "users", USER_COLUMNS, chunk_size=chunk_size, errors=errors)
+    girls = BulkLoader(connection, "girls", GIRL_COLUMNS, chunk_size=chunk_size, errors=errors)
+    reviews = BulkLoader(connection, "reviews", REVIEW_COLUMNS, chunk_size=chunk_size, errors=errors)
+    users.add(user_row, "dummy user")
+    girls.add(girl_row, "dummy girl")
+    users.flush()
+    girls.flush()
+
+    source = os.path.basename(json_file)
+    for idx, row in enumerate(review_rows, 1):
+        reviews.add(row, f"{source}#{idx}")
+    reviews.flush()
+    return [users, girls, reviews]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load crawled JSON straight into MySQL')
+    parser.add_argument('kind', choices=['albums', 'chat_sex', 'reviews'])
+    parser.add_argument('input', help='Album JSON folder (albums) or JSON/JSONL file (chat_sex, reviews)')
+    parser.add_argument('--created-by-id', default="f267acc4-47e0-4de5-9ac3-fd72cfee1422", help='Admin user ID (albums)')
+    parser.add_argument('--managed-by-id', help='ID of admin/staff who manages these girls (chat_sex)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows per executemany/commit')
+    parser.add_argument('--errors', help='Write failed rows to this JSONL file')
+    args = parser.parse_args()
+
+    if not MYSQL_AVAILABLE:
+        print("❌ Cần cài mysql-connector-python: pip install mysql-connector-python")
+        sys.exit(1)
+    if not os.path.exists(args.input):
+        print(f"❌ Không tìm thấy: {args.input}")
+        sys.exit(1)
+
+    connection = mysql.connector.connect(**DB_CONFIG, autocommit=False, charset='utf8mb4')
+    print(f"✅ Đã kết nối database: {DB_CONFIG['database']} ({DB_CONFIG['host']}:{DB_CONFIG['port']})")
+    errors = JsonlSink(args.errors) if args.errors else None
+    start = datetime.now()
+
+    try:
+        if args.kind == 'albums':
+            loaders = load_albums(connection, args.input, args.created_by_id, args.chunk_size, errors)
+        elif args.kind == 'chat_sex':
+            loaders = load_chat_sex(connection, args.input, args.managed_by_id, args.chunk_size, errors)
+        else:
+            loaders = load_reviews(connection, args.input, args.chunk_size, errors)
+    finally:
+        if errors:
+            errors.close()
+        connection.close()
+
+    print(f"\n{'='*60}")
+    print(f"📊 KẾT QUẢ LOAD ({(datetime.now() - start).total_seconds():.1f}s)")
+    print(f"{'='*60}")
+    for loader in loaders:
+        loader.print_summary()
+
+    all_errors = [error for loader in loaders for error in loader.errors]
+    if all_errors:
+        print(f"\n⚠️  Có {len(all_errors)} dòng lỗi:")
+        for error in all_errors[:10]:
+            print(f"  - {error['table']} {error['source']}: {error['error']}")
+        if len(all_errors) > 10:
+            print(f"  ... và {len(all_errors) - 10} lỗi khác" + (f" (xem {args.errors})" if args.errors else ""))
+    print(f"{'='*60}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 """
 Script để chuyển file JSON chat sex thành SQL INSERT statements
+
+Thêm --load-data DIR: xuất chat_sex_girls.tsv + load.sql (LOAD DATA LOCAL INFILE, upsert qua bảng tạm)
 """
 
 import json
@@ -9,12 +11,42 @@ import re
 from datetime import datetime
 from urllib.parse import quote
 
+from listing_reader import iter_listing
+from load_data import TsvTable, write_load_script
+from sql_batch import open_sql_output, write_lines
+
+
+# Nhóm cột theo từng dòng của câu INSERT
+CHAT_SEX_COLUMN_GROUPS = [
+    ["id", "managedById", "name", "slug", "title", "age", "birthYear", "height", "weight", "bio", "phone", "zalo", "telegram"],
+    ["location", "province", "address", "price", "price15min", "paymentInfo", "services", "workingHours", "instruction"],
+    ["images", "videos", "coverImage", "tags"],
+    ["isVerified", "isFeatured", "isActive", "isAvailable"],
+    ["viewCount", "rating", "sourceUrl", "crawledAt", "createdAt", "updatedAt"],
+]
+CHAT_SEX_COLUMNS = [column for group in CHAT_SEX_COLUMN_GROUPS for column in group]
+# Cột cập nhật khi trùng key (giữ id, managedById, viewCount, createdAt của bản ghi cũ)
+CHAT_SEX_UPDATE_COLUMNS = [
+    column for column in CHAT_SEX_COLUMNS
+    if column not in ("id", "managedById", "viewCount", "createdAt")
+]
+
 def escape_sql_string(s):
     """Escape string cho SQL"""
     if s is None:
         return "NULL"
     return "'" + str(s).replace("'", "''").replace("\\", "\\\\") + "'"
 
+def sql_value(value):
+    """Giá trị Python → literal SQL (None → NULL, số giữ nguyên)"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return escape_sql_string(value)
+
 def generate_uuid():
     """Generate UUID cho MySQL"""
     return str(uuid.uuid4())
@@ -50,218 +82,176 @@ def clean_tags(tags):
     cleaned = [tag for tag in tags if tag and tag not in invalid_tags]
     return cleaned
 
+def build_chat_sex_row(item, used_slugs, managed_by_id=None):
+    """
+    Map 1 item JSON chat sex → 1 dòng bảng chat_sex_girls (theo CHAT_SEX_COLUMNS)
+    
+    Args:
+        used_slugs: Dict slug đã dùng (dùng chung cho cả file để slug không trùng)
+    
+    Returns:
+        tuple giá trị, hoặc None nếu item lỗi / không có name
+    """
+    # Skip nếu có lỗi hoặc không có name
+    if item.get('error') or not item.get('name'):
+        return None
+    
+    girl_id = generate_uuid()
+    name = item.get('name', '').strip()
+    title = item.get('title', '').strip() or None
+    
+    # Generate unique slug
+    base_slug = generate_slug(name)
+    if not base_slug:
+        base_slug = f"girl-{girl_id[:8]}"  # Fallback nếu không có name
+    
+    # Đảm bảo slug unique
+    slug = base_slug
+    counter = 1
+    while slug in used_slugs:
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    used_slugs[slug] = True
+    age = item.get('age')
+    birth_year = item.get('birthYear')
+    height = item.get('height', '').strip() or None
+    weight = item.get('weight', '').strip() or None
+    bio = item.get('description', '').strip() or item.get('bio', '').strip() or None
+    phone = item.get('phone', '').strip() or None
+    zalo = item.get('zalo', '').strip() or None
+    telegram = item.get('telegram', '').strip() or None
+    location = item.get('location', '').strip() or None
+    province = None  # Có thể parse từ location nếu cần
+    address = location  # Dùng location làm address
+    price = item.get('price', '').strip() or None
+    price_15min = item.get('price15min', '').strip() or None
+    payment_info = item.get('paymentInfo', '').strip() or None
+    working_hours = item.get('workingHours', '').strip() or None
+    instruction = item.get('instruction', '').strip() or None
+    
+    # Images
+    images = item.get('images', [])
+    if not isinstance(images, list):
+        images = []
+    cover_image = images[0] if images else None
+    
+    # Services
+    services = item.get('services', [])
+    if not isinstance(services, list):
+        services = []
+    
+    # Tags
+    tags = clean_tags(item.get('tags', []))
+    
+    # Status flags
+    is_verified = item.get('verified', False) or False
+    is_featured = False  # Mặc định false
+    is_active = True  # Mặc định true
+    is_available = True  # Mặc định true
+    
+    # Statistics
+    view_count = item.get('viewCount', 0) or 0
+    rating = item.get('rating')
+    
+    # Metadata
+    source_url = item.get('url', '').strip() or None
+    crawled_at = item.get('crawled_at')
+    
+    # Format datetime cho MySQL
+    try:
+        if crawled_at:
+            dt = datetime.fromisoformat(crawled_at.replace('Z', '+00:00'))
+            mysql_datetime = dt.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Format JSON cho MySQL
+    images_json = json.dumps(images, ensure_ascii=False) if images else "[]"
+    services_json = json.dumps(services, ensure_ascii=False) if services else "[]"
+    tags_json = json.dumps(tags, ensure_ascii=False) if tags else "[]"
+    
+    # Parse videos nếu có
+    videos = item.get('videos', [])
+    if not isinstance(videos, list):
+        videos = []
+    videos_json = json.dumps(videos, ensure_ascii=False) if videos else "[]"
+    
+    return (
+        girl_id, managed_by_id or None, name, slug, title, age, birth_year, height, weight, bio, phone, zalo, telegram,
+        location, province, address, price, price_15min, payment_info, services_json, working_hours, instruction,
+        images_json, videos_json, cover_image, tags_json,
+        bool(is_verified), is_featured, is_active, is_available,
+        view_count, rating, source_url, mysql_datetime if crawled_at else None, mysql_datetime, mysql_datetime,
+    )
+
+def upsert_sql(row):
+    """INSERT ... ON DUPLICATE KEY UPDATE cho 1 dòng chat_sex_girls"""
+    column_list = ",\n    ".join(", ".join(f"`{column}`" for column in group) for group in CHAT_SEX_COLUMN_GROUPS)
+    value_list = ",\n    ".join(sql_value(value) for value in row)
+    updates = ",\n    ".join(f"`{column}` = VALUES(`{column}`)" for column in CHAT_SEX_UPDATE_COLUMNS)
+    return f"""INSERT INTO `chat_sex_girls` (
+    {column_list}
+) VALUES (
+    {value_list}
+) ON DUPLICATE KEY UPDATE
+    {updates};"""
+
 def generate_sql_from_json(json_file, output_file, managed_by_id=None):
     """
     Generate SQL INSERT statements từ file JSON chat sex
     
     Args:
-        json_file: Đường dẫn đến file JSON
-        output_file: File output để ghi SQL
+        json_file: Đường dẫn đến file JSON (array) hoặc JSONL
+        output_file: File output để ghi SQL (*.sql.gz → nén gzip)
         managed_by_id: ID của admin/staff tạo (optional)
     """
     print(f"📂 Đang đọc file: {json_file}")
     
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    if not isinstance(data, list):
+    # Đọc streaming 2 lượt: lượt đầu chỉ đếm (cho header), lượt sau vừa đọc vừa ghi SQL
+    try:
+        total = sum(1 for _ in iter_listing(json_file))
+    except ValueError:
         print("❌ File JSON phải là array")
         return
     
-    print(f"📊 Tổng cộng: {len(data)} chat sex girls")
-    
-    sql_statements = []
-    sql_statements.append("-- SQL INSERT statements generated from crawled chat sex girls")
-    sql_statements.append(f"-- Generated at: {datetime.now().isoformat()}")
-    sql_statements.append(f"-- Total girls: {len(data)}")
-    sql_statements.append("")
-    sql_statements.append("-- Disable foreign key checks temporarily for faster import")
-    sql_statements.append("SET FOREIGN_KEY_CHECKS = 0;")
-    sql_statements.append("SET AUTOCOMMIT = 0;")
-    sql_statements.append("SET UNIQUE_CHECKS = 0;")
-    sql_statements.append("")
-    sql_statements.append("-- Start transaction")
-    sql_statements.append("START TRANSACTION;")
-    sql_statements.append("")
+    print(f"📊 Tổng cộng: {total} chat sex girls")
+    
+    out = open_sql_output(output_file)
+    write_lines(
+        out,
+        "-- SQL INSERT statements generated from crawled chat sex girls",
+        f"-- Generated at: {datetime.now().isoformat()}",
+        f"-- Total girls: {total}",
+        "",
+        "-- Disable foreign key checks temporarily for faster import",
+        "SET FOREIGN_KEY_CHECKS = 0;",
+        "SET AUTOCOMMIT = 0;",
+        "SET UNIQUE_CHECKS = 0;",
+        "",
+        "-- Start transaction",
+        "START TRANSACTION;",
+        "",
+    )
     
     valid_count = 0
     skipped_count = 0
     used_slugs = {}  # Track slugs để tránh duplicate
     
-    for idx, item in enumerate(data, 1):
+    for idx, item in iter_listing(json_file):
         try:
-            # Skip nếu có lỗi hoặc không có name
-            if item.get('error') or not item.get('name'):
+            row = build_chat_sex_row(item, used_slugs, managed_by_id)
+            if row is None:
                 skipped_count += 1
                 print(f"  ⚠️  Skipping item {idx}: No name or error")
                 continue
             
-            girl_id = generate_uuid()
-            name = item.get('name', '').strip()
-            title = item.get('title', '').strip() or None
-            
-            # Generate unique slug
-            base_slug = generate_slug(name)
-            if not base_slug:
-                base_slug = f"girl-{girl_id[:8]}"  # Fallback nếu không có name
-            
-            # Đảm bảo slug unique
-            slug = base_slug
-            counter = 1
-            while slug in used_slugs:
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            used_slugs[slug] = True
-            age = item.get('age')
-            birth_year = item.get('birthYear')
-            height = item.get('height', '').strip() or None
-            weight = item.get('weight', '').strip() or None
-            bio = item.get('description', '').strip() or item.get('bio', '').strip() or None
-            phone = item.get('phone', '').strip() or None
-            zalo = item.get('zalo', '').strip() or None
-            telegram = item.get('telegram', '').strip() or None
-            location = item.get('location', '').strip() or None
-            province = None  # Có thể parse từ location nếu cần
-            address = location  # Dùng location làm address
-            price = item.get('price', '').strip() or None
-            price_15min = item.get('price15min', '').strip() or None
-            payment_info = item.get('paymentInfo', '').strip() or None
-            working_hours = item.get('workingHours', '').strip() or None
-            instruction = item.get('instruction', '').strip() or None
-            
-            # Images
-            images = item.get('images', [])
-            if not isinstance(images, list):
-                images = []
-            cover_image = images[0] if images else None
-            
-            # Services
-            services = item.get('services', [])
-            if not isinstance(services, list):
-                services = []
-            
-            # Tags
-            tags = clean_tags(item.get('tags', []))
-            
-            # Status flags
-            is_verified = item.get('verified', False) or False
-            is_featured = False  # Mặc định false
-            is_active = True  # Mặc định true
-            is_available = True  # Mặc định true
-            
-            # Statistics
-            view_count = item.get('viewCount', 0) or 0
-            rating = item.get('rating')
-            
-            # Metadata
-            source_url = item.get('url', '').strip() or None
-            crawled_at = item.get('crawled_at')
-            
-            # Format datetime cho MySQL
-            try:
-                if crawled_at:
-                    dt = datetime.fromisoformat(crawled_at.replace('Z', '+00:00'))
-                    mysql_datetime = dt.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Format JSON cho MySQL
-            images_json = json.dumps(images, ensure_ascii=False) if images else "[]"
-            services_json = json.dumps(services, ensure_ascii=False) if services else "[]"
-            tags_json = json.dumps(tags, ensure_ascii=False) if tags else "[]"
-            
-            # Parse videos nếu có
-            videos = item.get('videos', [])
-            if not isinstance(videos, list):
-                videos = []
-            videos_json = json.dumps(videos, ensure_ascii=False) if videos else "[]"
-            
-            # Tạo INSERT statement với ON DUPLICATE KEY UPDATE để update nếu đã tồn tại
-            sql = f"""INSERT INTO `chat_sex_girls` (
-    `id`, `managedById`, `name`, `slug`, `title`, `age`, `birthYear`, `height`, `weight`, `bio`, `phone`, `zalo`, `telegram`,
-    `location`, `province`, `address`, `price`, `price15min`, `paymentInfo`, `services`, `workingHours`, `instruction`,
-    `images`, `videos`, `coverImage`, `tags`,
-    `isVerified`, `isFeatured`, `isActive`, `isAvailable`,
-    `viewCount`, `rating`, `sourceUrl`, `crawledAt`, `createdAt`, `updatedAt`
-) VALUES (
-    {escape_sql_string(girl_id)},
-    {escape_sql_string(managed_by_id) if managed_by_id else "NULL"},
-    {escape_sql_string(name)},
-    {escape_sql_string(slug) if slug else "NULL"},
-    {escape_sql_string(title) if title else "NULL"},
-    {age if age is not None else "NULL"},
-    {birth_year if birth_year is not None else "NULL"},
-    {escape_sql_string(height) if height else "NULL"},
-    {escape_sql_string(weight) if weight else "NULL"},
-    {escape_sql_string(bio) if bio else "NULL"},
-    {escape_sql_string(phone) if phone else "NULL"},
-    {escape_sql_string(zalo) if zalo else "NULL"},
-    {escape_sql_string(telegram) if telegram else "NULL"},
-    {escape_sql_string(location) if location else "NULL"},
-    {escape_sql_string(province) if province else "NULL"},
-    {escape_sql_string(address) if address else "NULL"},
-    {escape_sql_string(price) if price else "NULL"},
-    {escape_sql_string(price_15min) if price_15min else "NULL"},
-    {escape_sql_string(payment_info) if payment_info else "NULL"},
-    {escape_sql_string(services_json)},
-    {escape_sql_string(working_hours) if working_hours else "NULL"},
-    {escape_sql_string(instruction) if instruction else "NULL"},
-    {escape_sql_string(images_json)},
-    {escape_sql_string(videos_json)},
-    {escape_sql_string(cover_image) if cover_image else "NULL"},
-    {escape_sql_string(tags_json)},
-    {1 if is_verified else 0},
-    {1 if is_featured else 0},
-    {1 if is_active else 0},
-    {1 if is_available else 0},
-    {view_count},
-    {rating if rating is not None else "NULL"},
-    {escape_sql_string(source_url) if source_url else "NULL"},
-    {escape_sql_string(mysql_datetime) if crawled_at else "NULL"},
-    {escape_sql_string(mysql_datetime)},
-    {escape_sql_string(mysql_datetime)}
-) ON DUPLICATE KEY UPDATE
-    `name` = VALUES(`name`),
-    `slug` = VALUES(`slug`),
-    `title` = VALUES(`title`),
-    `age` = VALUES(`age`),
-    `birthYear` = VALUES(`birthYear`),
-    `height` = VALUES(`height`),
-    `weight` = VALUES(`weight`),
-    `bio` = VALUES(`bio`),
-    `phone` = VALUES(`phone`),
-    `zalo` = VALUES(`zalo`),
-    `telegram` = VALUES(`telegram`),
-    `location` = VALUES(`location`),
-    `province` = VALUES(`province`),
-    `address` = VALUES(`address`),
-    `price` = VALUES(`price`),
-    `price15min` = VALUES(`price15min`),
-    `paymentInfo` = VALUES(`paymentInfo`),
-    `services` = VALUES(`services`),
-    `workingHours` = VALUES(`workingHours`),
-    `instruction` = VALUES(`instruction`),
-    `images` = VALUES(`images`),
-    `videos` = VALUES(`videos`),
-    `coverImage` = VALUES(`coverImage`),
-    `tags` = VALUES(`tags`),
-    `isVerified` = VALUES(`isVerified`),
-    `isFeatured` = VALUES(`isFeatured`),
-    `isActive` = VALUES(`isActive`),
-    `isAvailable` = VALUES(`isAvailable`),
-    `rating` = VALUES(`rating`),
-    `sourceUrl` = VALUES(`sourceUrl`),
-    `crawledAt` = VALUES(`crawledAt`),
-    `updatedAt` = VALUES(`updatedAt`);"""
-            
-            sql_statements.append(sql)
-            sql_statements.append("")
+            write_lines(out, upsert_sql(row), "")
             valid_count += 1
             
             if idx % 100 == 0:
-                print(f"  ✓ Đã xử lý: {idx}/{len(data)}")
+                print(f"  ✓ Đã xử lý: {idx}/{total}")
         
         except Exception as e:
             print(f"  ❌ Lỗi khi xử lý item {idx}: {e}")
@@ -269,38 +259,79 @@ def generate_sql_from_json(json_file, output_file, managed_by_id=None):
             continue
     
     # Commit transaction
-    sql_statements.append("-- Commit transaction")
-    sql_statements.append("COMMIT;")
-    sql_statements.append("")
-    sql_statements.append("-- Re-enable checks")
-    sql_statements.append("SET FOREIGN_KEY_CHECKS = 1;")
-    sql_statements.append("SET AUTOCOMMIT = 1;")
-    sql_statements.append("SET UNIQUE_CHECKS = 1;")
-    sql_statements.append("")
-    sql_statements.append(f"-- Total inserted: {valid_count}")
-    sql_statements.append(f"-- Total skipped: {skipped_count}")
-    
-    # Ghi file
-    print(f"\n💾 Đang ghi file SQL: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(sql_statements))
+    write_lines(
+        out,
+        "-- Commit transaction",
+        "COMMIT;",
+        "",
+        "-- Re-enable checks",
+        "SET FOREIGN_KEY_CHECKS = 1;",
+        "SET AUTOCOMMIT = 1;",
+        "SET UNIQUE_CHECKS = 1;",
+        "",
+        f"-- Total inserted: {valid_count}",
+        f"-- Total skipped: {skipped_count}",
+    )
+    out.close()
+    print(f"\n💾 Đã ghi file SQL: {output_file}")
     
     print(f"\n✅ Hoàn thành!")
     print(f"   ✓ Đã tạo: {valid_count} INSERT statements")
     print(f"   ⚠️  Đã bỏ qua: {skipped_count} items")
     print(f"   📄 File output: {output_file}")
 
+def export_load_data_from_json(json_file, output_dir, managed_by_id=None):
+    """
+    Xuất chat_sex_girls.tsv + load.sql (LOAD DATA LOCAL INFILE) từ file JSON chat sex
+    
+    Trùng slug với bản ghi đã có → cập nhật như ON DUPLICATE KEY UPDATE của file SQL
+    (load vào bảng tạm rồi INSERT ... SELECT, không dùng REPLACE vì sẽ xóa review theo cascade)
+    """
+    print(f"📂 Đang đọc file: {json_file}")
+    
+    table = TsvTable(output_dir, "chat_sex_girls", CHAT_SEX_COLUMNS, update_columns=CHAT_SEX_UPDATE_COLUMNS)
+    skipped_count = 0
+    used_slugs = {}  # Track slugs để tránh duplicate
+    
+    try:
+        for idx, item in iter_listing(json_file):
+            try:
+                row = build_chat_sex_row(item, used_slugs, managed_by_id)
+                if row is None:
+                    skipped_count += 1
+                    print(f"  ⚠️  Skipping item {idx}: No name or error")
+                    continue
+                table.write(row)
+            except Exception as e:
+                print(f"  ❌ Lỗi khi xử lý item {idx}: {e}")
+                skipped_count += 1
+    finally:
+        table.close()
+    
+    script = write_load_script(output_dir, [table])
+    
+    print(f"\n✅ Hoàn thành!")
+    print(f"   ✓ Đã xuất: {table.count} dòng → {table.path}")
+    print(f"   ⚠️  Đã bỏ qua: {skipped_count} items")
+    print(f"   📄 Load script: {script}")
+    print(f"   👉 Import: cd {output_dir} && mysql --local-infile=1 -u root -p girl_pick_db < load.sql")
+
 def main():
     """Main function"""
     import argparse
     
     parser = argparse.ArgumentParser(description='Generate SQL INSERT statements from chat sex JSON')
-    parser.add_argument('--input', '-i', required=True, help='Input JSON file path')
-    parser.add_argument('--output', '-o', default='data/chat_sex_insert.sql', help='Output SQL file path')
+    parser.add_argument('--input', '-i', required=True, help='Input JSON (array) or JSONL file path')
+    parser.add_argument('--output', '-o', default='data/chat_sex_insert.sql', help='Output SQL file path (.sql.gz = gzip)')
     parser.add_argument('--managed-by-id', help='ID of admin/staff who manages these girls (optional)')
+    parser.add_argument('--load-data', metavar='DIR', help='Export TSV + LOAD DATA script to DIR instead of INSERT SQL')
     
     args = parser.parse_args()
     
+    if args.load_data:
+        export_load_data_from_json(args.input, args.load_data, args.managed_by_id)
+        return
+    
     # Tạo thư mục output nếu chưa có
     output_dir = os.path.dirname(args.output)
     if output_dir and not os.path.exists(output_dir):
@@ -1,20 +1,60 @@
 """
 Script để chuyển các file JSON album thành SQL INSERT statements
+
+Usage:
+    python generate_sql.py [folder] [output.sql] [created_by_id] [--batch-size N] [--max-packet BYTES]
+    python generate_sql.py [folder] [output_dir] [created_by_id] --load-data
+    python generate_sql.py [folder] [output.sql] [created_by_id] --workers 8
+
+    --batch-size N      Gộp tối đa N dòng vào 1 câu INSERT (albums và album_images batch riêng).
+                        Không truyền = mỗi dòng 1 câu INSERT như cũ.
+    --max-packet BYTES  Giới hạn byte mỗi câu INSERT, đặt <= max_allowed_packet của server (mặc định 4MB)
+    --load-data         Xuất albums.tsv + album_images.tsv + load.sql (LOAD DATA LOCAL INFILE) vào output_dir
+    --workers N         Đọc + format file JSON song song trên N process (mặc định 1 = tuần tự).
+                        Kết quả vẫn ghi theo đúng thứ tự file như chạy tuần tự.
 """
 
 import json
 import os
 import glob
+import shutil
+import tempfile
 import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
 from urllib.parse import urlparse
 
+from load_data import TsvTable, tsv_field, write_load_script
+from sql_batch import DEFAULT_MAX_PACKET, BatchedInsert, open_sql_output, write_lines
+
+
+ALBUM_COLUMNS = [
+    "id", "title", "description", "coverUrl", "category", "albumCategoryId", "tags",
+    "isPublic", "viewCount", "createdById", "createdAt", "updatedAt",
+]
+IMAGE_COLUMNS = ["id", "albumId", "url", "thumbUrl", "caption", "order", "createdAt"]
+
+# Số file JSON mỗi task gửi cho process pool
+FILES_PER_TASK = 50
+
 def escape_sql_string(s):
     """Escape string cho SQL"""
     if s is None:
         return "NULL"
     return "'" + str(s).replace("'", "''").replace("\\", "\\\\") + "'"
 
+def sql_value(value):
+    """Giá trị Python → literal SQL (None → NULL, số giữ nguyên)"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return escape_sql_string(value)
+
 def generate_uuid():
     """Generate UUID cho MySQL"""
     return str(uuid.uuid4())
@@ -32,143 +72,269 @@ def parse_category_from_url(url):
         pass
     return None
 
-def generate_sql_from_json_folder(folder_path, output_file, created_by_id="00000000-0000-0000-0000-000000000000"):
+def build_album_rows(data, created_by_id):
+    """
+    Map 1 file JSON album → dòng của bảng albums / album_images (theo ALBUM_COLUMNS / IMAGE_COLUMNS)
+    
+    Returns:
+        (album_row, image_rows) hoặc None nếu album lỗi / không có ảnh
+    """
+    # Skip nếu có lỗi hoặc không có ảnh
+    if data.get('error') or not data.get('images') or len(data.get('images', [])) == 0:
+        return None
+    
+    album_id = generate_uuid()
+    title = data.get('title', '').strip() or 'Untitled Album'
+    description = data.get('description', '').strip() or None
+    url = data.get('url', '')
+    images = data.get('images', [])
+    crawled_at = data.get('crawled_at', datetime.now().isoformat())
+    
+    # Lấy ảnh đầu tiên làm cover
+    cover_url = images[0] if images else None
+    
+    # Parse category từ URL
+    category = parse_category_from_url(url)
+    
+    # Format datetime cho MySQL (YYYY-MM-DD HH:MM:SS)
+    try:
+        dt = datetime.fromisoformat(crawled_at.replace('Z', '+00:00'))
+        mysql_datetime = dt.strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Xử lý tags nếu có (format JSON)
+    tags_json = json.dumps(data.get('tags'), ensure_ascii=False) if data.get('tags') else None
+    
+    album_row = (
+        album_id, title, description, cover_url, category, None, tags_json,
+        1, 0, created_by_id, mysql_datetime, mysql_datetime,
+    )
+    
+    image_rows = []
+    for img_idx, img_url in enumerate(images):
+        # Thumbnail URL có thể giống với URL chính hoặc có thể parse từ URL
+        thumb_url = img_url  # Có thể cần xử lý để tạo thumb URL
+        image_rows.append((generate_uuid(), album_id, img_url, thumb_url, None, img_idx, mysql_datetime))
+    
+    return album_row, image_rows
+
+def render_album_files(file_paths, created_by_id, render=None):
+    """
+    Đọc + map 1 nhóm file JSON album (chạy trong process con khi --workers > 1)
+    
+    Args:
+        render: Hàm format từng giá trị (sql_value / tsv_field), None = giữ giá trị Python
+    
+    Returns:
+        [(file_path, rows, error)] theo đúng thứ tự file_paths, rows = None nếu bỏ qua / lỗi
+    """
+    results = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = build_album_rows(data, created_by_id)
+            if rows is not None and render:
+                album_row, image_rows = rows
+                rows = (
+                    [render(value) for value in album_row],
+                    [[render(value) for value in image_row] for image_row in image_rows],
+                )
+            results.append((file_path, rows, None))
+        except Exception as e:
+            results.append((file_path, None, str(e)))
+    return results
+
+def iter_album_files(files, created_by_id, render=None, workers=1):
+    """
+    Yield (file_path, rows, error) theo thứ tự files
+    
+    workers > 1: các nhóm FILES_PER_TASK file được parse + format song song, nhưng kết quả lấy ra
+    theo đúng thứ tự gửi đi (output giống hệt chạy tuần tự). Chỉ giữ tối đa workers * 2 nhóm
+    đang chạy / chờ ghi để RAM không tăng theo số file.
+    """
+    chunks = (files[i:i + FILES_PER_TASK] for i in range(0, len(files), FILES_PER_TASK))
+    if workers <= 1:
+        for chunk in chunks:
+            yield from render_album_files(chunk, created_by_id, render)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            executor.submit(render_album_files, chunk, created_by_id, render)
+            for chunk in islice(chunks, workers * 2)
+        )
+        while pending:
+            results = pending.popleft().result()
+            next_chunk = next(chunks, None)
+            if next_chunk:
+                pending.append(executor.submit(render_album_files, next_chunk, created_by_id, render))
+            yield from results
+
+def single_insert_sql(table, columns, values):
+    """1 câu INSERT cho 1 dòng (thêm backticks cho các tên cột camelCase)"""
+    column_list = ", ".join(f"`{column}`" for column in columns)
+    value_list = ",\n    ".join(values)
+    return f"""INSERT INTO `{table}` (
+    {column_list}
+) VALUES (
+    {value_list}
+);"""
+
+def generate_sql_from_json_folder(folder_path, output_file, created_by_id="00000000-0000-0000-0000-000000000000",
+                                  batch_size=None, max_packet=DEFAULT_MAX_PACKET, workers=1):
     """
     Generate SQL INSERT statements từ các file JSON trong folder
     
     Args:
         folder_path: Đường dẫn đến folder chứa các file JSON
-        output_file: File output để ghi SQL
+        output_file: File output để ghi SQL (*.sql.gz → nén gzip)
         created_by_id: ID của user tạo album (mặc định là UUID rỗng, cần thay đổi)
+        batch_size: Số dòng mỗi câu INSERT nhiều dòng (None = mỗi dòng 1 câu)
+        max_packet: Giới hạn byte mỗi câu INSERT nhiều dòng (max_allowed_packet)
+        workers: Số process đọc + format file JSON song song (1 = tuần tự)
     """
     files = glob.glob(os.path.join(folder_path, "*.json"))
     files.sort()  # Sắp xếp để dễ theo dõi
     
-    sql_statements = []
-    sql_statements.append("-- SQL INSERT statements generated from crawled albums")
-    sql_statements.append(f"-- Generated at: {datetime.now().isoformat()}")
-    sql_statements.append(f"-- Total albums: {len(files)}")
-    sql_statements.append("")
-    sql_statements.append("-- Disable foreign key checks temporarily for faster import")
-    sql_statements.append("SET FOREIGN_KEY_CHECKS = 0;")
-    sql_statements.append("SET AUTOCOMMIT = 0;")
-    sql_statements.append("")
-    sql_statements.append("-- Start transaction")
-    sql_statements.append("START TRANSACTION;")
-    sql_statements.append("")
-    
-    album_inserts = []
-    image_inserts = []
-    
-    for idx, file_path in enumerate(files, 1):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Skip nếu có lỗi hoặc không có ảnh
-            if data.get('error') or not data.get('images') or len(data.get('images', [])) == 0:
-                print(f"Skipping {os.path.basename(file_path)}: No images or error")
-                continue
-            
-            album_id = generate_uuid()
-            title = data.get('title', '').strip() or 'Untitled Album'
-            description = data.get('description', '').strip() or None
-            url = data.get('url', '')
-            images = data.get('images', [])
-            crawled_at = data.get('crawled_at', datetime.now().isoformat())
-            
-            # Lấy ảnh đầu tiên làm cover
-            cover_url = images[0] if images else None
-            
-            # Parse category từ URL
-            category = parse_category_from_url(url)
-            
-            # Format datetime cho MySQL (YYYY-MM-DD HH:MM:SS)
-            try:
-                dt = datetime.fromisoformat(crawled_at.replace('Z', '+00:00'))
-                mysql_datetime = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                mysql_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Xử lý tags nếu có (format JSON)
-            tags_value = "NULL"
-            if data.get('tags'):
-                tags_json = json.dumps(data.get('tags'), ensure_ascii=False)
-                tags_value = escape_sql_string(tags_json)
-            
-            # Tạo INSERT cho Album (thêm backticks cho các tên cột camelCase)
-            album_sql = f"""INSERT INTO `albums` (
-    `id`, `title`, `description`, `coverUrl`, `category`, `albumCategoryId`, `tags`, `isPublic`, `viewCount`, `createdById`, `createdAt`, `updatedAt`
-) VALUES (
-    {escape_sql_string(album_id)},
-    {escape_sql_string(title)},
-    {escape_sql_string(description)},
-    {escape_sql_string(cover_url)},
-    {escape_sql_string(category)},
-    NULL,
-    {tags_value},
-    1,
-    0,
-    {escape_sql_string(created_by_id)},
-    '{mysql_datetime}',
-    '{mysql_datetime}'
-);"""
-            
-            album_inserts.append(album_sql)
-            
-            # Tạo INSERT cho từng ảnh
-            for img_idx, img_url in enumerate(images):
-                image_id = generate_uuid()
-                # Thumbnail URL có thể giống với URL chính hoặc có thể parse từ URL
-                thumb_url = img_url  # Có thể cần xử lý để tạo thumb URL
-                
-                image_sql = f"""INSERT INTO `album_images` (
-    `id`, `albumId`, `url`, `thumbUrl`, `caption`, `order`, `createdAt`
-) VALUES (
-    {escape_sql_string(image_id)},
-    {escape_sql_string(album_id)},
-    {escape_sql_string(img_url)},
-    {escape_sql_string(thumb_url)},
-    NULL,
-    {img_idx},
-    '{mysql_datetime}'
-);"""
-                
-                image_inserts.append(image_sql)
-            
-            if idx % 100 == 0:
-                print(f"Processed {idx}/{len(files)} albums...")
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+    # Ghi dần ra file: albums đi thẳng vào output, album_images spool ra file tạm
+    # rồi nối vào sau phần albums (giữ thứ tự albums trước, album_images sau như cũ)
+    out = open_sql_output(output_file)
+    images_spool = tempfile.TemporaryFile('w+', encoding='utf-8', dir=os.path.dirname(output_file) or None)
+    
+    write_lines(
+        out,
+        "-- SQL INSERT statements generated from crawled albums",
+        f"-- Generated at: {datetime.now().isoformat()}",
+        f"-- Total albums: {len(files)}",
+        "",
+        "-- Disable foreign key checks temporarily for faster import",
+        "SET FOREIGN_KEY_CHECKS = 0;",
+        "SET AUTOCOMMIT = 0;",
+        "",
+        "-- Start transaction",
+        "START TRANSACTION;",
+        "",
+    )
+    
+    write_album = lambda sql: write_lines(out, sql)
+    write_image = lambda sql: write_lines(images_spool, sql)
+    album_count = 0
+    image_count = 0
+    
+    # Mỗi bảng 1 luồng batch riêng: albums ghi trước, album_images sau (FK albumId)
+    album_batch = image_batch = None
+    if batch_size:
+        album_batch = BatchedInsert(write_album, "albums", ALBUM_COLUMNS, batch_size, max_packet)
+        image_batch = BatchedInsert(write_image, "album_images", IMAGE_COLUMNS, batch_size, max_packet)
+    
+    # Giá trị đã được format sẵn bằng sql_value (trong process con nếu workers > 1)
+    album_files = iter_album_files(files, created_by_id, sql_value, workers)
+    for idx, (file_path, rows, error) in enumerate(album_files, 1):
+        if error:
+            print(f"Error processing {file_path}: {error}")
             continue
+        if rows is None:
+            print(f"Skipping {os.path.basename(file_path)}: No images or error")
+            continue
+        album_values, image_values_list = rows
+        
+        if album_batch:
+            album_batch.add(album_values)
+        else:
+            write_album(single_insert_sql("albums", ALBUM_COLUMNS, album_values))
+        album_count += 1
+        
+        # Tạo INSERT cho từng ảnh
+        for image_values in image_values_list:
+            if image_batch:
+                image_batch.add(image_values)
+            else:
+                write_image(single_insert_sql("album_images", IMAGE_COLUMNS, image_values))
+            image_count += 1
+        
+        if idx % 100 == 0:
+            print(f"Processed {idx}/{len(files)} albums...")
+    
+    if batch_size:
+        album_batch.flush()
+        image_batch.flush()
     
-    # Gộp tất cả SQL statements
-    sql_statements.extend(album_inserts)
-    sql_statements.append("")
-    sql_statements.append("-- Album Images")
-    sql_statements.append("")
-    sql_statements.extend(image_inserts)
-    sql_statements.append("")
-    sql_statements.append("-- Commit transaction")
-    sql_statements.append("COMMIT;")
-    sql_statements.append("")
-    sql_statements.append("-- Re-enable foreign key checks")
-    sql_statements.append("SET FOREIGN_KEY_CHECKS = 1;")
-    sql_statements.append("SET AUTOCOMMIT = 1;")
-    
-    # Ghi vào file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(sql_statements))
+    # Nối phần album_images từ file tạm
+    write_lines(out, "", "-- Album Images", "")
+    images_spool.seek(0)
+    shutil.copyfileobj(images_spool, out, 1 << 20)
+    images_spool.close()
+    
+    write_lines(
+        out,
+        "",
+        "-- Commit transaction",
+        "COMMIT;",
+        "",
+        "-- Re-enable foreign key checks",
+        "SET FOREIGN_KEY_CHECKS = 1;",
+        "SET AUTOCOMMIT = 1;",
+    )
+    out.close()
     
     print(f"\n{'='*60}")
     print(f"SQL generation completed!")
     print(f"{'='*60}")
-    print(f"Total albums: {len(album_inserts)}")
-    print(f"Total images: {len(image_inserts)}")
+    print(f"Total albums: {album_count}")
+    print(f"Total images: {image_count}")
+    if batch_size:
+        print(f"INSERT statements: {album_batch.statements} albums + {image_batch.statements} album_images "
+              f"(batch {batch_size}, max {max_packet} bytes)")
     print(f"Output file: {output_file}")
     print(f"{'='*60}")
 
+def export_load_data_from_json_folder(folder_path, output_dir, created_by_id="00000000-0000-0000-0000-000000000000", workers=1):
+    """
+    Xuất albums.tsv, album_images.tsv và load.sql (LOAD DATA LOCAL INFILE) từ các file JSON trong folder
+    
+    Args:
+        folder_path: Đường dẫn đến folder chứa các file JSON
+        output_dir: Thư mục ghi file TSV + load.sql
+        created_by_id: ID của user tạo album
+        workers: Số process đọc + format file JSON song song (1 = tuần tự)
+    """
+    files = glob.glob(os.path.join(folder_path, "*.json"))
+    files.sort()
+    
+    albums = TsvTable(output_dir, "albums", ALBUM_COLUMNS)
+    album_images = TsvTable(output_dir, "album_images", IMAGE_COLUMNS)
+    
+    album_files = iter_album_files(files, created_by_id, tsv_field, workers)
+    for idx, (file_path, rows, error) in enumerate(album_files, 1):
+        if error:
+            print(f"Error processing {file_path}: {error}")
+            continue
+        if rows is None:
+            print(f"Skipping {os.path.basename(file_path)}: No images or error")
+            continue
+        album_fields, image_fields_list = rows
+        albums.write_fields(album_fields)
+        for image_fields in image_fields_list:
+            album_images.write_fields(image_fields)
+        
+        if idx % 100 == 0:
+            print(f"Processed {idx}/{len(files)} albums...")
+    
+    albums.close()
+    album_images.close()
+    script = write_load_script(output_dir, [albums, album_images])
+    
+    print(f"\n{'='*60}")
+    print(f"LOAD DATA export completed!")
+    print(f"{'='*60}")
+    print(f"Total albums: {albums.count} → {albums.path}")
+    print(f"Total images: {album_images.count} → {album_images.path}")
+    print(f"Load script: {script}")
+    print(f"Import: cd {output_dir} && mysql --local-infile=1 -u root -p girl_pick_db < load.sql")
+    print(f"{'='*60}")
+
 if __name__ == "__main__":
     import sys
     
@@ -181,17 +347,51 @@ if __name__ == "__main__":
     # User ID tạo album (Admin user ID)
     created_by_id = "f267acc4-47e0-4de5-9ac3-fd72cfee1422"
     
-    if len(sys.argv) > 1:
-        folder_path = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    if len(sys.argv) > 3:
-        created_by_id = sys.argv[3]
+    # Tách option --batch-size / --max-packet / --load-data / --workers khỏi tham số theo vị trí
+    batch_size = None
+    max_packet = DEFAULT_MAX_PACKET
+    load_data = False
+    workers = 1
+    args = []
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] == '--batch-size' and i + 1 < len(argv):
+            batch_size = int(argv[i + 1])
+            i += 2
+        elif argv[i] == '--workers' and i + 1 < len(argv):
+            workers = int(argv[i + 1])
+            i += 2
+        elif argv[i] == '--load-data':
+            load_data = True
+            i += 1
+        elif argv[i] == '--max-packet' and i + 1 < len(argv):
+            max_packet = int(argv[i + 1])
+            i += 2
+        else:
+            args.append(argv[i])
+            i += 1
+    
+    if len(args) > 0:
+        folder_path = args[0]
+    if len(args) > 1:
+        output_file = args[1]
+    elif load_data:
+        output_file = "data/albums_load"
+    if len(args) > 2:
+        created_by_id = args[2]
     
     print(f"Reading albums from: {folder_path}")
-    print(f"Output SQL file: {output_file}")
+    print(f"Output {'LOAD DATA dir' if load_data else 'SQL file'}: {output_file}")
     print(f"Created by user ID: {created_by_id}")
+    if batch_size and not load_data:
+        print(f"Batched INSERT: {batch_size} rows/statement, max {max_packet} bytes")
+    if workers > 1:
+        print(f"Parallel JSON parsing: {workers} processes")
     print()
     
-    generate_sql_from_json_folder(folder_path, output_file, created_by_id)
+    if load_data:
+        export_load_data_from_json_folder(folder_path, output_file, created_by_id, workers)
+    else:
+        generate_sql_from_json_folder(folder_path, output_file, created_by_id, batch_size, max_packet, workers)
 
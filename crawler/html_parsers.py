@@ -0,0 +1,502 @@
+"""
+Parse HTML offline bằng lxml (không cần browser).
+Mỗi hàm là bản Python của đoạn JS page.evaluate tương ứng trong crawler,
+giữ nguyên selector, thứ tự ưu tiên và format output.
+
+Cần cài: pip install lxml cssselect
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import quote, urljoin, urlsplit, urlunsplit
+
+import lxml.html
+
+
+SITE_ORIGIN = "https://gaigu1.net"
+
+# Giống JS URL.href: encode ký tự non-ASCII / khoảng trắng, giữ nguyên phần đã encode
+_URL_SAFE_CHARS = ":/?#[]@!$&'()*+,;=%~"
+
+
+def _doc(html: str):
+    return lxml.html.fromstring(html)
+
+
+def _text(el) -> str:
+    """el.textContent?.trim() || ''"""
+    if el is None:
+        return ""
+    return (el.text_content() or "").strip()
+
+
+def _first(root, selector: str):
+    """root.querySelector(selector)"""
+    found = root.cssselect(selector)
+    return found[0] if found else None
+
+
+def _xpath_first(root, xpath: str):
+    found = root.getroottree().xpath(xpath)
+    return found[0] if found else None
+
+
+def _next_element(el):
+    """el.nextElementSibling (bỏ qua comment)"""
+    sibling = el.getnext()
+    while sibling is not None and not isinstance(sibling.tag, str):
+        sibling = sibling.getnext()
+    return sibling
+
+
+def _normalize_url(url: str) -> str:
+    return quote(url, safe=_URL_SAFE_CHARS)
+
+
+def _absolute_site_url(src: str) -> str:
+    """Chuẩn hóa src giống JS trong main.py (//, /, relative → https://gaigu1.net)"""
+    if src.startswith("//"):
+        return "https:" + src
+    if src.startswith("/"):
+        return SITE_ORIGIN + src
+    if not src.startswith("http"):
+        return SITE_ORIGIN + "/" + src
+    return src
+
+
+def _province_from_text(area_text: str) -> str:
+    if "Sài Gòn" in area_text or "Hồ Chí Minh" in area_text:
+        return "Sài Gòn"
+    for province in ("Hà Nội", "Đà Nẵng", "Bình Dương", "Đồng Nai"):
+        if province in area_text:
+            return province
+    return ""
+
+
+PROVINCE_BY_PATH = (
+    ("/sai-gon/", "Sài Gòn"),
+    ("/ha-noi/", "Hà Nội"),
+    ("/da-nang/", "Đà Nẵng"),
+    ("/binh-duong/", "Bình Dương"),
+    ("/dong-nai/", "Đồng Nai"),
+)
+
+INVALID_NAMES = (
+    "Sài Gòn", "Hà Nội", "Bình Dương", "Đà Nẵng", "Đồng Nai",
+    "Tags phổ biến", "Gái gọi", "Gaigu", "Gaigoi",
+)
+
+FILLED_STAR_SELECTOR = 'i.fa-star:not(.white), i.fa-star[style*="color:"]:not([style*="#909090"])'
+
+IMAGE_EXCLUDES = ("placeholder", "logo", "icon", "avatar", "favicon", "banner")
+
+
+# ==================== GirlCrawler ====================
+
+def parse_girls_list(html: str) -> List[Dict]:
+    """Bản offline của JS trong GirlCrawler.crawl_girls_list"""
+    doc = _doc(html)
+    results = []
+
+    for card in doc.cssselect("div.list-escorts"):
+        try:
+            girl = {
+                "name": "",
+                "images": [],
+                "tags": [],
+                "isAvailable": True,
+                "location": "",
+                "province": "",
+                "rating": 0,
+                "totalReviews": 0,
+                "verified": False,
+                "bio": "",
+                "age": None,
+                "price": "",
+                "detailUrl": "",
+                "views": 0,
+            }
+
+            main_link = _first(card, 'a[href*="/gai-goi/"]')
+            if main_link is not None:
+                href = main_link.get("href")
+                if href:
+                    girl["detailUrl"] = href if href.startswith("http") else SITE_ORIGIN + href
+
+            name_el = _first(card, ".content-title")
+            if name_el is not None:
+                girl["name"] = _text(name_el)
+
+            img_el = _first(card, "img.img-escort-res")
+            if img_el is not None:
+                src = img_el.get("src")
+                if src:
+                    girl["images"].append(_absolute_site_url(src))
+
+            location_el = _first(card, ".es-city a")
+            if location_el is not None:
+                girl["location"] = _text(location_el)
+                location_href = location_el.get("href") or ""
+                for path, province in PROVINCE_BY_PATH:
+                    if path in location_href:
+                        girl["province"] = province
+                        break
+
+            price_el = _first(card, ".left-price")
+            if price_el is not None:
+                price_match = re.search(r"(\d+[.,]?\d*\s*K|\d+[.,]?\d*\s*tr)", _text(price_el), re.I)
+                if price_match:
+                    girl["price"] = price_match.group(1).strip()
+
+            rating_el = _first(card, ".content-rating")
+            if rating_el is not None:
+                rating_text = rating_el.text_content() or ""
+                filled_stars = len(rating_el.cssselect(FILLED_STAR_SELECTOR))
+                review_match = re.search(r"\((\d+)\)", rating_text)
+                if review_match:
+                    girl["totalReviews"] = int(review_match.group(1))
+                if filled_stars > 0:
+                    girl["rating"] = filled_stars
+
+            views_el = _first(card, ".viewed-in")
+            if views_el is not None:
+                views_text = _text(views_el)
+                views_match = re.search(r"(\d+[.,]?\d*)\s*K", views_text, re.I)
+                if views_match:
+                    num = float(views_match.group(1).replace(",", ".", 1))
+                    girl["views"] = int(num * 1000 + 0.5)  # Math.round
+                else:
+                    num_match = re.search(r"(\d+)", views_text)
+                    if num_match:
+                        girl["views"] = int(num_match.group(1))
+
+            if _first(card, '.label-public, [class*="verified"], [class*="check"]') is not None:
+                girl["verified"] = True
+
+            for tag in card.cssselect('[class*="tag"], .hashtag, a[href*="tag"]'):
+                tag_text = _text(tag)
+                if tag_text and len(tag_text) < 50 and tag_text not in girl["tags"]:
+                    girl["tags"].append(tag_text)
+
+            if girl["name"] and girl["images"] and girl["name"] not in INVALID_NAMES:
+                results.append(girl)
+        except Exception as e:
+            print(f"⚠️  Lỗi parse card: {e}")
+
+    return results
+
+
+def _detail_img_src(img, page_url: str, attrs) -> str:
+    """img.src || getAttribute(...) theo thứ tự attrs (img.src = src đã resolve tuyệt đối)"""
+    src = img.get("src")
+    if src:
+        return _normalize_url(urljoin(page_url, src))
+    for attr in attrs:
+        value = img.get(attr)
+        if value:
+            return value
+    return ""
+
+
+def parse_girl_detail(html: str, page_url: str) -> Dict:
+    """Bản offline của JS trong GirlCrawler.crawl_girl_detail"""
+    doc = _doc(html)
+    data = {
+        "name": "",
+        "images": [],
+        "tags": [],
+        "bio": "",
+        "location": "",
+        "province": "",
+        "rating": 0,
+        "totalReviews": 0,
+        "verified": False,
+        "age": None,
+        "price": "",
+        "phone": "",
+        "password": "",
+        "birthYear": None,
+        "height": "",
+        "weight": "",
+        "measurements": "",
+        "origin": "",
+        "address": "",
+        "workingHours": "",
+        "services": [],
+    }
+
+    for selector in ("h1", "h2", ".content-title", '[class*="title"]', '[class*="name"]'):
+        name_el = _first(doc, selector)
+        if name_el is not None:
+            name_text = _text(name_el)
+            if name_text and len(name_text) > 2:
+                data["name"] = name_text
+                break
+
+    # Gallery: XPath /html/body/div[7]/div[3] trước, sau đó các selector phổ biến
+    gallery = _xpath_first(doc, "/html/body/div[7]/div[3]")
+    if gallery is None:
+        for selector in (
+            ".gallery", ".photo-gallery", '[class*="gallery"]', '[class*="photo"]',
+            ".thumb-overlay", ".preview", '[id*="preview"]', ".main-image", ".image-gallery",
+        ):
+            el = _first(doc, selector)
+            if el is not None and el.cssselect("img"):
+                gallery = el
+                break
+
+    if gallery is not None:
+        for img in gallery.cssselect("img"):
+            src = _detail_img_src(img, page_url, ("data-src", "data-lazy-src", "data-original", "data-lazy"))
+            if src:
+                lower_src = src.lower()
+                if not any(word in lower_src for word in IMAGE_EXCLUDES):
+                    src = _absolute_site_url(src)
+                    if src not in data["images"]:
+                        data["images"].append(src)
+
+    if not data["images"]:
+        for img in doc.cssselect("img"):
+            src = _detail_img_src(img, page_url, ("data-src",))
+            if src:
+                lower_src = src.lower()
+                if (("photo" in lower_src or "tmb" in lower_src or "media" in lower_src)
+                        and not any(word in lower_src for word in IMAGE_EXCLUDES)):
+                    src = _absolute_site_url(src)
+                    if src not in data["images"]:
+                        data["images"].append(src)
+
+    # Attributes: XPath /html/body/div[5]/div[6]/div[3]/div[1]/div[2] (giống bản JS)
+    attributes_section = _xpath_first(doc, "/html/body/div[5]/div[6]/div[3]/div[1]/div[2]")
+    if attributes_section is not None:
+        label_cols = attributes_section.cssselect(".col-md-4")
+
+        def value_of(label: str):
+            for col in label_cols:
+                if _text(col) == label:
+                    return _next_element(col)
+            return None
+
+        value = value_of("Giá")
+        if value is not None:
+            data["price"] = _text(value)
+
+        value = value_of("Số điện thoại")
+        if value is not None:
+            phone_link = _first(value, 'a[href^="tel:"]')
+            if phone_link is not None:
+                data["phone"] = _text(phone_link) or (phone_link.get("href") or "").replace("tel:", "", 1)
+            else:
+                data["phone"] = _text(value)
+
+        value = value_of("Pass")
+        if value is not None:
+            data["password"] = _text(value)
+
+        value = value_of("Năm sinh")
+        if value is not None:
+            year_match = re.search(r"(\d{4})", _text(value))
+            if year_match:
+                data["birthYear"] = int(year_match.group(1))
+                data["age"] = datetime.now().year - data["birthYear"]
+
+        for label, field in (
+            ("Chiều cao", "height"),
+            ("Cân nặng", "weight"),
+            ("Số đo 3 vòng", "measurements"),
+            ("Xuất xứ", "origin"),
+        ):
+            value = value_of(label)
+            if value is not None:
+                data[field] = _text(value)
+
+        value = value_of("Khu vực")
+        if value is not None:
+            area_text = _text(value)
+            data["location"] = area_text
+            province = _province_from_text(area_text)
+            if province:
+                data["province"] = province
+
+        value = value_of("Địa chỉ")
+        if value is not None:
+            data["address"] = _text(value)
+
+        value = value_of("Làm việc")
+        if value is not None:
+            data["workingHours"] = _text(value)
+
+        value = value_of("Dịch vụ")
+        if value is not None:
+            for span in value.cssselect("span, .a-attr span"):
+                service_text = _text(span)
+                if service_text:
+                    data["services"].append(service_text)
+
+    bio_el = _first(doc, '[class*="bio"], [class*="description"], [class*="content"] p, .content p')
+    if bio_el is not None:
+        data["bio"] = _text(bio_el)
+
+    rating_el = _first(doc, '[class*="rating"], .content-rating')
+    if rating_el is not None:
+        review_match = re.search(r"\((\d+)\)", rating_el.text_content() or "")
+        if review_match:
+            data["totalReviews"] = int(review_match.group(1))
+        filled_stars = len(rating_el.cssselect(FILLED_STAR_SELECTOR))
+        if filled_stars > 0:
+            data["rating"] = filled_stars
+
+    data["verified"] = _first(doc, '[class*="verified"], [class*="check"], .label-public') is not None
+
+    for tag in doc.cssselect('[class*="tag"], .hashtag, a[href*="tag"]'):
+        tag_text = _text(tag)
+        if tag_text:
+            data["tags"].append(tag_text)
+
+    return data
+
+
+# ==================== Album ====================
+
+def parse_album_links(html: str, base_url: str) -> Set[str]:
+    """Bản offline của AlbumListingCrawler.extract_album_links_from_page"""
+    doc = _doc(html)
+    links = set()
+
+    for link in doc.cssselect('a[href*="/album-anh-sex/"]'):
+        href = link.get("href")
+        if not href:
+            continue
+        full_url = _normalize_url(href if href.startswith("http") else urljoin(base_url, href))
+        if "/album-anh-sex/" in full_url and re.search(r"/album-anh-sex/\d+/", full_url):
+            # Loại bỏ fragment và query params
+            parts = urlsplit(full_url)
+            links.add(urlunsplit((parts.scheme, parts.netloc, parts.path, "", "")))
+
+    return links
+
+
+ALBUM_GALLERY_SELECTORS = (
+    ".gallery img",
+    ".swiper-wrapper img",
+    ".album-gallery img",
+    ".photo-gallery img",
+    ".image-gallery img",
+    '[class*="gallery"] img',
+    '[class*="swiper"] img',
+)
+
+ALBUM_CONTAINER_SELECTORS = (
+    ".album-content",
+    ".album-images",
+    ".content",
+    ".main-content",
+    '[class*="album"]',
+)
+
+
+def parse_album_images(html: str, page_url: str) -> Optional[Dict]:
+    """Bản offline của JS trong AlbumCrawler.crawl_album_images
+
+    Chỉ chạy được cách 1 (gallery) và cách 2 (container). Cách 3 lọc theo
+    img.offsetWidth cần layout của browser, nên nếu 2 cách đầu không ra ảnh
+    thì trả về None để caller fallback sang Playwright.
+
+    Returns:
+        {"title", "description", "images"} hoặc None
+    """
+    doc = _doc(html)
+    parts = urlsplit(page_url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+
+    title = (
+        _text(_first(doc, "h1"))
+        or _text(_first(doc, ".album-title"))
+        or _text(_first(doc, "title"))
+    )
+    description = _text(_first(doc, ".album-description")) or _text(_first(doc, ".description"))
+
+    image_urls: Dict[str, None] = {}  # dict giữ thứ tự như Set của JS
+
+    def img_src(img) -> str:
+        return img.get("data-src") or img.get("data-lazy") or img.get("src") or ""
+
+    def full_url(src: str) -> str:
+        return src if src.startswith("http") else _normalize_url(urljoin(origin, src))
+
+    for selector in ALBUM_GALLERY_SELECTORS:
+        for img in doc.cssselect(selector):
+            src = img_src(img)
+            if src and not src.startswith("data:"):
+                image_urls[full_url(src)] = None
+
+    for container_selector in ALBUM_CONTAINER_SELECTORS:
+        container = _first(doc, container_selector)
+        if container is not None:
+            for img in container.cssselect("img"):
+                src = img_src(img)
+                if src and not src.startswith("data:") and "logo" not in src and "icon" not in src:
+                    image_urls[full_url(src)] = None
+
+    if not image_urls:
+        return None
+
+    # Lọc và chuẩn hóa URL (bỏ tham số resize/crop)
+    cleaned_images = []
+    for img_url in image_urls:
+        cleaned_url = img_url.split("?")[0]
+        if cleaned_url not in cleaned_images:
+            cleaned_images.append(cleaned_url)
+
+    return {"title": title, "description": description, "images": cleaned_images}
+
+
+def parse_reviews(html: str) -> List[Dict]:
+    """Bản Python của JS trích review (.card-sub.card-sub-review) trong review_crawler.py
+
+    Nhận cả HTML fragment từ /ajax/load_newfeeds_review lẫn trang đầy đủ.
+    Hàm thuần (không dùng state) nên chạy được trong thread/process pool.
+    """
+    if not html or not html.strip():
+        return []
+    # Bọc trong <div> để card ở top-level của fragment cũng được querySelectorAll tìm thấy
+    root = lxml.html.fragment_fromstring(html, create_parent="div")
+
+    data = []
+    for card in root.cssselect(".card-sub.card-sub-review"):
+        reviewer = _text(_first(card, '.inf-owner a[href*="/user/"]'))
+        date_el = _first(card, ".inf-owner span")
+        date_parts = (date_el.text_content() if date_el is not None else "").split("•")
+        date = date_parts[1].strip() if len(date_parts) > 1 else ""
+        rating = len(card.cssselect(".nf-since-owner .fa-star.pink"))
+        p_tags = card.cssselect("p")
+        content = _text(p_tags[0]) if p_tags else ""
+
+        tags = []
+        if len(p_tags) > 1:
+            tags = [_text(a) for a in p_tags[1].cssselect("a")]
+
+        images = []
+        for img in card.cssselect(".img-reviews img"):
+            src = img.get("src") or ""
+            if src:
+                images.append(src)
+
+        link = _first(card, '.content-rating a[href*="/gai-goi/"]')
+        original_link = (link.get("href") or "") if link is not None else ""
+        likes = _text(_first(card, '[id^="likes_review_"]'))
+        dislikes = _text(_first(card, '[id^="dislikes_review_"]'))
+
+        data.append({
+            "reviewer": reviewer,
+            "date": date,
+            "rating": rating,
+            "content": content,
+            "tags": tags,
+            "images": images,
+            "originalLink": original_link,
+            "likes": likes,
+            "dislikes": dislikes,
+        })
+    return data
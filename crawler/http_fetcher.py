@@ -0,0 +1,198 @@
+"""
+Fetch HTML bằng HTTP thuần (httpx, connection pool keep-alive) cho các trang SSR.
+Không cần mở Chromium; crawler chỉ fallback sang Playwright khi gặp captcha / trang cần JS.
+
+Cần cài thêm: pip install httpx lxml cssselect
+(nếu chưa cài, HTTP_AVAILABLE = False và crawler tự dùng Playwright như cũ)
+"""
+
+import re
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    import httpx
+    import lxml.html  # noqa: F401  (parser dùng trong html_parsers)
+    import cssselect  # noqa: F401
+    HTTP_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTP_AVAILABLE = False
+
+from browser_pool import DEFAULT_HEADERS
+from rate_limiter import AdaptiveRateLimiter, is_captcha
+
+
+# Dấu hiệu trang challenge / cần chạy JS mới có nội dung
+JS_CHALLENGE_MARKERS = (
+    "cf-chl",
+    "challenge-platform",
+    "enable javascript",
+    "bật javascript",
+    "checking your browser",
+)
+
+
+def needs_browser(html: str) -> bool:
+    """True nếu HTML là captcha / challenge hoặc gần như rỗng (nội dung render bằng JS)"""
+    if not html or is_captcha(html):
+        return True
+    lower = html.lower()
+    if any(marker in lower for marker in JS_CHALLENGE_MARKERS):
+        return True
+    body = re.search(r"<body[^>]*>(.*)</body>", lower, re.S)
+    text = re.sub(r"<script.*?</script>|<[^>]+>", " ", body.group(1) if body else lower, flags=re.S)
+    return len(text.split()) < 30
+
+
+def response_validators(response, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """ETag / Last-Modified của response (thiếu header thì giữ giá trị đã gửi đi)"""
+    return {
+        "etag": response.headers.get("etag") or etag,
+        "last_modified": response.headers.get("last-modified") or last_modified,
+    }
+
+
+class HttpFetcher:
+    def __init__(
+        self,
+        max_connections: int = 10,
+        timeout: float = 30.0,
+        headers: Optional[Dict[str, str]] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    ):
+        """
+        Args:
+            max_connections: Số kết nối tối đa trong pool (cũng là số keep-alive giữ lại)
+            timeout: Timeout mỗi request (giây)
+            headers: Headers mặc định (mặc định giống BrowserPool)
+            rate_limiter: Limiter theo host (None = không giới hạn tốc độ)
+        """
+        if not HTTP_AVAILABLE:
+            raise RuntimeError("Chưa cài httpx/lxml/cssselect: pip install httpx lxml cssselect")
+
+        self.client = httpx.AsyncClient(
+            headers=dict(headers or DEFAULT_HEADERS),
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.rate_limiter = rate_limiter
+        # HTML đã tải ở fetch_if_modified, dùng lại cho fetch(url) kế tiếp
+        self._prefetched: Dict[str, str] = {}
+        # URL cần lưu ETag / Last-Modified từ lần fetch(url) thật (chưa có validators để gửi conditional GET)
+        self._wanted_validators: Set[str] = set()
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self.fetched = 0
+        self.not_modified = 0
+        self.fallbacks = 0
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """GET url, trả về HTML
+
+        Returns:
+            HTML nếu trang dùng được, None nếu lỗi HTTP / captcha / cần JS
+            (caller fallback sang Playwright)
+        """
+        html = self._prefetched.pop(url, None)
+        if html is not None:
+            if needs_browser(html):
+                self.fallbacks += 1
+                return None
+            self.fetched += 1
+            return html
+
+        started = await self.rate_limiter.acquire(url) if self.rate_limiter else None
+        try:
+            response = await self.client.get(url, headers=headers)
+        except Exception as e:
+            print(f"⚠️  HTTP lỗi {url}: {e}")
+            if self.rate_limiter:
+                self.rate_limiter.record(url, error=True)
+            self.fallbacks += 1
+            return None
+
+        html = response.text
+        if self.rate_limiter:
+            self.rate_limiter.record(
+                url, status=response.status_code, started=started, captcha=is_captcha(html)
+            )
+
+        if response.status_code != 200:
+            print(f"⚠️  HTTP {response.status_code}: {url}")
+            self.fallbacks += 1
+            return None
+
+        if needs_browser(html):
+            print(f"⚠️  Trang cần browser (captcha/JS): {url}")
+            self.fallbacks += 1
+            return None
+
+        if url in self._wanted_validators:
+            self._wanted_validators.discard(url)
+            self._validators[url] = response_validators(response)
+
+        self.fetched += 1
+        return html
+
+    def want_validators(self, url: str):
+        """Lần fetch(url) kế tiếp giữ lại validators của response (lấy ra bằng pop_validators)"""
+        self._wanted_validators.add(url)
+
+    def pop_validators(self, url: str) -> Dict[str, str]:
+        """Validators của lần fetch(url) thật gần nhất ({} nếu không có / không fetch bằng HTTP)"""
+        self._wanted_validators.discard(url)
+        return self._validators.pop(url, {})
+
+    async def fetch_if_modified(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        keep_body: bool = True,
+    ) -> Tuple[bool, Dict[str, str]]:
+        """Conditional GET (If-None-Match / If-Modified-Since)
+
+        Args:
+            keep_body: Giữ HTML của response 200 cho lần fetch(url) kế tiếp
+
+        Returns:
+            (changed, validators) - changed = False nếu server trả 304.
+            Lỗi / status khác được coi là đã thay đổi để caller crawl bình thường.
+        """
+        request_headers = dict(headers or {})
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+
+        started = await self.rate_limiter.acquire(url) if self.rate_limiter else None
+        try:
+            response = await self.client.get(url, headers=request_headers)
+        except Exception as e:
+            print(f"⚠️  HTTP lỗi {url}: {e}")
+            if self.rate_limiter:
+                self.rate_limiter.record(url, error=True)
+            return True, {}
+
+        validators = response_validators(response, etag, last_modified)
+        if self.rate_limiter:
+            captcha = response.status_code == 200 and is_captcha(response.text)
+            self.rate_limiter.record(url, status=response.status_code, started=started, captcha=captcha)
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            return False, validators
+        if response.status_code == 200 and keep_body:
+            self._prefetched[url] = response.text
+        return True, validators
+
+    async def close(self):
+        await self.client.aclose()
+        if self.fetched or self.fallbacks:
+            print(f"🌐 HTTP: {self.fetched} trang, {self.fallbacks} lần fallback Playwright")
+        if self.not_modified:
+            print(f"🌐 HTTP: {self.not_modified} trang không đổi (304)")
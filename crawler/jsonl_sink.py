@@ -0,0 +1,112 @@
+"""
+Ghi kết quả crawl dạng JSONL (append-only, mỗi dòng 1 record).
+Thay cho việc ghi lại toàn bộ file JSON sau mỗi item (O(n²) I/O).
+
+Export JSONL → JSON array (format cũ):
+    python jsonl_sink.py data/all_girls_details_20251206_120000.jsonl
+    python jsonl_sink.py input.jsonl output.json
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+
+class JsonlSink:
+    def __init__(self, filepath: str, batch_size: int = 50, fsync_interval: float = 5.0):
+        """
+        Args:
+            filepath: Đường dẫn file .jsonl (mở ở chế độ append)
+            batch_size: Số record gom lại trước khi ghi xuống file
+            fsync_interval: Số giây tối thiểu giữa 2 lần fsync
+        """
+        self.filepath = filepath
+        self.batch_size = max(1, batch_size)
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self._buffer = []
+        self._last_fsync = time.monotonic()
+
+        data_dir = os.path.dirname(filepath)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        self._file = open(filepath, 'a', encoding='utf-8')
+
+    def write(self, record: Dict):
+        """Thêm 1 record vào buffer, tự flush khi đủ batch"""
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, force_fsync: bool = False):
+        """Ghi buffer xuống file, fsync nếu đã quá fsync_interval"""
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self._buffer = []
+            self._file.flush()
+
+        now = time.monotonic()
+        if force_fsync or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def close(self):
+        """Flush + fsync lần cuối và đóng file"""
+        if self._file.closed:
+            return
+        self.flush(force_fsync=True)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_jsonl(jsonl_file: str) -> Iterator[Dict]:
+    """Đọc từng record từ file JSONL (bỏ qua dòng hỏng, ví dụ dòng cuối bị cắt khi crash)"""
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  Bỏ qua dòng {line_no} không hợp lệ trong {jsonl_file}")
+
+
+def export_jsonl_to_json(jsonl_file: str, json_file: Optional[str] = None) -> str:
+    """Chuyển file JSONL thành JSON array (cùng format json.dump(..., indent=2) cũ)
+
+    Ghi theo kiểu streaming nên không cần load toàn bộ dữ liệu vào RAM.
+
+    Returns:
+        Đường dẫn file JSON đã ghi
+    """
+    if not json_file:
+        json_file = os.path.splitext(jsonl_file)[0] + '.json'
+
+    count = 0
+    with open(json_file, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for record in iter_jsonl(jsonl_file):
+            item = json.dumps(record, ensure_ascii=False, indent=2)
+            out.write(',\n' if count else '\n')
+            out.write('\n'.join('  ' + line for line in item.split('\n')))
+            count += 1
+        out.write('\n]' if count else ']')
+
+    print(f"💾 Đã export {count} records từ {jsonl_file} → {json_file}")
+    return json_file
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python jsonl_sink.py input.jsonl [output.json]")
+        sys.exit(1)
+    export_jsonl_to_json(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,120 @@
+"""
+Đọc file listing (JSON array hoặc JSONL) theo kiểu streaming.
+
+Parse từng phần tử một bằng json.JSONDecoder.raw_decode trên buffer đọc dần,
+nên file listing vài trăm MB không phải load hết vào RAM trước khi crawl detail.
+Hỗ trợ chia shard bằng start/limit (--start/--limit ở CLI).
+
+Usage:
+    python listing_reader.py listing.json [--start N] [--limit M]   # đếm số item trong shard
+"""
+
+import json
+from itertools import islice
+from typing import Dict, Iterator, Optional, Tuple
+
+from jsonl_sink import iter_jsonl
+
+
+# Kích thước mỗi lần đọc file (ký tự)
+CHUNK_SIZE = 1 << 20
+
+
+def iter_json_array(filepath: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """Yield từng phần tử của file JSON array (format json.dump(list, indent=2) của crawler)"""
+    decoder = json.JSONDecoder()
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+
+        def fill() -> bool:
+            """Đọc thêm 1 chunk, bỏ phần đã parse khỏi buffer"""
+            nonlocal buffer, pos
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def next_char() -> str:
+            """Bỏ qua khoảng trắng, trả về ký tự kế tiếp ('' nếu hết file)"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ''
+
+        if next_char() != '[':
+            raise ValueError(f"{filepath} không phải JSON array")
+        pos += 1
+        if next_char() == ']':
+            return
+
+        while True:
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    # Số có thể bị cắt giữa chừng ("2" của "2.5e3") → chỉ nhận khi sau nó là dấu phân cách
+                    if (end < len(buffer) and buffer[end] in ' \t\r\n,]') or not fill():
+                        break
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+            pos = end
+            yield item
+
+            separator = next_char()
+            if separator == ',':
+                pos += 1
+                next_char()
+            elif separator == ']':
+                return
+            else:
+                raise ValueError(f"{filepath}: JSON không hợp lệ gần vị trí {pos} ({separator!r})")
+
+
+def iter_listing(filepath: str, start: int = 0, limit: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+    """Yield (index, item) của file listing, index bắt đầu từ 1 (theo vị trí trong file)
+
+    Args:
+        filepath: File .json (array) hoặc .jsonl
+        start: Bỏ qua `start` item đầu tiên
+        limit: Chỉ lấy tối đa `limit` item (None = tới hết file)
+    """
+    reader = iter_jsonl(filepath) if filepath.endswith('.jsonl') else iter_json_array(filepath)
+    stop = start + limit if limit is not None else None
+    yield from islice(enumerate(reader, 1), start, stop)
+
+
+def parse_shard_args(argv) -> Tuple[int, Optional[int]]:
+    """Đọc --start N / --limit M từ argv"""
+    start = 0
+    limit = None
+    for i, arg in enumerate(argv):
+        if arg == '--start' and i + 1 < len(argv):
+            start = int(argv[i + 1])
+        elif arg == '--limit' and i + 1 < len(argv):
+            limit = int(argv[i + 1])
+    return start, limit
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python listing_reader.py <listing.json|listing.jsonl> [--start N] [--limit M]")
+        sys.exit(1)
+
+    start, limit = parse_shard_args(sys.argv)
+    count = 0
+    with_detail = 0
+    for _, item in iter_listing(sys.argv[1], start, limit):
+        count += 1
+        if item.get('detailUrl'):
+            with_detail += 1
+    print(f"📄 {sys.argv[1]}: {count} item (start={start}, limit={limit}), {with_detail} có detailUrl")
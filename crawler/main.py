@@ -7,58 +7,130 @@ import asyncio
 import json
 import os
 import re
-import random
 from datetime import datetime
 from typing import List, Dict, Optional
 from playwright.async_api import async_playwright, Browser, Page
 
+from browser_pool import BrowserPool, DEFAULT_USER_AGENT
+from crawl_journal import CrawlJournal
+from http_fetcher import HTTP_AVAILABLE, HttpFetcher
+from jsonl_sink import JsonlSink
+from listing_reader import iter_listing, parse_shard_args
+from page_ready import scroll_and_wait, wait_for_count_stable, wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, is_captcha, limited_goto, rate_from_delay
+from refresh_store import RECORD_UNCHANGED, RefreshStore, check_not_modified, fetched_validators
+from resource_blocker import ResourceBlocker
+from work_queue import run_work_queue
+
+if HTTP_AVAILABLE:
+    from html_parsers import parse_girl_detail, parse_girls_list
+
+# Headers cho trang listing
+LISTING_HEADERS = {
+    'User-Agent': DEFAULT_USER_AGENT
+}
+
+# Headers thật để tránh bot detection khi crawl detail
+DETAIL_HEADERS = {
+    'User-Agent': DEFAULT_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Referer': 'https://gaigu1.net/gai-goi',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1'
+}
+
 class GirlCrawler:
-    def __init__(self, max_concurrent: int = 3, delay_min: float = 2.0, delay_max: float = 5.0):
+    def __init__(self, max_concurrent: int = 3, delay_min: float = 2.0, delay_max: float = 5.0, block_resources: bool = False, use_http: bool = True):
         """
         Args:
             max_concurrent: Số lượng requests đồng thời tối đa (mặc định: 3)
-            delay_min: Delay tối thiểu giữa các requests (giây)
-            delay_max: Delay tối đa giữa các requests (giây)
+            delay_min: Delay tối thiểu giữa các requests lúc bắt đầu (giây)
+            delay_max: Delay tối đa giữa các requests lúc bắt đầu (giây)
+                       Sau đó rate limiter tự tăng/giảm tốc theo phản hồi của server.
+            block_resources: Chặn ảnh/font/video/tracker để giảm băng thông
+            use_http: Fetch HTML bằng HTTP thuần (httpx + lxml), chỉ mở browser khi gặp
+                      captcha / trang cần JS. Tự tắt nếu chưa cài httpx/lxml.
         """
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.base_url = 'https://gaigu1.net/gai-goi'
         self.max_concurrent = max_concurrent
         self.delay_min = delay_min
         self.delay_max = delay_max
+        self.block_resources = block_resources
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.file_lock = asyncio.Lock()  # Lock để đảm bảo thread-safe khi ghi file
+        self.browser_lock = asyncio.Lock()  # Tránh launch 2 browser khi nhiều task cùng fallback
+        # Rate limiter theo host, dùng chung với các crawler khác trong process
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
+        self.fetcher: Optional[HttpFetcher] = None
+        if use_http and HTTP_AVAILABLE:
+            self.fetcher = HttpFetcher(max_connections=max_concurrent * 2, rate_limiter=self.rate_limiter)
         
     async def init_browser(self):
         """Khởi tạo browser"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox']
-        )
-        return self.browser
+        async with self.browser_lock:
+            if self.browser:
+                return self.browser
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
+                headless=True,
+                args=['--no-sandbox', '--disable-setuid-sandbox']
+            )
+            # Pool page dùng chung, giới hạn theo số request đồng thời
+            self.pool = BrowserPool(
+                self.browser,
+                size=self.max_concurrent,
+                headers=DETAIL_HEADERS,
+                blocker=ResourceBlocker.for_crawler("girl") if self.block_resources else None,
+            )
+            return self.browser
     
     async def close_browser(self):
         """Đóng browser"""
         try:
+            if self.fetcher:
+                await self.fetcher.close()
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
     
     async def crawl_girls_list(self, page_number: int = 1, limit: int = 60) -> List[Dict]:
         """Crawl danh sách girls từ trang listing"""
+        url = f"{self.base_url}?page={page_number}" if page_number > 1 else self.base_url
+        
+        # Fast path: site SSR nên data đã có sẵn trong HTML → không cần browser
+        if self.fetcher:
+            html = await self.fetcher.fetch(url, LISTING_HEADERS)
+            if html is not None:
+                girls = parse_girls_list(html)
+                if girls:
+                    print(f"✅ [HTTP] Đã crawl được {len(girls)} girls từ trang {page_number}")
+                    return girls[:limit]
+                # HTML về được nhưng không có card (trang chặn bot / đổi sang render JS) → thử browser
+                print(f"⚠️  [HTTP] Không parse được girl nào từ trang {page_number}")
+            print("↩️  Fallback sang Playwright...")
+        
         if not self.browser:
             await self.init_browser()
         
-        page = await self.browser.new_page()
-        
-        # Set user agent để tránh bị block
-        await page.set_extra_http_headers({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        # Mượn page từ pool (set user agent để tránh bị block)
+        page = await self.pool.acquire(LISTING_HEADERS)
         
         girls = []
         
@@ -66,22 +138,15 @@ class GirlCrawler:
             print(f"🔍 Đang crawl trang {page_number}...")
             
             # Navigate to page
-            url = f"{self.base_url}?page={page_number}" if page_number > 1 else self.base_url
             print(f"📡 Đang truy cập: {url}")
             
-            # Wait for full page load (including all resources)
-            await page.goto(url, wait_until='networkidle', timeout=60000)
-            
-            # Wait a bit more for any lazy-loaded content
-            await page.wait_for_timeout(3000)
-            
-            # Scroll to trigger lazy loading if any
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(2000)
+            # Trang SSR: chỉ cần DOM, đợi card xuất hiện thay vì networkidle + sleep
+            await limited_goto(page, url, self.rate_limiter, wait_until='domcontentloaded', timeout=60000)
+            if await wait_for_selector_or_fallback(page, 'div.list-escorts', timeout=15000, fallback_ms=3000):
+                await wait_for_count_stable(page, 'div.list-escorts', timeout=3000)
             
-            # Scroll back up
-            await page.evaluate("window.scrollTo(0, 0)")
-            await page.wait_for_timeout(1000)
+            # Scroll to trigger lazy loading if any, rồi scroll back up
+            await scroll_and_wait(page, 'div.list-escorts', timeout=2000, to_top=True)
             
             # Debug: Check page content
             page_title = await page.title()
@@ -278,49 +343,41 @@ class GirlCrawler:
             print(f"❌ Lỗi khi crawl trang {page_number}: {str(e)}")
             return []
         finally:
-            await page.close()
+            await self.pool.release(page)
     
     async def crawl_girl_detail(self, url: str) -> Optional[Dict]:
         """Crawl thông tin chi tiết từ trang detail"""
+        # Fast path: parse HTML bằng lxml, chỉ dùng browser khi captcha / thiếu dữ liệu
+        if self.fetcher:
+            html = await self.fetcher.fetch(url, DETAIL_HEADERS)
+            if html is not None:
+                girl = parse_girl_detail(html, url)
+                if girl.get('name') or girl.get('images'):
+                    print(f"✅ [HTTP] Đã crawl detail: {girl.get('name', 'N/A')} - {len(girl.get('images', []))} ảnh")
+                    return girl
+                print("⚠️  HTML không có dữ liệu (có thể render bằng JS), fallback Playwright...")
+        
         if not self.browser:
             await self.init_browser()
         
-        page = await self.browser.new_page()
-        
-        # Set realistic headers to avoid bot detection
-        await page.set_extra_http_headers({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Referer': 'https://gaigu1.net/gai-goi',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'same-origin',
-            'Sec-Fetch-User': '?1'
-        })
+        # Mượn page từ pool (đã có sẵn headers thật để tránh bot detection)
+        page = await self.pool.acquire(DETAIL_HEADERS)
         
         try:
             print(f"🔍 Đang crawl detail: {url}")
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await page.wait_for_timeout(3000)
+            await limited_goto(page, url, self.rate_limiter, wait_until='domcontentloaded', timeout=30000)
+            await wait_for_selector_or_fallback(page, '.attributes, h1, [class*="gallery"]', timeout=8000, fallback_ms=1000)
             
             # Check if blocked by captcha
             page_content = await page.content()
-            if 'verify' in page_content.lower() and 'human' in page_content.lower():
-                print("⚠️  Phát hiện captcha, đợi thêm 5 giây...")
-                await page.wait_for_timeout(5000)
-                # Try to wait for content to load
-                try:
-                    await page.wait_for_selector('.attributes, h1, [class*="gallery"]', timeout=10000)
-                except:
-                    pass
+            if is_captcha(page_content):
+                print("⚠️  Phát hiện captcha, đợi nội dung load...")
+                self.rate_limiter.record(url, captcha=True)
+                # Đợi nội dung thật thay vì sleep cố định 5 giây
+                await wait_for_selector_or_fallback(page, '.attributes, [class*="gallery"]', timeout=15000, fallback_ms=2000)
             
             # Scroll to load lazy images
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(2000)
+            await scroll_and_wait(page, 'img', timeout=2000)
             
             girl = await page.evaluate("""
                 () => {
@@ -676,7 +733,7 @@ class GirlCrawler:
             traceback.print_exc()
             return None
         finally:
-            await page.close()
+            await self.pool.release(page)
     
     def sanitize_filename(self, name: str) -> str:
         """Chuyển tên gái thành filename hợp lệ"""
@@ -762,10 +819,6 @@ class GirlCrawler:
                         girl['detailUrl'] = detail_url  # Đảm bảo giữ lại detailUrl
                     else:
                         print(f"⚠️  Không crawl được detail cho: {girl.get('name', 'N/A')}")
-                    
-                    # Delay để tránh bị block (2-3 giây)
-                    if i < len(girls):
-                        await asyncio.sleep(2)
                 else:
                     print(f"⚠️  Girl {i} không có detailUrl, bỏ qua")
         
@@ -796,11 +849,6 @@ class GirlCrawler:
             girls = await self.crawl_girls_list(page_num, 60)
             all_girls.extend(girls)
             print(f"✅ Đã có tổng cộng {len(all_girls)} girls\n")
-            
-            # Delay between pages
-            if page_num < end_page:
-                print(f"⏳ Đợi 5 giây trước khi crawl trang tiếp theo...\n")
-                await asyncio.sleep(5)
         
         # Giai đoạn 2: Crawl detail nếu được yêu cầu
         if crawl_details:
@@ -818,10 +866,6 @@ class GirlCrawler:
                         girl['detailUrl'] = detail_url
                     else:
                         print(f"⚠️  Không crawl được detail")
-                    
-                    # Delay để tránh bị block
-                    if i < len(all_girls):
-                        await asyncio.sleep(2)
                 else:
                     print(f"⚠️  Girl {i} không có detailUrl")
         
@@ -865,10 +909,6 @@ class GirlCrawler:
             all_girls.extend(girls)
             print(f"✅ Đã có tổng cộng {len(all_girls)} girls\n")
             
-            # Delay between pages
-            print(f"⏳ Đợi 5 giây trước khi crawl trang tiếp theo...\n")
-            await asyncio.sleep(5)
-            
             current_page += 1
         
         # Lưu danh sách listing
@@ -884,7 +924,7 @@ class GirlCrawler:
             "listing_file": result.get("file", "")
         }
     
-    async def _crawl_one_girl_detail(self, girl: Dict, index: int, total: int, save_individual: bool = True, save_combined: bool = False, combined_file: str = None, all_details: list = None) -> tuple:
+    async def _crawl_one_girl_detail(self, girl: Dict, index: int, total: int, save_individual: bool = True, save_combined: bool = False, combined_file: str = None, all_details: list = None, combined_sink: Optional[JsonlSink] = None, journal: Optional[CrawlJournal] = None, refresh: Optional[RefreshStore] = None) -> tuple:
         """Crawl detail cho 1 gái (dùng trong concurrent crawling)
         
         Returns:
@@ -896,12 +936,21 @@ class GirlCrawler:
             
             girl_name = girl.get('name', 'N/A')[:40]
             print(f"[{index}/{total}] 🔍 Đang crawl: {girl_name}...")
+            if journal:
+                journal.mark_started(girl['detailUrl'])
             
             try:
-                # Random delay để tránh pattern detection
-                delay = random.uniform(self.delay_min, self.delay_max)
-                await asyncio.sleep(delay)
+                # Refresh: server trả 304 → trang không đổi, bỏ qua parse + ghi
+                validators = {}
+                if refresh:
+                    not_modified, validators = await check_not_modified(refresh, self.fetcher, girl['detailUrl'], DETAIL_HEADERS)
+                    if not_modified:
+                        print(f"[{index}/{total}] ⏭️  Không đổi (304): {girl_name[:30]}...")
+                        if journal:
+                            journal.mark_done(girl['detailUrl'], None)
+                        return (True, girl)
                 
+                # Tốc độ do rate limiter quyết định (đợi trong crawl_girl_detail)
                 detail_data = await self.crawl_girl_detail(girl['detailUrl'])
                 if detail_data:
                     # Merge detail data
@@ -909,14 +958,25 @@ class GirlCrawler:
                     girl.update(detail_data)
                     girl['detailUrl'] = detail_url
                     
+                    # Refresh: hash record giống lần trước → không ghi lại output
+                    if refresh and refresh.commit(detail_url, girl, validators or fetched_validators(self.fetcher, detail_url)) == RECORD_UNCHANGED:
+                        print(f"[{index}/{total}] ⏭️  Không đổi: {girl_name[:30]}...")
+                        if journal:
+                            journal.mark_done(detail_url, None)
+                        return (True, girl)
+                    
                     # Lưu vào file riêng nếu được yêu cầu
+                    filepath = None
                     if save_individual:
                         filepath = self.save_girl_detail_to_file(girl)
                         if filepath:
                             print(f"[{index}/{total}] ✅ {girl_name[:30]}... → {os.path.basename(filepath)}")
                     
                     # Lưu vào combined file nếu được yêu cầu (incremental)
-                    if save_combined and combined_file and all_details is not None:
+                    if save_combined and combined_sink is not None:
+                        # JSONL append-only: không ghi lại cả file, không cần lock
+                        combined_sink.write(girl)
+                    elif save_combined and combined_file and all_details is not None:
                         async with self.file_lock:  # Thread-safe
                             all_details.append(girl)
                             # Lưu ngay sau mỗi item
@@ -926,43 +986,88 @@ class GirlCrawler:
                             except Exception as e:
                                 print(f"⚠️  Lỗi khi lưu combined file: {e}")
                     
+                    if journal:
+                        journal.mark_done(detail_url, filepath or combined_file)
                     return (True, girl)
                 else:
                     print(f"[{index}/{total}] ⚠️  Không crawl được: {girl_name[:30]}...")
+                    if journal:
+                        journal.mark_failed(girl['detailUrl'], "empty detail")
                     return (False, girl)
             except Exception as e:
                 print(f"[{index}/{total}] ❌ Lỗi: {girl_name[:30]}... - {str(e)}")
+                if journal:
+                    journal.mark_failed(girl['detailUrl'], str(e))
                 return (False, girl)
     
-    async def crawl_details_from_listing_file(self, listing_file: str, save_individual: bool = True, batch_size: int = None, save_combined: bool = False):
+    async def crawl_details_from_listing_file(self, listing_file: str, save_individual: bool = True, batch_size: int = None, save_combined: bool = False, combined_jsonl: bool = False, journal_file: str = None, start: int = 0, limit: Optional[int] = None, combined_path: Optional[str] = None, refresh_db: Optional[str] = None):
         """Đọc file listing và crawl detail cho từng gái (concurrent)
         
         Args:
-            listing_file: Đường dẫn đến file JSON chứa danh sách girls
+            listing_file: Đường dẫn đến file JSON array / JSONL chứa danh sách girls (đọc streaming)
             save_individual: Nếu True, lưu mỗi gái vào file riêng với tên gái
-            batch_size: Số lượng girls crawl mỗi batch (None = tất cả cùng lúc)
+            batch_size: Số item tối đa chờ trong hàng đợi (None = 2 x max_concurrent).
+                        Không còn đợi hết batch mới chạy tiếp.
             save_combined: Nếu True, gộm tất cả vào 1 JSON file và lưu incremental
+            combined_jsonl: Nếu True (cùng save_combined), ghi append-only ra file .jsonl
+                            thay vì ghi lại toàn bộ JSON sau mỗi item
+            journal_file: File SQLite journal (None = không dùng). Khi chạy lại, bỏ qua
+                          URL đã xong và chỉ thử lại URL lỗi chưa vượt quá số lần thử
+            start: Bỏ qua `start` item đầu của file listing (chia shard)
+            limit: Chỉ crawl tối đa `limit` item tính từ start (None = tới hết file)
+            combined_path: Đường dẫn file gộm (None = data/all_girls_details_<timestamp>)
+            refresh_db: File SQLite của chế độ refresh (None = tắt). Gửi ETag / Last-Modified
+                        của lần trước, bỏ qua trang 304 và record không đổi; record mới /
+                        thay đổi ghi thêm vào data/girls_delta_<timestamp>.jsonl
         """
         # Đọc file listing
         if not os.path.exists(listing_file):
             print(f"❌ Không tìm thấy file: {listing_file}")
             return None
         
-        with open(listing_file, 'r', encoding='utf-8') as f:
-            girls = json.load(f)
+        # Journal: bỏ qua URL đã crawl xong / đã hết lượt thử từ các lần chạy trước
+        journal = None
+        if journal_file:
+            journal = CrawlJournal(journal_file)
+            journal.print_progress("Journal trước khi chạy")
+        
+        # Refresh: chỉ ghi những gì thay đổi so với lần crawl trước
+        refresh = None
+        if refresh_db:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            refresh = RefreshStore(refresh_db, delta_file=os.path.join("data", f"girls_delta_{timestamp}.jsonl"))
+        
+        # Đọc listing streaming: item vào hàng đợi ngay khi parse xong, không json.load cả file.
+        # Chỉ giữ toàn bộ listing khi cần ghi all_details_*.json ở cuối.
+        keep_all = not save_individual and not save_combined
+        girls = []
+        skipped_by_journal = 0
         
-        # Lọc những girls có detailUrl
-        valid_girls = [(i, girl) for i, girl in enumerate(girls, 1) if girl.get('detailUrl')]
+        def valid_girls():
+            nonlocal skipped_by_journal
+            for index, girl in iter_listing(listing_file, start, limit):
+                if keep_all:
+                    girls.append(girl)
+                if not girl.get('detailUrl'):
+                    continue
+                if journal and not journal.should_crawl(girl['detailUrl']):
+                    skipped_by_journal += 1
+                    continue
+                yield index, girl
         
         print(f"\n{'='*50}")
-        print(f"🔍 GIAI ĐOẠN 2: Crawl detail cho {len(valid_girls)} girls")
+        print(f"🔍 GIAI ĐOẠN 2: Crawl detail girls (đọc listing streaming)")
         print(f"   Từ file: {listing_file}")
+        if start or limit is not None:
+            print(f"   Shard: start={start}, limit={limit}")
         print(f"   Lưu riêng từng file: {save_individual}")
         print(f"   Gộm vào 1 JSON: {save_combined}")
         print(f"   Concurrent: {self.max_concurrent} requests")
-        print(f"   Delay: {self.delay_min}-{self.delay_max} giây")
+        print(f"   Delay ban đầu: {self.delay_min}-{self.delay_max} giây (rate limiter tự điều chỉnh)")
         if batch_size:
-            print(f"   Batch size: {batch_size}")
+            print(f"   Hàng đợi tối đa: {batch_size} item")
+        if refresh:
+            print(f"   Refresh: {refresh_db} (delta → {refresh.delta_file})")
         print(f"{'='*50}\n")
         
         success_count = 0
@@ -970,60 +1075,56 @@ class GirlCrawler:
         
         # Tạo file combined nếu cần
         combined_file = None
+        combined_sink = None
         all_details = []
         if save_combined:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            combined_file = os.path.join("data", f"all_girls_details_{timestamp}.json")
-            os.makedirs("data", exist_ok=True)
+            if combined_path:
+                combined_file = combined_path
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                extension = "jsonl" if combined_jsonl else "json"
+                combined_file = os.path.join("data", f"all_girls_details_{timestamp}.{extension}")
+            os.makedirs(os.path.dirname(combined_file) or ".", exist_ok=True)
+            if combined_jsonl:
+                combined_sink = JsonlSink(combined_file)
             print(f"💾 File gộm: {combined_file}\n")
         
-        # Crawl theo batch hoặc tất cả cùng lúc
-        if batch_size:
-            # Crawl theo batch
-            for batch_start in range(0, len(valid_girls), batch_size):
-                batch_end = min(batch_start + batch_size, len(valid_girls))
-                batch = valid_girls[batch_start:batch_end]
-                
-                print(f"\n📦 Batch {batch_start//batch_size + 1}: {len(batch)} girls\n")
-                
-                # Tạo tasks cho batch này
-                tasks = [
-                    self._crawl_one_girl_detail(girl, index, len(valid_girls), save_individual, save_combined, combined_file, all_details)
-                    for index, girl in batch
-                ]
-                
-                # Chờ tất cả tasks trong batch hoàn thành
-                results = await asyncio.gather(*tasks)
-                
-                # Đếm kết quả
-                for success, updated_girl in results:
-                    if success:
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                
-                # Delay giữa các batch
-                if batch_end < len(valid_girls):
-                    batch_delay = random.uniform(5, 10)
-                    print(f"\n⏳ Đợi {batch_delay:.1f} giây trước batch tiếp theo...\n")
-                    await asyncio.sleep(batch_delay)
-        else:
-            # Crawl tất cả cùng lúc (giới hạn bởi semaphore)
-            print(f"🚀 Bắt đầu crawl {len(valid_girls)} girls (concurrent: {self.max_concurrent})\n")
-            
-            tasks = [
-                self._crawl_one_girl_detail(girl, index, len(valid_girls), save_individual, save_combined, combined_file, all_details)
-                for index, girl in valid_girls
-            ]
-            
-            results = await asyncio.gather(*tasks)
+        try:
+            # Hàng đợi streaming: max_concurrent worker luôn bận, không đợi item chậm nhất của batch.
+            # batch_size (nếu có) chỉ còn là số item tối đa chờ trong hàng đợi.
+            window = batch_size or self.max_concurrent * 2
+            # Không biết trước tổng số item khi đọc streaming
+            total = start + limit if limit is not None else "?"
+            print(f"🚀 Bắt đầu crawl girls ({self.max_concurrent} worker, hàng đợi tối đa {window})\n")
             
-            # Đếm kết quả
-            for success, updated_girl in results:
-                if success:
+            def count_result(item, result):
+                nonlocal success_count, failed_count
+                if isinstance(result, Exception):
+                    print(f"❌ Lỗi không mong muốn: {result}")
+                    failed_count += 1
+                elif result[0]:
                     success_count += 1
                 else:
                     failed_count += 1
+            
+            await run_work_queue(
+                valid_girls(),
+                lambda item: self._crawl_one_girl_detail(item[1], item[0], total, save_individual, save_combined, combined_file, all_details, combined_sink, journal, refresh),
+                workers=self.max_concurrent,
+                on_result=count_result,
+                window=window,
+            )
+            
+        finally:
+            # Flush + fsync phần còn lại trong buffer (kể cả khi bị dừng giữa chừng)
+            if combined_sink:
+                combined_sink.close()
+            if journal:
+                journal.print_progress("Journal sau khi chạy")
+                journal.close()
+            if refresh:
+                refresh.print_summary("Refresh girls")
+                refresh.close()
         
         # Lưu tất cả vào 1 file tổng hợp (nếu cần và chưa lưu incremental)
         if not save_individual and not save_combined:
@@ -1033,19 +1134,25 @@ class GirlCrawler:
             print(f"\n💾 Đã lưu tất cả detail vào: {result.get('file', '')}")
         
         # Nếu đã lưu incremental, chỉ thông báo
-        if save_combined and combined_file:
+        if combined_sink:
+            print(f"\n💾 Đã lưu tất cả {combined_sink.count} girls vào: {combined_file}")
+            print(f"💡 Export sang JSON array: python jsonl_sink.py \"{combined_file}\"")
+        elif save_combined and combined_file:
             print(f"\n💾 Đã lưu tất cả {len(all_details)} girls vào: {combined_file}")
         
         print(f"\n{'='*50}")
         print(f"✅ HOÀN THÀNH CRAWL DETAIL")
         print(f"   ✅ Thành công: {success_count}")
         print(f"   ❌ Thất bại: {failed_count}")
-        if len(valid_girls) > 0:
-            print(f"   📊 Tỷ lệ: {success_count/len(valid_girls)*100:.1f}%")
+        if skipped_by_journal:
+            print(f"   ⏭️  Bỏ qua theo journal: {skipped_by_journal}")
+        total_crawled = success_count + failed_count
+        if total_crawled > 0:
+            print(f"   📊 Tỷ lệ: {success_count/total_crawled*100:.1f}%")
         print(f"{'='*50}\n")
         
         return {
-            "total": len(valid_girls),
+            "total": total_crawled,
             "success": success_count,
             "failed": failed_count
         }
@@ -1071,7 +1178,10 @@ async def main():
         elif arg == '--batch-size' and i + 1 < len(sys.argv):
             batch_size = int(sys.argv[i + 1])
     
-    crawler = GirlCrawler(max_concurrent=max_concurrent, delay_min=delay_min, delay_max=delay_max)
+    block_resources = '--block-resources' in sys.argv  # Chặn ảnh/font/video/tracker
+    use_http = '--browser-only' not in sys.argv  # Tắt fast path HTTP, luôn dùng Playwright
+    
+    crawler = GirlCrawler(max_concurrent=max_concurrent, delay_min=delay_min, delay_max=delay_max, block_resources=block_resources, use_http=use_http)
     
     try:
         # Parse arguments
@@ -1089,6 +1199,19 @@ async def main():
                 break
         save_individual = '--save-individual' in sys.argv or '--individual' in sys.argv
         save_combined = '--save-combined' in sys.argv or '--combined' in sys.argv or '--gop' in sys.argv
+        combined_jsonl = '--jsonl' in sys.argv  # Ghi file gộm dạng JSONL append-only
+        journal_file = None  # SQLite journal để resume (--journal FILE)
+        for i, arg in enumerate(sys.argv):
+            if arg == '--journal' and i + 1 < len(sys.argv):
+                journal_file = sys.argv[i + 1]
+        refresh_db = None  # SQLite refresh: chỉ ghi record mới / thay đổi (--refresh FILE)
+        for i, arg in enumerate(sys.argv):
+            if arg == '--refresh' and i + 1 < len(sys.argv):
+                refresh_db = sys.argv[i + 1]
+        start, limit = parse_shard_args(sys.argv)  # --start N --limit M: chỉ crawl 1 shard của listing
+        for i, arg in enumerate(sys.argv):
+            if arg in ('--journal', '--refresh', '--start', '--limit') and i + 1 < len(sys.argv) and sys.argv[i + 1] in args:
+                args.remove(sys.argv[i + 1])
         auto_mode = '--auto' in sys.argv or '--full' in sys.argv  # Tự động crawl listing + detail
         
         # Mode 0: Auto mode - Tự động crawl listing + detail
@@ -1137,7 +1260,10 @@ async def main():
                 listing_file, 
                 save_individual, 
                 batch_size,
-                save_combined
+                save_combined,
+                combined_jsonl,
+                journal_file,
+                refresh_db=refresh_db
             )
             
             print(f"\n{'='*60}")
@@ -1159,12 +1285,20 @@ async def main():
             print(f"   📁 File: {detail_from_file}")
             print(f"   💾 Lưu riêng từng file: {save_individual}")
             print(f"   💾 Gộm vào 1 JSON: {save_combined}")
+            if save_combined and combined_jsonl:
+                print(f"   📝 Ghi dạng JSONL (append-only)")
+            if journal_file:
+                print(f"   📒 Journal: {journal_file}")
+            if refresh_db:
+                print(f"   🔁 Refresh: {refresh_db}")
+            if start or limit is not None:
+                print(f"   🧩 Shard: --start {start} --limit {limit}")
             print(f"   🔄 Concurrent: {max_concurrent}")
             print(f"   ⏱️  Delay: {delay_min}-{delay_max}s")
             if batch_size:
                 print(f"   📦 Batch size: {batch_size}")
             print()
-            result = await crawler.crawl_details_from_listing_file(detail_from_file, save_individual, batch_size, save_combined)
+            result = await crawler.crawl_details_from_listing_file(detail_from_file, save_individual, batch_size, save_combined, combined_jsonl, journal_file, start, limit, refresh_db=refresh_db)
             print(f"\n{'='*50}")
             print("✅ HOÀN THÀNH!")
             print(f"{'='*50}")
@@ -1217,8 +1351,6 @@ async def main():
                         girls = await crawler.crawl_girls_list(page_num, 60)
                         all_girls.extend(girls)
                         print(f"✅ Đã có tổng cộng {len(all_girls)} girls\n")
-                        if page_num < end_page:
-                            await asyncio.sleep(5)
                     
                     # Crawl detail và lưu riêng
                     print(f"\n{'='*50}")
@@ -1236,7 +1368,6 @@ async def main():
                                 filepath = crawler.save_girl_detail_to_file(girl)
                                 if filepath:
                                     print(f"   ✅ {os.path.basename(filepath)}")
-                            await asyncio.sleep(2)
                     
                     result = {"totalCrawled": len(all_girls)}
                 else:
@@ -7,80 +7,128 @@ import asyncio
 import json
 import os
 import re
-import random
 from datetime import datetime
 from typing import List, Dict, Optional
 from playwright.async_api import async_playwright, Browser, Page
 
+from browser_pool import BrowserPool, DEFAULT_USER_AGENT
+from crawl_journal import CrawlJournal
+from http_fetcher import HTTP_AVAILABLE, HttpFetcher
+from jsonl_sink import JsonlSink
+from listing_reader import iter_listing, parse_shard_args
+from page_ready import wait_for_count_stable, wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, is_captcha, limited_goto, rate_from_delay
+from refresh_store import RECORD_UNCHANGED, RefreshStore, check_not_modified, fetched_validators
+from resource_blocker import ResourceBlocker
+from work_queue import run_work_queue
+
+# Headers thật cho trang listing
+LISTING_HEADERS = {
+    'User-Agent': DEFAULT_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Referer': 'https://gaigu1.net/',
+}
+
+# Headers thật cho trang detail
+DETAIL_HEADERS = {
+    'User-Agent': DEFAULT_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Referer': 'https://gaigu1.net/phim-sex',
+}
+
+# Crawl listing: số trang lỗi liên tiếp tối đa trước khi dừng (trang lỗi không tính là hết trang)
+MAX_CONSECUTIVE_FAILED_PAGES = 10
+
 class MovieCrawler:
-    def __init__(self, max_concurrent: int = 3, delay_min: float = 2.0, delay_max: float = 5.0):
+    def __init__(self, max_concurrent: int = 3, delay_min: float = 2.0, delay_max: float = 5.0, block_resources: bool = False):
         """
         Args:
             max_concurrent: Số lượng requests đồng thời tối đa (mặc định: 3)
-            delay_min: Delay tối thiểu giữa các requests (giây)
-            delay_max: Delay tối đa giữa các requests (giây)
+            delay_min: Delay tối thiểu giữa các requests lúc bắt đầu (giây)
+            delay_max: Delay tối đa giữa các requests lúc bắt đầu (giây)
+                       Sau đó rate limiter tự tăng/giảm tốc theo phản hồi của server.
+            block_resources: Chặn ảnh/font/video/tracker để giảm băng thông
         """
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.base_url = 'https://gaigu1.net/phim-sex'
         self.max_concurrent = max_concurrent
         self.delay_min = delay_min
         self.delay_max = delay_max
+        self.block_resources = block_resources
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.file_lock = asyncio.Lock()  # Lock để đảm bảo thread-safe khi ghi file
+        self.browser_lock = asyncio.Lock()  # Tránh launch nhiều browser khi các trang listing chạy song song
+        # Rate limiter theo host, dùng chung với các crawler khác trong process
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
+        # Chỉ dùng cho conditional GET ở chế độ refresh (detail phim vẫn crawl bằng Playwright)
+        self.fetcher: Optional[HttpFetcher] = None
         
     async def init_browser(self):
         """Khởi tạo browser"""
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-setuid-sandbox']
+                )
+                # Pool page dùng chung, giới hạn theo số request đồng thời
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=self.max_concurrent,
+                    headers=DETAIL_HEADERS,
+                    blocker=ResourceBlocker.for_crawler("movie") if self.block_resources else None,
+                )
         return self.browser
     
     async def close_browser(self):
         """Đóng browser"""
         try:
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        if self.fetcher:
+            await self.fetcher.close()
+            self.fetcher = None
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
     
-    async def crawl_movies_list(self, page_number: int = 1, limit: int = 60) -> List[Dict]:
+    async def crawl_movies_list(self, page_number: int = 1, limit: int = 60) -> Optional[List[Dict]]:
         """Crawl danh sách phim từ trang listing
         
         Args:
             page_number: Số trang (bắt đầu từ 1)
             limit: Số lượng phim tối đa (mặc định 60)
+        
+        Returns:
+            List phim, None nếu tải trang lỗi (khác với trang rỗng)
         """
         await self.init_browser()
         
         url = f"{self.base_url}?page={page_number}" if page_number > 1 else self.base_url
         print(f"🔍 Đang crawl: {url}")
         
-        page = await self.browser.new_page()
+        # Mượn page từ pool (đã set sẵn headers thật)
+        page = await self.pool.acquire(LISTING_HEADERS)
         
         try:
-            # Set realistic headers
-            await page.set_extra_http_headers({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://gaigu1.net/',
-            })
-            
-            await page.goto(url, wait_until='networkidle', timeout=60000)
-            await asyncio.sleep(3)  # Wait for content to load
+            await limited_goto(page, url, self.rate_limiter, wait_until='domcontentloaded', timeout=60000)
             
-            # Wait for the content container - try multiple selectors
-            try:
-                await page.wait_for_selector('div.content-row, .row.content-row, [class*="content-row"], .col-6.col-sm-6.col-md-4', timeout=15000)
-            except:
+            # Wait for the content container - try multiple selectors, rồi đợi số card ổn định
+            if await wait_for_selector_or_fallback(page, 'div.content-row, .row.content-row, [class*="content-row"], .col-6.col-sm-6.col-md-4', timeout=15000, fallback_ms=2000):
+                await wait_for_count_stable(page, '.col-6.col-sm-6.col-md-4', timeout=3000)
+            else:
                 print("⚠️  Không tìm thấy content-row, thử tiếp...")
-                await asyncio.sleep(2)
             
             # Debug: Check page content
             page_title = await page.title()
@@ -470,9 +518,9 @@ class MovieCrawler:
             print(f"❌ Lỗi khi crawl movies list: {str(e)}")
             import traceback
             traceback.print_exc()
-            return []
+            return None
         finally:
-            await page.close()
+            await self.pool.release(page)
     
     def save_to_json(self, movies: List[Dict], filename: str = None) -> Dict:
         """Lưu vào file JSON"""
@@ -492,19 +540,35 @@ class MovieCrawler:
         print(f"💾 Đã lưu {len(movies)} phim vào {filepath}")
         return {"saved": len(movies), "file": filepath}
     
+    async def _crawl_listing_page_safe(self, page_number: int) -> Optional[List[Dict]]:
+        """Crawl 1 trang listing cho sliding window (lỗi → None, không tính là trang rỗng)
+
+        Các trang trong cùng window được rate limiter giãn ra, không bắn cùng lúc.
+        """
+        try:
+            return await self.crawl_movies_list(page_number, 60)
+        except Exception as e:
+            print(f"❌ Lỗi crawl trang {page_number}: {e}")
+            return None
+    
     async def crawl_all_listing_pages(self, start_page: int = 1, max_pages: int = None, save_interval: int = 50, concurrent_pages: int = 3):
         """Crawl tất cả các trang listing
         
+        Các trang được fetch theo sliding window `concurrent_pages` trang cùng lúc,
+        nhưng kết quả luôn được xử lý theo đúng thứ tự số trang.
+        
         Args:
             start_page: Trang bắt đầu
             max_pages: Số trang tối đa (None = tự động detect)
             save_interval: Lưu file sau mỗi N trang (mặc định: 50)
+            concurrent_pages: Số trang listing fetch đồng thời (1 = tuần tự)
         
         Returns:
             Dict: {"movies": List[Dict], "listing_file": str}
         """
         all_movies = []
-        current_page = start_page
+        concurrent_pages = max(1, concurrent_pages or 1)
+        end_page = start_page + max_pages - 1 if max_pages else None
         
         # Tạo filename với timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -513,51 +577,74 @@ class MovieCrawler:
         print(f"\n{'='*50}")
         print(f"📋 GIAI ĐOẠN 1: Crawl listing pages")
         if max_pages:
-            print(f"   Từ trang {start_page} đến {start_page + max_pages - 1}")
+            print(f"   Từ trang {start_page} đến {end_page}")
         else:
             print(f"   Từ trang {start_page} (tự động detect số trang)")
+        print(f"   🔄 Fetch đồng thời: {concurrent_pages} trang")
         print(f"   💾 Lưu sau mỗi {save_interval} trang")
         print(f"   📁 File: {listing_file}")
         print(f"{'='*50}\n")
         
         consecutive_empty = 0  # Đếm số trang rỗng liên tiếp
+        failed_pages: List[int] = []  # Trang tải lỗi (không tính là trang rỗng)
+        consecutive_failed = 0  # Lỗi liên tiếp quá nhiều → site đang chặn, dừng thay vì chạy mãi
+        pending: Dict[int, asyncio.Task] = {}  # page_number → task đang fetch
+        next_page = start_page  # Trang tiếp theo sẽ đưa vào window
+        current_page = start_page  # Trang tiếp theo sẽ xử lý (theo thứ tự)
         
-        while True:
-            if max_pages and current_page > start_page + max_pages - 1:
-                break
-            
-            print(f"\n📄 Trang {current_page}")
-            movies = await self.crawl_movies_list(current_page, 60)
-            
-            # Kiểm tra nếu trang rỗng
-            if not movies or len(movies) == 0:
-                consecutive_empty += 1
-                print(f"⚠️  Trang {current_page} không có dữ liệu (lần {consecutive_empty})")
+        def fill_window():
+            nonlocal next_page
+            while len(pending) < concurrent_pages and (end_page is None or next_page <= end_page):
+                pending[next_page] = asyncio.create_task(self._crawl_listing_page_safe(next_page))
+                next_page += 1
+        
+        try:
+            fill_window()
+            while current_page in pending:
+                print(f"\n📄 Trang {current_page}")
+                movies = await pending.pop(current_page)
                 
-                # Nếu 2 trang liên tiếp rỗng → hết trang
-                if consecutive_empty >= 2:
-                    print(f"🛑 Đã hết trang (2 trang liên tiếp rỗng), dừng lại")
-                    break
-            else:
-                consecutive_empty = 0  # Reset counter nếu có data
-                all_movies.extend(movies)
-                print(f"✅ Đã có tổng cộng {len(all_movies)} phim\n")
+                if movies is None:
+                    # Lỗi tải trang (timeout, 403/429, captcha) → ghi lại, không phải hết trang
+                    failed_pages.append(current_page)
+                    consecutive_failed += 1
+                    print(f"⚠️  Trang {current_page} lỗi, bỏ qua (không tính là trang rỗng)")
+                    if consecutive_failed >= MAX_CONSECUTIVE_FAILED_PAGES:
+                        print(f"🛑 {consecutive_failed} trang lỗi liên tiếp, dừng lại (chạy lại từ trang {failed_pages[0]})")
+                        break
+                # Kiểm tra nếu trang rỗng
+                elif len(movies) == 0:
+                    consecutive_failed = 0
+                    consecutive_empty += 1
+                    print(f"⚠️  Trang {current_page} không có dữ liệu (lần {consecutive_empty})")
+                    
+                    # Nếu 2 trang liên tiếp rỗng → hết trang
+                    if consecutive_empty >= 2:
+                        print(f"🛑 Đã hết trang (2 trang liên tiếp rỗng), dừng lại")
+                        break
+                else:
+                    consecutive_empty = 0  # Reset counter nếu có data
+                    consecutive_failed = 0
+                    all_movies.extend(movies)
+                    print(f"✅ Đã có tổng cộng {len(all_movies)} phim\n")
+                    
+                    # Lưu theo interval để không mất data nếu stop
+                    if current_page % save_interval == 0:
+                        print(f"💾 Đang lưu checkpoint (sau {current_page} trang)...")
+                        result = self.save_to_json(all_movies, listing_file)
+                        print(f"✅ Đã lưu {len(all_movies)} phim vào {result.get('file', '')}\n")
                 
-                # Lưu theo interval để không mất data nếu stop
-                if current_page % save_interval == 0:
-                    print(f"💾 Đang lưu checkpoint (sau {current_page} trang)...")
-                    result = self.save_to_json(all_movies, listing_file)
-                    print(f"✅ Đã lưu {len(all_movies)} phim vào {result.get('file', '')}\n")
-            
-            # Delay between pages (giảm xuống để nhanh hơn)
-            if consecutive_empty == 0:  # Chỉ delay nếu có data
-                print(f"⏳ Đợi 2 giây trước khi crawl trang tiếp theo...\n")
-                await asyncio.sleep(2)  # Giảm từ 5s xuống 2s
-            else:
-                # Delay ngắn hơn nếu trang rỗng (có thể đang check)
-                await asyncio.sleep(1)
-            
-            current_page += 1
+                current_page += 1
+                fill_window()
+        finally:
+            # Hủy các trang đã fetch trước nhưng không còn cần (sau tín hiệu dừng / lỗi)
+            for task in pending.values():
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending.values(), return_exceptions=True)
+        
+        if failed_pages:
+            print(f"⚠️  {len(failed_pages)} trang lỗi, chưa lấy được phim: {failed_pages}")
         
         # Lưu lần cuối (tất cả data)
         print(f"💾 Đang lưu file cuối cùng...")
@@ -571,7 +658,7 @@ class MovieCrawler:
             "listing_file": result.get("file", "")
         }
     
-    async def _crawl_one_movie_detail(self, movie: Dict, index: int, total: int, save_individual: bool = True, save_combined: bool = False, combined_file: str = None, all_details: list = None) -> tuple:
+    async def _crawl_one_movie_detail(self, movie: Dict, index: int, total: int, save_individual: bool = True, save_combined: bool = False, combined_file: str = None, all_details: list = None, combined_sink: Optional[JsonlSink] = None, journal: Optional[CrawlJournal] = None, refresh: Optional[RefreshStore] = None) -> tuple:
         """Crawl detail cho 1 phim (dùng trong concurrent crawling)
         
         Returns:
@@ -583,12 +670,21 @@ class MovieCrawler:
             
             movie_title = movie.get('title', 'N/A')[:40]
             print(f"[{index}/{total}] 🔍 Đang crawl: {movie_title}...")
+            if journal:
+                journal.mark_started(movie['detailUrl'])
             
             try:
-                # Random delay để tránh pattern detection
-                delay = random.uniform(self.delay_min, self.delay_max)
-                await asyncio.sleep(delay)
+                # Refresh: server trả 304 → trang không đổi, không mở page Playwright
+                validators = {}
+                if refresh:
+                    not_modified, validators = await check_not_modified(refresh, self.fetcher, movie['detailUrl'], DETAIL_HEADERS, keep_body=False)
+                    if not_modified:
+                        print(f"[{index}/{total}] ⏭️  Không đổi (304): {movie_title[:30]}...")
+                        if journal:
+                            journal.mark_done(movie['detailUrl'], None)
+                        return (True, movie)
                 
+                # Tốc độ do rate limiter quyết định (đợi trong crawl_movie_detail)
                 detail_data = await self.crawl_movie_detail(movie['detailUrl'])
                 if detail_data:
                     # Merge detail data
@@ -596,7 +692,15 @@ class MovieCrawler:
                     movie.update(detail_data)
                     movie['detailUrl'] = detail_url
                     
+                    # Refresh: hash record giống lần trước → không ghi lại output
+                    if refresh and refresh.commit(detail_url, movie, validators or fetched_validators(self.fetcher, detail_url)) == RECORD_UNCHANGED:
+                        print(f"[{index}/{total}] ⏭️  Không đổi: {movie_title[:30]}...")
+                        if journal:
+                            journal.mark_done(detail_url, None)
+                        return (True, movie)
+                    
                     # Lưu vào file riêng nếu được yêu cầu
+                    filepath = None
                     if save_individual:
                         filepath = self.save_movie_detail_to_file(movie)
                         if filepath:
@@ -605,7 +709,10 @@ class MovieCrawler:
                             print(f"[{index}/{total}] ⚠️  Đã crawl nhưng không lưu được file")
                     
                     # Lưu vào combined file nếu được yêu cầu (incremental)
-                    if save_combined and combined_file and all_details is not None:
+                    if save_combined and combined_sink is not None:
+                        # JSONL append-only: không ghi lại cả file, không cần lock
+                        combined_sink.write(movie)
+                    elif save_combined and combined_file and all_details is not None:
                         async with self.file_lock:  # Thread-safe
                             all_details.append(movie)
                             # Lưu ngay sau mỗi item
@@ -615,43 +722,91 @@ class MovieCrawler:
                             except Exception as e:
                                 print(f"⚠️  Lỗi khi lưu combined file: {e}")
                     
+                    if journal:
+                        journal.mark_done(detail_url, filepath or combined_file)
                     return (True, movie)
                 else:
                     print(f"[{index}/{total}] ⚠️  Không crawl được: {movie_title[:30]}...")
+                    if journal:
+                        journal.mark_failed(movie['detailUrl'], "empty detail")
                     return (False, movie)
             except Exception as e:
                 print(f"[{index}/{total}] ❌ Lỗi: {movie_title[:30]}... - {str(e)}")
+                if journal:
+                    journal.mark_failed(movie['detailUrl'], str(e))
                 return (False, movie)
     
-    async def crawl_details_from_listing_file(self, listing_file: str, save_individual: bool = True, batch_size: int = None, save_combined: bool = False):
+    async def crawl_details_from_listing_file(self, listing_file: str, save_individual: bool = True, batch_size: int = None, save_combined: bool = False, combined_jsonl: bool = False, journal_file: str = None, start: int = 0, limit: Optional[int] = None, combined_path: Optional[str] = None, refresh_db: Optional[str] = None):
         """Đọc file listing và crawl detail cho từng phim (concurrent)
         
         Args:
-            listing_file: Đường dẫn đến file JSON chứa danh sách phim
+            listing_file: Đường dẫn đến file JSON array / JSONL chứa danh sách phim (đọc streaming)
             save_individual: Nếu True, lưu mỗi phim vào file riêng với tên phim
-            batch_size: Số lượng phim crawl mỗi batch (None = tất cả cùng lúc)
+            batch_size: Số item tối đa chờ trong hàng đợi (None = 2 x max_concurrent).
+                        Không còn đợi hết batch mới chạy tiếp.
             save_combined: Nếu True, gộm tất cả vào 1 JSON file và lưu incremental
+            combined_jsonl: Nếu True (cùng save_combined), ghi append-only ra file .jsonl
+                            thay vì ghi lại toàn bộ JSON sau mỗi item
+            journal_file: File SQLite journal (None = không dùng). Khi chạy lại, bỏ qua
+                          URL đã xong và chỉ thử lại URL lỗi chưa vượt quá số lần thử
+            start: Bỏ qua `start` item đầu của file listing (chia shard)
+            limit: Chỉ crawl tối đa `limit` item tính từ start (None = tới hết file)
+            combined_path: Đường dẫn file gộm (None = data/all_movies_details_<timestamp>)
+            refresh_db: File SQLite của chế độ refresh (None = tắt). Gửi ETag / Last-Modified
+                        của lần trước, bỏ qua trang 304 và record không đổi; record mới /
+                        thay đổi ghi thêm vào data/movies_delta_<timestamp>.jsonl
         """
         # Đọc file listing
         if not os.path.exists(listing_file):
             print(f"❌ Không tìm thấy file: {listing_file}")
             return None
         
-        with open(listing_file, 'r', encoding='utf-8') as f:
-            movies = json.load(f)
+        # Journal: bỏ qua URL đã crawl xong / đã hết lượt thử từ các lần chạy trước
+        journal = None
+        if journal_file:
+            journal = CrawlJournal(journal_file)
+            journal.print_progress("Journal trước khi chạy")
+        
+        # Refresh: chỉ ghi những gì thay đổi so với lần crawl trước
+        refresh = None
+        if refresh_db:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            refresh = RefreshStore(refresh_db, delta_file=os.path.join("data", f"movies_delta_{timestamp}.jsonl"))
+            # Không có httpx → chỉ so hash record (vẫn crawl lại mọi trang)
+            if HTTP_AVAILABLE and not self.fetcher:
+                self.fetcher = HttpFetcher(max_connections=self.max_concurrent * 2, rate_limiter=self.rate_limiter)
+        
+        # Đọc listing streaming: item vào hàng đợi ngay khi parse xong, không json.load cả file.
+        # Chỉ giữ toàn bộ listing khi cần ghi all_details_*.json ở cuối.
+        keep_all = not save_individual and not save_combined
+        movies = []
+        skipped_by_journal = 0
         
-        # Lọc những phim có detailUrl
-        valid_movies = [(i, movie) for i, movie in enumerate(movies, 1) if movie.get('detailUrl')]
+        def valid_movies():
+            nonlocal skipped_by_journal
+            for index, movie in iter_listing(listing_file, start, limit):
+                if keep_all:
+                    movies.append(movie)
+                if not movie.get('detailUrl'):
+                    continue
+                if journal and not journal.should_crawl(movie['detailUrl']):
+                    skipped_by_journal += 1
+                    continue
+                yield index, movie
         
         print(f"\n{'='*50}")
-        print(f"🔍 GIAI ĐOẠN 2: Crawl detail cho {len(valid_movies)} phim")
+        print(f"🔍 GIAI ĐOẠN 2: Crawl detail phim (đọc listing streaming)")
         print(f"   Từ file: {listing_file}")
+        if start or limit is not None:
+            print(f"   Shard: start={start}, limit={limit}")
         print(f"   Lưu riêng từng file: {save_individual}")
         print(f"   Gộm vào 1 JSON: {save_combined}")
         print(f"   Concurrent: {self.max_concurrent} requests")
-        print(f"   Delay: {self.delay_min}-{self.delay_max} giây")
+        print(f"   Delay ban đầu: {self.delay_min}-{self.delay_max} giây (rate limiter tự điều chỉnh)")
         if batch_size:
-            print(f"   Batch size: {batch_size}")
+            print(f"   Hàng đợi tối đa: {batch_size} item")
+        if refresh:
+            print(f"   Refresh: {refresh_db} (delta → {refresh.delta_file})")
         print(f"{'='*50}\n")
         
         success_count = 0
@@ -659,60 +814,56 @@ class MovieCrawler:
         
         # Tạo file combined nếu cần
         combined_file = None
+        combined_sink = None
         all_details = []
         if save_combined:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            combined_file = os.path.join("data", f"all_movies_details_{timestamp}.json")
-            os.makedirs("data", exist_ok=True)
+            if combined_path:
+                combined_file = combined_path
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                extension = "jsonl" if combined_jsonl else "json"
+                combined_file = os.path.join("data", f"all_movies_details_{timestamp}.{extension}")
+            os.makedirs(os.path.dirname(combined_file) or ".", exist_ok=True)
+            if combined_jsonl:
+                combined_sink = JsonlSink(combined_file)
             print(f"💾 File gộm: {combined_file}\n")
         
-        # Crawl theo batch hoặc tất cả cùng lúc
-        if batch_size:
-            # Crawl theo batch
-            for batch_start in range(0, len(valid_movies), batch_size):
-                batch_end = min(batch_start + batch_size, len(valid_movies))
-                batch = valid_movies[batch_start:batch_end]
-                
-                print(f"\n📦 Batch {batch_start//batch_size + 1}: {len(batch)} phim\n")
-                
-                # Tạo tasks cho batch này
-                tasks = [
-                    self._crawl_one_movie_detail(movie, index, len(valid_movies), save_individual, save_combined, combined_file, all_details)
-                    for index, movie in batch
-                ]
-                
-                # Chờ tất cả tasks trong batch hoàn thành
-                results = await asyncio.gather(*tasks)
-                
-                # Đếm kết quả
-                for success, updated_movie in results:
-                    if success:
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                
-                # Delay giữa các batch
-                if batch_end < len(valid_movies):
-                    batch_delay = random.uniform(5, 10)
-                    print(f"\n⏳ Đợi {batch_delay:.1f} giây trước batch tiếp theo...\n")
-                    await asyncio.sleep(batch_delay)
-        else:
-            # Crawl tất cả cùng lúc (giới hạn bởi semaphore)
-            print(f"🚀 Bắt đầu crawl {len(valid_movies)} phim (concurrent: {self.max_concurrent})\n")
-            
-            tasks = [
-                self._crawl_one_movie_detail(movie, index, len(valid_movies), save_individual, save_combined, combined_file, all_details)
-                for index, movie in valid_movies
-            ]
-            
-            results = await asyncio.gather(*tasks)
+        try:
+            # Hàng đợi streaming: max_concurrent worker luôn bận, không đợi item chậm nhất của batch.
+            # batch_size (nếu có) chỉ còn là số item tối đa chờ trong hàng đợi.
+            window = batch_size or self.max_concurrent * 2
+            # Không biết trước tổng số item khi đọc streaming
+            total = start + limit if limit is not None else "?"
+            print(f"🚀 Bắt đầu crawl phim ({self.max_concurrent} worker, hàng đợi tối đa {window})\n")
             
-            # Đếm kết quả
-            for success, updated_movie in results:
-                if success:
+            def count_result(item, result):
+                nonlocal success_count, failed_count
+                if isinstance(result, Exception):
+                    print(f"❌ Lỗi không mong muốn: {result}")
+                    failed_count += 1
+                elif result[0]:
                     success_count += 1
                 else:
                     failed_count += 1
+            
+            await run_work_queue(
+                valid_movies(),
+                lambda item: self._crawl_one_movie_detail(item[1], item[0], total, save_individual, save_combined, combined_file, all_details, combined_sink, journal, refresh),
+                workers=self.max_concurrent,
+                on_result=count_result,
+                window=window,
+            )
+            
+        finally:
+            # Flush + fsync phần còn lại trong buffer (kể cả khi bị dừng giữa chừng)
+            if combined_sink:
+                combined_sink.close()
+            if journal:
+                journal.print_progress("Journal sau khi chạy")
+                journal.close()
+            if refresh:
+                refresh.print_summary("Refresh phim")
+                refresh.close()
         
         # Lưu tất cả vào 1 file tổng hợp (nếu cần)
         if not save_individual:
@@ -721,16 +872,24 @@ class MovieCrawler:
             result = self.save_to_json(movies, all_details_file)
             print(f"\n💾 Đã lưu tất cả detail vào: {result.get('file', '')}")
         
+        # Nếu đã lưu incremental, chỉ thông báo
+        if combined_sink:
+            print(f"\n💾 Đã lưu tất cả {combined_sink.count} phim vào: {combined_file}")
+            print(f"💡 Export sang JSON array: python jsonl_sink.py \"{combined_file}\"")
+        
         print(f"\n{'='*50}")
         print(f"✅ HOÀN THÀNH CRAWL DETAIL")
         print(f"   ✅ Thành công: {success_count}")
         print(f"   ❌ Thất bại: {failed_count}")
-        if len(valid_movies) > 0:
-            print(f"   📊 Tỷ lệ: {success_count/len(valid_movies)*100:.1f}%")
+        if skipped_by_journal:
+            print(f"   ⏭️  Bỏ qua theo journal: {skipped_by_journal}")
+        total_crawled = success_count + failed_count
+        if total_crawled > 0:
+            print(f"   📊 Tỷ lệ: {success_count/total_crawled*100:.1f}%")
         print(f"{'='*50}\n")
         
         return {
-            "total": len(valid_movies),
+            "total": total_crawled,
             "success": success_count,
             "failed": failed_count
         }
@@ -748,26 +907,20 @@ class MovieCrawler:
         
         print(f"🔍 Đang crawl detail: {detail_url}")
         
-        page = await self.browser.new_page()
+        # Mượn page từ pool (đã set sẵn headers thật)
+        page = await self.pool.acquire(DETAIL_HEADERS)
         
         try:
-            # Set realistic headers
-            await page.set_extra_http_headers({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://gaigu1.net/phim-sex',
-            })
-            
-            await page.goto(detail_url, wait_until='networkidle', timeout=60000)
-            await asyncio.sleep(3)  # Wait for video player to load
+            await limited_goto(page, detail_url, self.rate_limiter, wait_until='domcontentloaded', timeout=60000)
+            # Wait for video player: đợi <video> có src (video.js set sau khi script chạy)
+            await wait_for_selector_or_fallback(page, 'video[src], video source[src]', timeout=10000, fallback_ms=1000)
             
             # Check for captcha
             page_content = await page.content()
-            if 'verify' in page_content.lower() and 'human' in page_content.lower():
+            if is_captcha(page_content):
                 print("⚠️  Phát hiện captcha, đợi thêm...")
-                await asyncio.sleep(5)
-                await page.wait_for_selector('video, .video-player, [class*="video"]', timeout=10000)
+                self.rate_limiter.record(detail_url, captcha=True)
+                await wait_for_selector_or_fallback(page, 'video, .video-player, [class*="video"]', timeout=15000, fallback_ms=2000)
             
             # Extract video details
             movie_detail = await page.evaluate("""
@@ -1017,7 +1170,7 @@ class MovieCrawler:
             traceback.print_exc()
             return None
         finally:
-            await page.close()
+            await self.pool.release(page)
     
     def save_movie_detail_to_file(self, movie: Dict) -> str:
         """Lưu detail của 1 phim vào file riêng với tên là title"""
@@ -1067,10 +1220,13 @@ async def main():
     delay_min = 1.0     # Giảm từ 2.0 xuống 1.0
     delay_max = 2.0     # Giảm từ 5.0 xuống 2.0
     batch_size = None
+    concurrent_pages = 3  # Số trang listing fetch đồng thời
     
     for i, arg in enumerate(sys.argv):
         if arg == '--concurrent' and i + 1 < len(sys.argv):
             max_concurrent = int(sys.argv[i + 1])
+        elif arg == '--concurrent-pages' and i + 1 < len(sys.argv):
+            concurrent_pages = int(sys.argv[i + 1])
         elif arg == '--delay-min' and i + 1 < len(sys.argv):
             delay_min = float(sys.argv[i + 1])
         elif arg == '--delay-max' and i + 1 < len(sys.argv):
@@ -1078,7 +1234,9 @@ async def main():
         elif arg == '--batch-size' and i + 1 < len(sys.argv):
             batch_size = int(sys.argv[i + 1])
     
-    crawler = MovieCrawler(max_concurrent=max_concurrent, delay_min=delay_min, delay_max=delay_max)
+    block_resources = '--block-resources' in sys.argv  # Chặn ảnh/font/video/tracker
+    
+    crawler = MovieCrawler(max_concurrent=max_concurrent, delay_min=delay_min, delay_max=delay_max, block_resources=block_resources)
     
     try:
         # Parse flags và loại bỏ chúng khỏi args
@@ -1098,6 +1256,16 @@ async def main():
         
         save_individual = '--save-individual' in sys.argv or '--individual' in sys.argv
         save_combined = '--save-combined' in sys.argv or '--combined' in sys.argv or '--gop' in sys.argv
+        combined_jsonl = '--jsonl' in sys.argv  # Ghi file gộm dạng JSONL append-only
+        journal_file = None  # SQLite journal để resume (--journal FILE)
+        for i, arg in enumerate(sys.argv):
+            if arg == '--journal' and i + 1 < len(sys.argv):
+                journal_file = sys.argv[i + 1]
+        refresh_db = None  # SQLite refresh: chỉ ghi record mới / thay đổi (--refresh FILE)
+        for i, arg in enumerate(sys.argv):
+            if arg == '--refresh' and i + 1 < len(sys.argv):
+                refresh_db = sys.argv[i + 1]
+        start, limit = parse_shard_args(sys.argv)  # --start N --limit M: chỉ crawl 1 shard của listing
         auto_mode = '--auto' in sys.argv or '--all' in sys.argv
         listing_only = '--listing-only' in sys.argv
         
@@ -1105,7 +1273,7 @@ async def main():
         # Loại bỏ tất cả flags và giá trị của chúng
         args = []
         skip_next = False
-        flag_with_value = ['--concurrent', '--delay-min', '--delay-max', '--batch-size', '--detail-from-file', '--from-file']
+        flag_with_value = ['--concurrent', '--delay-min', '--delay-max', '--batch-size', '--detail-from-file', '--from-file', '--journal', '--refresh', '--concurrent-pages', '--start', '--limit']
         
         for i, arg in enumerate(sys.argv[1:], 1):
             if skip_next:
@@ -1138,12 +1306,20 @@ async def main():
             print(f"   📁 File: {detail_from_file}")
             print(f"   💾 Lưu riêng từng file: {save_individual}")
             print(f"   💾 Gộm vào 1 JSON: {save_combined}")
+            if save_combined and combined_jsonl:
+                print(f"   📝 Ghi dạng JSONL (append-only)")
+            if journal_file:
+                print(f"   📒 Journal: {journal_file}")
+            if refresh_db:
+                print(f"   🔁 Refresh: {refresh_db}")
+            if start or limit is not None:
+                print(f"   🧩 Shard: --start {start} --limit {limit}")
             print(f"   🔄 Concurrent: {max_concurrent}")
             print(f"   ⏱️  Delay: {delay_min}-{delay_max}s")
             if batch_size:
                 print(f"   📦 Batch size: {batch_size}")
             print()
-            result = await crawler.crawl_details_from_listing_file(detail_from_file, save_individual, batch_size, save_combined)
+            result = await crawler.crawl_details_from_listing_file(detail_from_file, save_individual, batch_size, save_combined, combined_jsonl, journal_file, start, limit, refresh_db=refresh_db)
             print(f"\n{'='*50}")
             print("✅ HOÀN THÀNH!")
             print(f"{'='*50}")
@@ -1162,10 +1338,8 @@ async def main():
                 for page_num in range(start_page, end_page + 1):
                     print(f"\n📄 Trang {page_num}/{end_page}")
                     movies = await crawler.crawl_movies_list(page_num, 60)
-                    all_movies.extend(movies)
+                    all_movies.extend(movies or [])
                     print(f"✅ Đã có tổng cộng {len(all_movies)} phim\n")
-                    if page_num < end_page:
-                        await asyncio.sleep(5)
                 
                 result = crawler.save_to_json(all_movies)
                 print(f"\n✅ Hoàn thành: {len(all_movies)} phim")
@@ -1173,7 +1347,7 @@ async def main():
             else:
                 page = int(args[0])
                 print(f"🚀 Crawl phim trang {page}\n")
-                movies = await crawler.crawl_movies_list(page, 60)
+                movies = await crawler.crawl_movies_list(page, 60) or []
                 result = crawler.save_to_json(movies)
                 print(f"\n✅ Hoàn thành: {len(movies)} phim")
                 print(f"💾 File: {result.get('file', '')}")
@@ -1197,13 +1371,14 @@ async def main():
                 print(f"   🔍 Tự động crawl detail sau khi xong listing")
                 print(f"   💾 Lưu ngay sau mỗi video (tới đâu lưu tới đó)")
                 print(f"   🔄 Concurrent: {max_concurrent}")
+                print(f"   📄 Listing đồng thời: {concurrent_pages} trang")
                 print(f"   ⏱️  Delay: {delay_min}-{delay_max}s")
                 if batch_size:
                     print(f"   📦 Batch size: {batch_size}")
                 print(f"{'='*60}\n")
                 
                 # Giai đoạn 1: Crawl listing
-                listing_result = await crawler.crawl_all_listing_pages(1, max_pages)
+                listing_result = await crawler.crawl_all_listing_pages(1, max_pages, concurrent_pages=concurrent_pages)
                 listing_file = listing_result.get('listing_file', '')
                 
                 if not listing_file or not os.path.exists(listing_file):
@@ -1223,7 +1398,10 @@ async def main():
                     listing_file, 
                     save_individual=True,  # Luôn lưu riêng từng file
                     batch_size=batch_size,
-                    save_combined=save_combined
+                    save_combined=save_combined,
+                    combined_jsonl=combined_jsonl,
+                    journal_file=journal_file,
+                    refresh_db=refresh_db
                 )
                 
                 print(f"\n{'='*60}")
@@ -1240,7 +1418,7 @@ async def main():
             else:
                 # Default: crawl page 1
                 print(f"🚀 Crawl phim trang 1 (mặc định)\n")
-                movies = await crawler.crawl_movies_list(1, 60)
+                movies = await crawler.crawl_movies_list(1, 60) or []
                 result = crawler.save_to_json(movies)
                 print(f"\n✅ Hoàn thành: {len(movies)} phim")
                 print(f"💾 File: {result.get('file', '')}")
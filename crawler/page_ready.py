@@ -0,0 +1,113 @@
+"""
+Các hàm đợi trang "sẵn sàng" thay cho sleep cố định.
+Đợi theo tín hiệu thật (selector xuất hiện, số card ngừng tăng, XHR trả về);
+sleep cố định chỉ còn là fallback có giới hạn khi tín hiệu không tới.
+"""
+
+import time
+from typing import Awaitable, Callable
+
+from playwright.async_api import Page
+
+
+async def count_elements(page: Page, selector: str) -> int:
+    """Đếm số phần tử khớp selector (không cần visible)"""
+    try:
+        return await page.evaluate("(sel) => document.querySelectorAll(sel).length", selector)
+    except Exception:
+        return 0
+
+
+async def wait_for_selector_or_fallback(
+    page: Page,
+    selector: str,
+    timeout: int = 10000,
+    fallback_ms: int = 1000,
+) -> bool:
+    """Đợi selector có trong DOM; quá timeout thì chỉ sleep thêm fallback_ms rồi đi tiếp
+
+    Returns:
+        True nếu selector đã xuất hiện
+    """
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout)
+        return True
+    except Exception:
+        if fallback_ms:
+            await page.wait_for_timeout(fallback_ms)
+        return False
+
+
+async def wait_for_count_stable(
+    page: Page,
+    selector: str,
+    timeout: int = 5000,
+    interval: int = 250,
+    stable_rounds: int = 2,
+    min_count: int = 1,
+) -> int:
+    """Poll số phần tử khớp selector tới khi không đổi trong `stable_rounds` lần liên tiếp
+
+    Dùng sau scroll / load-more để biết lazy content đã render xong.
+    Chờ tối đa `timeout` ms (đây cũng chính là fallback của các sleep cũ).
+
+    Returns:
+        Số phần tử cuối cùng đếm được
+    """
+    deadline = time.monotonic() + timeout / 1000
+    last_count = await count_elements(page, selector)
+    stable = 0
+
+    while time.monotonic() < deadline:
+        await page.wait_for_timeout(interval)
+        count = await count_elements(page, selector)
+        if count == last_count and count >= min_count:
+            stable += 1
+            if stable >= stable_rounds:
+                break
+        else:
+            stable = 0
+            last_count = count
+
+    return last_count
+
+
+async def scroll_and_wait(
+    page: Page,
+    selector: str,
+    timeout: int = 2000,
+    to_top: bool = False,
+) -> int:
+    """Scroll xuống cuối trang rồi đợi số phần tử `selector` ổn định
+
+    Args:
+        to_top: Scroll ngược lên đầu trang sau khi xong
+    """
+    before = await count_elements(page, selector)
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    count = await wait_for_count_stable(page, selector, timeout=timeout, min_count=before)
+    if to_top:
+        await page.evaluate("window.scrollTo(0, 0)")
+    return count
+
+
+async def run_and_wait_for_response(
+    page: Page,
+    url_part: str,
+    action: Callable[[], Awaitable],
+    timeout: int = 10000,
+    fallback_ms: int = 1500,
+) -> bool:
+    """Chạy action (ví dụ click "xem thêm") và đợi XHR có URL chứa url_part trả về
+
+    Returns:
+        True nếu nhận được response, False nếu hết timeout (đã sleep fallback_ms)
+    """
+    try:
+        async with page.expect_response(lambda response: url_part in response.url, timeout=timeout):
+            await action()
+        return True
+    except Exception:
+        if fallback_ms:
+            await page.wait_for_timeout(fallback_ms)
+        return False
@@ -0,0 +1,187 @@
+"""
+Rate limiter thích ứng theo host (token bucket + AIMD), dùng chung cho mọi crawler.
+
+- Response nhanh và sạch → tăng dần tốc độ (cộng thêm `increase` req/s)
+- 403/429/503, captcha ('verify' + 'human') hoặc lỗi → giảm mạnh (nhân `decrease`) và nghỉ `cooldown` giây
+- Latency vượt `latency_factor` lần mức trung bình → giảm nhẹ (nhân `latency_decrease`)
+
+Thay cho các sleep cố định (delay_min/delay_max, 5-10 giây giữa batch, 5 giây giữa trang):
+crawler chỉ cần `await limiter.acquire(url)` trước mỗi request và `limiter.record(...)` sau đó.
+"""
+
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+# Status code coi như server đang chặn / quá tải
+BACKOFF_STATUSES = (403, 429, 503)
+
+
+def is_captcha(html: str) -> bool:
+    """Nhận diện trang captcha giống các crawler ('verify' + 'human')"""
+    lower = (html or "").lower()
+    return "verify" in lower and "human" in lower
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.latency_avg: Optional[float] = None
+        self.requests = 0
+        self.backoffs = 0
+
+    def reserve(self) -> float:
+        """Lấy 1 token, trả về số giây phải đợi (token có thể âm = đặt trước)"""
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        self.requests += 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        initial_rate: float = 0.5,
+        min_rate: float = 0.05,
+        max_rate: float = 5.0,
+        burst: int = 2,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        latency_decrease: float = 0.8,
+        latency_factor: float = 2.0,
+        cooldown: float = 10.0,
+    ):
+        """
+        Args:
+            initial_rate: Tốc độ ban đầu mỗi host (request/giây)
+            min_rate / max_rate: Giới hạn dưới / trên của tốc độ
+            burst: Số request tối đa được bắn liền nhau khi bucket đầy
+            increase: Lượng cộng thêm (req/s) sau mỗi response tốt
+            decrease: Hệ số nhân khi bị chặn (403/429/captcha/lỗi)
+            latency_decrease: Hệ số nhân khi latency tăng vọt
+            latency_factor: Latency > latency_factor * trung bình thì coi là tăng vọt
+            cooldown: Số giây ngừng hẳn host sau khi bị chặn
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_decrease = latency_decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.buckets: Dict[str, _HostBucket] = {}
+
+    def _bucket(self, url: str) -> _HostBucket:
+        host = urlsplit(url).netloc or url
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = _HostBucket(self.initial_rate, self.burst)
+            self.buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str) -> float:
+        """Đợi tới lượt gửi request tới host của url
+
+        Returns:
+            time.monotonic() lúc được phép gửi (truyền lại cho record để tính latency)
+        """
+        wait = self._bucket(url).reserve()
+        if wait > 0:
+            # Jitter ±20% để không thành pattern đều đặn
+            await asyncio.sleep(wait * random.uniform(0.8, 1.2))
+        return time.monotonic()
+
+    def record(
+        self,
+        url: str,
+        status: Optional[int] = None,
+        started: Optional[float] = None,
+        captcha: bool = False,
+        error: bool = False,
+    ):
+        """Cập nhật tốc độ của host theo kết quả request
+
+        Args:
+            status: HTTP status (None nếu không biết)
+            started: Giá trị trả về từ acquire() để tính latency
+            captcha: Trang trả về là captcha
+            error: Request lỗi (timeout, mất kết nối, ...)
+        """
+        bucket = self._bucket(url)
+
+        if captcha or error or status in BACKOFF_STATUSES:
+            self._backoff(bucket, self.decrease)
+            bucket.blocked_until = time.monotonic() + self.cooldown
+            reason = "captcha" if captcha else (f"HTTP {status}" if status else "lỗi")
+            print(f"🐢 {urlsplit(url).netloc}: {reason} → giảm còn {bucket.rate:.2f} req/s, nghỉ {self.cooldown:.0f}s")
+            return
+
+        if started is not None:
+            latency = time.monotonic() - started
+            average = bucket.latency_avg
+            # EWMA latency làm mốc so sánh
+            bucket.latency_avg = latency if average is None else average * 0.8 + latency * 0.2
+            # Bỏ qua dao động nhỏ khi latency trung bình còn rất thấp (< 0.5s)
+            if average is not None and latency > max(average, 0.5) * self.latency_factor:
+                self._backoff(bucket, self.latency_decrease)
+                return
+
+        bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    def _backoff(self, bucket: _HostBucket, factor: float):
+        bucket.rate = max(self.min_rate, bucket.rate * factor)
+        bucket.tokens = min(bucket.tokens, 0.0)
+        bucket.backoffs += 1
+
+    def summary(self) -> Optional[str]:
+        if not self.buckets:
+            return None
+        return "\n".join(
+            f"⏱️  {host}: {bucket.rate:.2f} req/s, {bucket.requests} request, {bucket.backoffs} lần giảm tốc"
+            for host, bucket in self.buckets.items()
+        )
+
+
+# Limiter dùng chung trong 1 process: nhiều crawler cùng host chia chung 1 bucket
+_shared_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter(initial_rate: float = 0.5) -> AdaptiveRateLimiter:
+    """Lấy limiter dùng chung; initial_rate chỉ có tác dụng ở lần gọi đầu tiên"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = AdaptiveRateLimiter(initial_rate=initial_rate)
+    return _shared_limiter
+
+
+def rate_from_delay(delay_min: float, delay_max: float) -> float:
+    """Đổi delay_min/delay_max (giây) cũ của crawler thành tốc độ ban đầu (req/s)"""
+    return 2.0 / max(delay_min + delay_max, 0.1)
+
+
+async def limited_goto(page, url: str, limiter: AdaptiveRateLimiter, **kwargs):
+    """page.goto qua limiter: đợi tới lượt, ghi lại status + latency
+
+    Captcha cần đọc nội dung trang nên caller tự gọi limiter.record(url, captcha=True).
+    """
+    started = await limiter.acquire(url)
+    try:
+        response = await page.goto(url, **kwargs)
+    except Exception:
+        limiter.record(url, error=True)
+        raise
+    limiter.record(url, status=response.status if response else None, started=started)
+    return response
@@ -0,0 +1,194 @@
+"""
+Re-crawl có điều kiện (incremental refresh) lưu bằng SQLite (key = detailUrl / album URL).
+
+Mỗi URL lưu: ETag, Last-Modified của lần fetch trước và hash của record đã trích xuất.
+- Gửi If-None-Match / If-Modified-Since → server trả 304 thì bỏ qua hẳn (không parse, không ghi)
+- Trả 200 nhưng hash record không đổi → không ghi file output
+- Record mới / thay đổi → ghi thêm vào file delta (JSONL) cho bước generate SQL
+
+Xem thống kê của 1 refresh DB:
+    python refresh_store.py data/girls_refresh.sqlite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from jsonl_sink import JsonlSink
+
+
+# Field thay đổi ở mọi lần crawl → không tính vào hash
+VOLATILE_FIELDS = ("crawled_at", "crawledAt", "updated_at", "updatedAt")
+
+RECORD_NEW = "new"
+RECORD_CHANGED = "changed"
+RECORD_UNCHANGED = "unchanged"
+
+
+def record_hash(record: Dict) -> str:
+    """SHA-256 của record (bỏ field volatile, key sắp xếp cố định)"""
+    stable = {key: value for key, value in record.items() if key not in VOLATILE_FIELDS}
+    payload = json.dumps(stable, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RefreshStore:
+    def __init__(self, db_path: str, delta_file: Optional[str] = None):
+        """
+        Args:
+            db_path: Đường dẫn file SQLite (tự tạo nếu chưa có)
+            delta_file: File JSONL chứa record mới / thay đổi của lần chạy này (None = không ghi)
+        """
+        self.db_path = db_path
+        self.delta_file = delta_file
+        self.delta: Optional[JsonlSink] = JsonlSink(delta_file) if delta_file else None
+        self.counts = {"not_modified": 0, RECORD_NEW: 0, RECORD_CHANGED: 0, RECORD_UNCHANGED: 0}
+
+        data_dir = os.path.dirname(db_path)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                record_hash TEXT,
+                checked_at TEXT NOT NULL,
+                changed_at TEXT
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _now(self) -> str:
+        return datetime.now().isoformat()
+
+    def validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """(etag, last_modified) đã lưu của URL"""
+        row = self._conn.execute(
+            "SELECT etag, last_modified FROM refresh_state WHERE url = ?", (url,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def mark_not_modified(self, url: str):
+        """Server trả 304: chỉ cập nhật thời điểm kiểm tra"""
+        self._conn.execute("UPDATE refresh_state SET checked_at = ? WHERE url = ?", (self._now(), url))
+        self._conn.commit()
+        self.counts["not_modified"] += 1
+
+    def commit(self, url: str, record: Dict, validators: Optional[Dict[str, str]] = None) -> str:
+        """So hash record với lần trước, lưu validators mới, ghi delta nếu mới / thay đổi
+
+        Returns:
+            RECORD_NEW / RECORD_CHANGED / RECORD_UNCHANGED
+        """
+        # Request lỗi / chế độ chỉ so hash: không có validators mới → giữ validators cũ
+        validators = validators or {}
+        new_hash = record_hash(record)
+        row = self._conn.execute("SELECT record_hash FROM refresh_state WHERE url = ?", (url,)).fetchone()
+
+        if row is None:
+            status = RECORD_NEW
+        elif row[0] == new_hash:
+            status = RECORD_UNCHANGED
+        else:
+            status = RECORD_CHANGED
+
+        now = self._now()
+        self._conn.execute(
+            """
+            INSERT INTO refresh_state (url, etag, last_modified, record_hash, checked_at, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = COALESCE(excluded.etag, refresh_state.etag),
+                last_modified = COALESCE(excluded.last_modified, refresh_state.last_modified),
+                record_hash = excluded.record_hash,
+                checked_at = excluded.checked_at,
+                changed_at = COALESCE(excluded.changed_at, refresh_state.changed_at)
+            """,
+            (
+                url,
+                validators.get("etag"),
+                validators.get("last_modified"),
+                new_hash,
+                now,
+                now if status != RECORD_UNCHANGED else None,
+            ),
+        )
+        self._conn.commit()
+
+        self.counts[status] += 1
+        if status != RECORD_UNCHANGED and self.delta:
+            self.delta.write(record)
+        return status
+
+    def print_summary(self, label: str = "Refresh"):
+        counts = self.counts
+        print(
+            f"🔁 {label}: {counts[RECORD_NEW]} mới, {counts[RECORD_CHANGED]} thay đổi, "
+            f"{counts[RECORD_UNCHANGED]} không đổi, {counts['not_modified']} không tải lại (304)"
+        )
+        if self.delta:
+            print(f"   📝 Delta: {self.delta.count} record → {self.delta_file}")
+
+    def close(self):
+        if self.delta:
+            self.delta.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def check_not_modified(store: RefreshStore, fetcher, url: str, headers: Optional[Dict[str, str]] = None, keep_body: bool = True) -> Tuple[bool, Dict[str, str]]:
+    """Gửi conditional GET với validators đã lưu
+
+    Args:
+        fetcher: HttpFetcher (None = không kiểm tra được, coi như đã thay đổi)
+        keep_body: Giữ HTML (status 200) cho lần fetcher.fetch(url) kế tiếp, tránh tải 2 lần
+
+    Returns:
+        (not_modified, validators mới của response)
+    """
+    if fetcher is None:
+        return False, {}
+    etag, last_modified = store.validators(url)
+    if etag is None and last_modified is None:
+        # Chưa có gì để so → không gửi request thừa, validators lấy từ lần fetch thật (fetched_validators)
+        fetcher.want_validators(url)
+        return False, {}
+    changed, validators = await fetcher.fetch_if_modified(url, headers, etag, last_modified, keep_body)
+    if not changed:
+        store.mark_not_modified(url)
+    return not changed, validators
+
+
+def fetched_validators(fetcher, url: str) -> Dict[str, str]:
+    """Validators từ lần fetcher.fetch(url) thật (URL chưa có validators trong store), {} nếu trang tải bằng Playwright"""
+    if fetcher is None:
+        return {}
+    return fetcher.pop_validators(url)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python refresh_store.py <refresh.sqlite>")
+        sys.exit(1)
+    conn = sqlite3.connect(sys.argv[1])
+    total, changed_today = conn.execute(
+        "SELECT COUNT(*), SUM(CASE WHEN changed_at >= date('now') THEN 1 ELSE 0 END) FROM refresh_state"
+    ).fetchone()
+    print(f"📊 {sys.argv[1]}: {total} URL, {changed_today or 0} thay đổi từ hôm nay")
+    conn.close()
@@ -0,0 +1,112 @@
+"""
+Chặn request không cần thiết (ảnh, font, video, tracker) bằng route interception của Playwright.
+Crawler chỉ đọc DOM (text, attribute src/data-src) nên không cần tải bytes của các resource này.
+
+Bật bằng `block_resources=True` ở constructor của từng crawler (hoặc flag --block-resources).
+"""
+
+from typing import Dict, Iterable, Optional
+
+from playwright.async_api import Route
+
+
+# Loại resource chặn mặc định (theo request.resource_type của Playwright)
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font")
+
+# Quảng cáo / analytics: chặn theo URL bất kể loại resource
+TRACKER_PATTERNS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "adservice.google",
+    "connect.facebook.net",
+    "facebook.com/tr",
+    "histats.com",
+    "hotjar.com",
+    "clarity.ms",
+)
+
+# Luôn cho qua để không làm hỏng trang captcha / xác minh
+ALWAYS_ALLOW_PATTERNS = (
+    "recaptcha",
+    "hcaptcha",
+    "challenges.cloudflare.com",
+    "/cdn-cgi/",
+)
+
+# Cấu hình riêng cho từng crawler
+# - block_types: loại resource bị chặn
+# - allow_patterns: URL chứa chuỗi này thì luôn cho qua (allowlist)
+BLOCK_PROFILES: Dict[str, Dict] = {
+    # GirlCrawler / MovieCrawler: chỉ đọc text + attribute, <video> vẫn có src vì script không bị chặn
+    "girl": {"block_types": DEFAULT_BLOCKED_TYPES, "allow_patterns": ()},
+    "movie": {"block_types": DEFAULT_BLOCKED_TYPES, "allow_patterns": ()},
+    # AlbumCrawler: fallback lọc ảnh nhỏ bằng img.offsetWidth/offsetHeight, kích thước này phụ thuộc
+    # ảnh đã tải (img không có width/height) → không chặn image, giữ cả stylesheet; chỉ chặn media + font.
+    "album": {"block_types": ("media", "font"), "allow_patterns": ()},
+    "album_listing": {"block_types": DEFAULT_BLOCKED_TYPES, "allow_patterns": ()},
+    # Chat sex chỉ evaluate DOM sau domcontentloaded, không scroll/click → chặn cả CSS
+    "chat_sex": {"block_types": DEFAULT_BLOCKED_TYPES + ("stylesheet",), "allow_patterns": ()},
+    # ReviewCrawler click "xem thêm" và gọi /ajax/load_newfeeds_review
+    "review": {"block_types": DEFAULT_BLOCKED_TYPES, "allow_patterns": ("/ajax/",)},
+}
+
+
+class ResourceBlocker:
+    def __init__(
+        self,
+        block_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+        allow_patterns: Iterable[str] = (),
+        block_patterns: Iterable[str] = TRACKER_PATTERNS,
+    ):
+        """
+        Args:
+            block_types: Các resource_type bị chặn (image, media, font, stylesheet, ...)
+            allow_patterns: URL chứa 1 trong các chuỗi này luôn được cho qua
+            block_patterns: URL chứa 1 trong các chuỗi này luôn bị chặn (tracker, quảng cáo)
+        """
+        self.block_types = set(block_types)
+        self.allow_patterns = tuple(allow_patterns) + ALWAYS_ALLOW_PATTERNS
+        self.block_patterns = tuple(block_patterns)
+        self.blocked = 0
+        self.allowed = 0
+
+    @classmethod
+    def for_crawler(cls, name: str) -> "ResourceBlocker":
+        """Tạo blocker theo profile trong BLOCK_PROFILES"""
+        profile = BLOCK_PROFILES.get(name, {})
+        return cls(
+            block_types=profile.get("block_types", DEFAULT_BLOCKED_TYPES),
+            allow_patterns=profile.get("allow_patterns", ()),
+        )
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if any(pattern in url for pattern in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return any(pattern in url for pattern in self.block_patterns)
+
+    async def _handle(self, route: Route):
+        request = route.request
+        try:
+            if self.should_block(request.url, request.resource_type):
+                self.blocked += 1
+                await route.abort()
+            else:
+                self.allowed += 1
+                await route.continue_()
+        except Exception:
+            # Page/context đã đóng trong lúc xử lý route
+            pass
+
+    async def attach(self, target):
+        """Gắn route chặn vào BrowserContext hoặc Page"""
+        await target.route("**/*", self._handle)
+
+    def summary(self) -> Optional[str]:
+        total = self.blocked + self.allowed
+        if not total:
+            return None
+        return f"🚫 Đã chặn {self.blocked}/{total} request ({self.blocked * 100 / total:.0f}%)"
@@ -6,12 +6,26 @@ Sử dụng Playwright để tải trang và trích xuất dữ liệu.
 import asyncio
 import json
 import os
-import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
 from playwright.async_api import async_playwright, Browser
 
+from browser_pool import BrowserPool, DEFAULT_HEADERS
+from page_ready import run_and_wait_for_response, scroll_and_wait, wait_for_count_stable, wait_for_selector_or_fallback
+from rate_limiter import get_rate_limiter, is_captcha, limited_goto, rate_from_delay
+from resource_blocker import ResourceBlocker
+
+try:
+    # Parse HTML offline bằng lxml (pip install lxml cssselect)
+    from html_parsers import parse_reviews
+except ImportError:
+    parse_reviews = None
+
+# Khối review trên trang
+REVIEW_CARD_SELECTOR = '.card-sub.card-sub-review'
+
 
 class ReviewCrawler:
     def __init__(
@@ -20,38 +34,67 @@ class ReviewCrawler:
         delay_min: float = 1.0,
         delay_max: float = 2.5,
         headless: bool = False,  # mở Chrome thật khi cần debug
+        block_resources: bool = False,  # chặn ảnh/font/video/tracker
+        parse_workers: int = 2,  # số thread parse HTML API song song với fetch trang tiếp theo
     ):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
         self.max_concurrent = max_concurrent
         self.delay_min = delay_min
         self.delay_max = delay_max
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.headless = headless
+        self.block_resources = block_resources
+        self.browser_lock = asyncio.Lock()
+        # delay_min/delay_max chỉ là tốc độ ban đầu, rate limiter tự điều chỉnh sau đó
+        self.rate_limiter = get_rate_limiter(rate_from_delay(delay_min, delay_max))
+        self.parse_executor: Optional[ThreadPoolExecutor] = None
+        if parse_reviews is not None:
+            self.parse_executor = ThreadPoolExecutor(max_workers=max(1, parse_workers))
 
     async def init_browser(self):
-        if not self.browser:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
-            )
+        async with self.browser_lock:
+            if not self.browser:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"]
+                )
+                # crawl_reviews_api giữ 1 page và mượn thêm 1 page để parse HTML → tối thiểu 2
+                self.pool = BrowserPool(
+                    self.browser,
+                    size=max(2, self.max_concurrent),
+                    blocker=ResourceBlocker.for_crawler("review") if self.block_resources else None,
+                )
         return self.browser
 
     async def close_browser(self):
         try:
+            if self.parse_executor:
+                self.parse_executor.shutdown(wait=False)
+            if self.pool:
+                await self.pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             print(f"⚠️  Lỗi khi đóng browser: {e}")
+        summary = self.rate_limiter.summary()
+        if summary:
+            print(summary)
 
     async def _extract_reviews_from_html(self, html: str) -> List[Dict]:
-        """Dùng một trang tạm thời để parse HTML và trích xuất review."""
+        """Parse HTML review: lxml trong worker pool, không có lxml thì dùng trang tạm thời."""
+        if self.parse_executor:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parse_executor, parse_reviews, html)
+
         await self.init_browser()
-        page = await self.browser.new_page()
+        page = await self.pool.acquire()
         try:
-            await page.set_content(html)
+            # Chỉ cần DOM, không đợi ảnh trong HTML review load xong (mặc định là "load")
+            await page.set_content(html, wait_until="domcontentloaded")
             reviews = await page.evaluate(
                 """
                 () => {
@@ -87,7 +130,72 @@ class ReviewCrawler:
             )
             return reviews
         finally:
-            await page.close()
+            await self.pool.release(page)
+
+    async def _fetch_api_page(self, page, api_url: str, page_num: int, base_url: str):
+        """POST /ajax/load_newfeeds_review qua fetch trong page
+
+        Returns:
+            (status, html) - status = 0 nếu lỗi
+        """
+        started = await self.rate_limiter.acquire(api_url)
+        try:
+            # Gọi qua fetch trong page để include cookie/clearance, credentials: include
+            result = await page.evaluate(
+                """async ({ apiUrl, pageNum, origin, referer }) => {
+                    const form = new URLSearchParams();
+                    form.set('page', pageNum.toString());
+                    form.set('p', pageNum.toString());
+                    const res = await fetch(apiUrl, {
+                        method: 'POST',
+                        credentials: 'include',
+                        headers: {
+                            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                            'X-Requested-With': 'XMLHttpRequest',
+                            'Origin': origin,
+                            'Referer': referer,
+                            'Accept': '*/*',
+                        },
+                        body: form
+                    });
+                    const text = await res.text();
+                    return { status: res.status, text };
+                }""",
+                {"apiUrl": api_url, "pageNum": page_num, "origin": base_url, "referer": base_url},
+            )
+        except Exception as e:
+            print(f"⚠️ Lỗi fetch API page {page_num}: {e}")
+            self.rate_limiter.record(api_url, error=True)
+            return 0, ""
+
+        status = result.get("status", 0)
+        html = result.get("text", "")
+        self.rate_limiter.record(api_url, status=status, started=started, captcha=is_captcha(html))
+        return status, html
+
+    def _merge_api_reviews(
+        self, reviews: List[Dict], all_reviews: List[Dict], seen_keys: set, limit: int, page_num: int
+    ) -> bool:
+        """Thêm review chưa có vào all_reviews
+
+        Returns:
+            True nếu nên dừng (không có review mới hoặc đã đủ limit)
+        """
+        added = 0
+        for r in reviews:
+            key = f"{r.get('reviewer','')}|{r.get('date','')}|{r.get('content','')}"
+            if key not in seen_keys:
+                seen_keys.add(key)
+                all_reviews.append(r)
+                added += 1
+                if len(all_reviews) >= limit:
+                    break
+
+        print(f"API page {page_num}: +{added}, tổng {len(all_reviews)}")
+        if added == 0:
+            print("⚠️ Không có review mới, dừng.")
+            return True
+        return len(all_reviews) >= limit
 
     async def crawl_reviews_api(self, base_url: str = "https://gaigu1.net", limit: int = 200, max_pages: int = 20) -> List[Dict]:
         """
@@ -98,48 +206,29 @@ class ReviewCrawler:
         all_reviews: List[Dict] = []
         seen_keys = set()
 
-        # Tạo một page để lấy cookie/session trước khi gọi fetch
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
+        # Mượn một page để lấy cookie/session trước khi gọi fetch
+        page = await self.pool.acquire(
             {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+                "User-Agent": DEFAULT_HEADERS["User-Agent"],
+                "Accept-Language": DEFAULT_HEADERS["Accept-Language"],
             }
         )
-        await page.goto(base_url, wait_until="domcontentloaded", timeout=45000)
 
         try:
+            await limited_goto(page, base_url, self.rate_limiter, wait_until="domcontentloaded", timeout=45000)
+
+            # Pipeline: parse trang N (trong worker pool) chạy song song với fetch trang N+1
+            parse_task: Optional[asyncio.Task] = None
+            parse_page_num = 0
+
             for page_num in range(1, max_pages + 1):
-                html = ""
-                status = 0
-                try:
-                    # Gọi qua fetch trong page để include cookie/clearance, credentials: include
-                    result = await page.evaluate(
-                        """async ({ apiUrl, pageNum, origin, referer }) => {
-                            const form = new URLSearchParams();
-                            form.set('page', pageNum.toString());
-                            form.set('p', pageNum.toString());
-                            const res = await fetch(apiUrl, {
-                                method: 'POST',
-                                credentials: 'include',
-                                headers: {
-                                    'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-                                    'X-Requested-With': 'XMLHttpRequest',
-                                    'Origin': origin,
-                                    'Referer': referer,
-                                    'Accept': '*/*',
-                                },
-                                body: form
-                            });
-                            const text = await res.text();
-                            return { status: res.status, text };
-                        }""",
-                        {"apiUrl": api_url, "pageNum": page_num, "origin": base_url, "referer": base_url},
-                    )
-                    status = result.get("status", 0)
-                    html = result.get("text", "")
-                except Exception as e:
-                    print(f"⚠️ Lỗi fetch API page {page_num}: {e}")
+                status, html = await self._fetch_api_page(page, api_url, page_num, base_url)
+
+                if parse_task:
+                    reviews = await parse_task
+                    parse_task = None
+                    if self._merge_api_reviews(reviews, all_reviews, seen_keys, limit, parse_page_num):
+                        break
 
                 if status == 403:
                     print(f"⚠️ API page {page_num} trả 403, dừng (có thể bị WAF/captcha).")
@@ -149,30 +238,18 @@ class ReviewCrawler:
                     print(f"⚠️ Trang API {page_num} không có dữ liệu, dừng.")
                     break
 
-                reviews = await self._extract_reviews_from_html(html)
-                added = 0
-                for r in reviews:
-                    key = f"{r.get('reviewer','')}|{r.get('date','')}|{r.get('content','')}"
-                    if key not in seen_keys:
-                        seen_keys.add(key)
-                        all_reviews.append(r)
-                        added += 1
-                        if len(all_reviews) >= limit:
-                            break
+                parse_task = asyncio.create_task(self._extract_reviews_from_html(html))
+                parse_page_num = page_num
 
-                print(f"API page {page_num}: +{added}, tổng {len(all_reviews)}")
-                if added == 0:
-                    print("⚠️ Không có review mới, dừng.")
-                    break
-                if len(all_reviews) >= limit:
-                    break
-
-                await asyncio.sleep(random.uniform(self.delay_min, self.delay_max))
+            # Trang cuối cùng đã fetch nhưng chưa merge
+            if parse_task:
+                reviews = await parse_task
+                self._merge_api_reviews(reviews, all_reviews, seen_keys, limit, parse_page_num)
 
             print(f"✅ API thu được {len(all_reviews)} review (target {limit})")
             return all_reviews
         finally:
-            await page.close()
+            await self.pool.release(page)
 
     async def crawl_reviews_page(self, url: str, limit: int = 200, max_scrolls: int = 60) -> List[Dict]:
         """
@@ -184,19 +261,12 @@ class ReviewCrawler:
             max_scrolls: Số lần scroll / click "xem thêm" tối đa
         """
         await self.init_browser()
-        page = await self.browser.new_page()
-        await page.set_extra_http_headers(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Referer": "https://gaigu1.net/",
-            }
-        )
+        page = await self.pool.acquire()
 
         try:
             print(f"🔍 Đang crawl: {url}")
-            await page.goto(url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)
+            await limited_goto(page, url, self.rate_limiter, wait_until="domcontentloaded", timeout=60000)
+            await wait_for_selector_or_fallback(page, REVIEW_CARD_SELECTOR, timeout=15000, fallback_ms=2000)
 
             all_reviews: List[Dict] = []
             seen_keys = set()
@@ -204,17 +274,19 @@ class ReviewCrawler:
 
             for i in range(max_scrolls):
                 # Scroll xuống cuối trang để load thêm review (nếu có)
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-                await page.wait_for_timeout(1500)
+                await scroll_and_wait(page, REVIEW_CARD_SELECTOR, timeout=1500)
 
                 # Thử click các nút "xem thêm" nếu tồn tại (ưu tiên #nf_show_more)
                 try:
                     load_more = page.locator('#nf_show_more')
                     if await load_more.count() > 0:
-                        await load_more.first.click(timeout=3000)
-                        await page.wait_for_timeout(7000)  # đợi lâu hơn theo yêu cầu
+                        # Đợi XHR load_newfeeds_review trả về (tối đa 7 giây như trước)
+                        await run_and_wait_for_response(
+                            page, "/ajax/", lambda: load_more.first.click(timeout=3000), timeout=7000, fallback_ms=0
+                        )
+                        await wait_for_count_stable(page, REVIEW_CARD_SELECTOR, timeout=3000)
                     else:
-                        await page.evaluate(
+                        clicked = await page.evaluate(
                             """
                             () => {
                               const selectors = [
@@ -229,13 +301,16 @@ class ReviewCrawler:
                                 if (btn && !btn.dataset._clicked) {
                                   btn.dataset._clicked = '1';
                                   btn.click();
-                                  break;
+                                  return true;
                                 }
                               }
+                              return false;
                             }
                             """
                         )
-                        await page.wait_for_timeout(7000)
+                        if clicked:
+                            # Không biết endpoint của nút này → đợi số review ngừng tăng (tối đa 7 giây)
+                            await wait_for_count_stable(page, REVIEW_CARD_SELECTOR, timeout=7000, stable_rounds=4)
                 except Exception:
                     pass
 
@@ -294,8 +369,8 @@ class ReviewCrawler:
                     break
                 last_count = len(all_reviews)
 
-                # Random delay nhỏ để tránh pattern bot
-                await asyncio.sleep(random.uniform(self.delay_min, self.delay_max))
+                # Vòng sau sẽ click "xem thêm" (gọi XHR) → đợi tới lượt theo rate limiter
+                await self.rate_limiter.acquire(url)
 
             print(f"✅ Thu được {len(all_reviews)} review (target {limit})")
             return all_reviews
@@ -303,7 +378,7 @@ class ReviewCrawler:
             print(f"❌ Lỗi crawl {url}: {e}")
             return []
         finally:
-            await page.close()
+            await self.pool.release(page)
 
     def save_to_json(self, reviews: List[Dict], filename: Optional[str] = None) -> str:
         if not filename:
@@ -328,6 +403,10 @@ async def main():
     limit = 200
     use_api = True
 
+    # --block-resources: chặn ảnh/font/video/tracker (bỏ khỏi tham số vị trí)
+    block_resources = '--block-resources' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--block-resources']
+
     if len(sys.argv) > 1:
         url = sys.argv[1]
     if len(sys.argv) > 2:
@@ -338,7 +417,7 @@ async def main():
     if len(sys.argv) > 3:
         use_api = sys.argv[3].lower() not in ["false", "0", "no"]
 
-    crawler = ReviewCrawler(max_concurrent=3, delay_min=1.0, delay_max=2.5)
+    crawler = ReviewCrawler(max_concurrent=3, delay_min=1.0, delay_max=2.5, block_resources=block_resources)
     try:
         if use_api:
             reviews = await crawler.crawl_reviews_api(base_url=url, limit=limit)
@@ -29,63 +29,70 @@ def slugify_email(name: str) -> str:
     return f"{base}@import.local"
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python reviews_to_sql.py path/to/reviews.json", file=sys.stderr)
-        sys.exit(1)
+USER_COLUMNS = ["id", "email", "password", "role", "fullName", "isActive", "createdAt", "updatedAt"]
+GIRL_COLUMNS = ["id", "name", "slug", "createdAt", "updatedAt"]
+REVIEW_COLUMNS = ["id", "customerId", "girlId", "title", "content", "rating", "images", "status", "createdAt", "updatedAt"]
 
-    path = sys.argv[1]
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
+def build_review_rows(data, now: str):
+    """Map reviews JSON → (user_row, girl_row, review_rows) theo USER/GIRL/REVIEW_COLUMNS (chưa escape)."""
     # One dummy user for all reviews (tên tiếng Việt)
     dummy_user_id = str(uuid.uuid4())
     dummy_user_email = "nhap.khau@import.local"
     dummy_user_name = "Người dùng nhập khẩu"
-    inserts_users = [
-        "INSERT INTO users (id, email, password, role, fullName, isActive, createdAt, updatedAt) "
-        f"VALUES ('{dummy_user_id}', '{dummy_user_email}', 'imported', 'CUSTOMER', "
-        f"'{dummy_user_name}', 1, '{now}', '{now}');"
-    ]
-    inserts_reviews = []
+    user_row = (dummy_user_id, dummy_user_email, "imported", "CUSTOMER", dummy_user_name, 1, now, now)
 
     # Dummy girl to satisfy NOT NULL / FK on girlId
     dummy_girl_id = str(uuid.uuid4())
     dummy_girl_name = "Gái gọi nhập khẩu"
     dummy_girl_slug = "gai-goi-nhap-khau"
-    inserts_girl = (
-        "INSERT INTO girls (id, name, slug, createdAt, updatedAt) "
-        f"VALUES ('{dummy_girl_id}', '{dummy_girl_name}', '{dummy_girl_slug}', '{now}', '{now}');"
-    )
+    girl_row = (dummy_girl_id, dummy_girl_name, dummy_girl_slug, now, now)
 
+    review_rows = []
     for item in data:
         user_id = dummy_user_id
         review_id = str(uuid.uuid4())
         title_raw = (item.get("content") or "Review")
         title = title_raw.split(".")[0][:100] or "Review"
-        title = title.replace("'", "''")
-        content = (item.get("content") or "").replace("'", "''")
+        content = item.get("content") or ""
         rating = int(item.get("rating") or 0) or 5
         images = json.dumps(item.get("images") or [], ensure_ascii=False)
-        esc_images = images.replace("'", "''")
 
-        inserts_reviews.append(
-            "INSERT INTO reviews (id, customerId, girlId, title, content, rating, images, status, createdAt, updatedAt) "
-            f"VALUES ('{review_id}', '{user_id}', '{dummy_girl_id}', '{title}', "
-            f"'{content}', {rating}, '{esc_images}', 'APPROVED', '{now}', '{now}');"
+        review_rows.append(
+            (review_id, user_id, dummy_girl_id, title, content, rating, images, "APPROVED", now, now)
         )
 
+    return user_row, girl_row, review_rows
+
+
+def insert_sql(table: str, columns, row) -> str:
+    values = ", ".join(
+        str(value) if isinstance(value, int) else "'" + str(value).replace("'", "''") + "'"
+        for value in row
+    )
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values});"
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python reviews_to_sql.py path/to/reviews.json", file=sys.stderr)
+        sys.exit(1)
+
+    path = sys.argv[1]
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    user_row, girl_row, review_rows = build_review_rows(data, now)
+
     print("-- Girl (dummy)")
-    print(inserts_girl)
+    print(insert_sql("girls", GIRL_COLUMNS, girl_row))
 
     print("\n-- Users (dummy)")
-    for sql in inserts_users:
-        print(sql)
+    print(insert_sql("users", USER_COLUMNS, user_row))
     print("\n-- Reviews")
-    for sql in inserts_reviews:
-        print(sql)
+    for row in review_rows:
+        print(insert_sql("reviews", REVIEW_COLUMNS, row))
 
 
 if __name__ == "__main__":
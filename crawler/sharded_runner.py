@@ -0,0 +1,346 @@
+"""
+Chạy crawl detail trên nhiều process (mỗi process 1 Chromium + 1 event loop riêng).
+
+Chia listing / danh sách URL thành K shard theo hash của URL (crc32, ổn định giữa các lần chạy),
+mỗi worker process có journal + file output riêng trong thư mục shard_<i>/.
+Xong thì gộp output và thống kê của các shard lại.
+
+Chạy lại với cùng --out-dir và cùng --workers sẽ resume theo journal của từng shard.
+
+Usage:
+    python sharded_runner.py girl data/listing_20251206.json --workers 8
+    python sharded_runner.py movie data/movies_listing.json --workers 6 --concurrent 2
+    python sharded_runner.py album data/album_links.txt --workers 4 --block-resources
+    python sharded_runner.py chat_sex data/chat_sex_links_20251206.json --workers 4
+
+Options:
+    --workers K         Số process (mặc định: số CPU)
+    --concurrent N      Số request đồng thời trong mỗi process (mặc định: 3)
+    --out-dir DIR       Thư mục chứa shard (mặc định: data/sharded_<crawler>_<timestamp>)
+    --save-individual   (girl/movie) Lưu thêm mỗi item 1 file riêng như main.py
+    --block-resources   Chặn ảnh/font/video/tracker
+    --browser-only      Tắt fast path HTTP (girl/album)
+
+Lưu ý: rate limiter là theo process, K process cùng host sẽ có tổng tốc độ ~K lần
+(mỗi process vẫn tự giảm tốc khi gặp 403/429/captcha).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, Iterator, List
+
+from jsonl_sink import JsonlSink, export_jsonl_to_json, iter_jsonl
+from listing_reader import iter_listing
+
+
+SUPPORTED_CRAWLERS = ("girl", "movie", "album", "chat_sex")
+
+SHARD_INPUT = "input.jsonl"
+SHARD_JOURNAL = "journal.sqlite"
+SHARD_OUTPUT = "output.jsonl"
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Shard của 1 URL (crc32 thay cho hash() vì hash() của str đổi theo từng process)"""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def _item_key(item) -> str:
+    if isinstance(item, str):
+        return item
+    return item.get("detailUrl") or item.get("url") or json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def iter_urls(filepath: str) -> Iterator[str]:
+    """Đọc danh sách URL: .txt (mỗi dòng 1 URL, # là comment), .json (array / {"urls": [...]}), .jsonl"""
+    if filepath.endswith(".txt"):
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        return
+
+    if filepath.endswith(".jsonl"):
+        records = iter_jsonl(filepath)
+    else:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        records = data.get("urls", []) if isinstance(data, dict) else data
+
+    for record in records:
+        url = record if isinstance(record, str) else (record.get("url") or record.get("detailUrl"))
+        if url:
+            yield url
+
+
+def split_input(crawler: str, input_file: str, out_dir: str, shards: int) -> List[int]:
+    """Ghi shard_<i>/input.jsonl (streaming, không load cả listing)
+
+    Returns:
+        Số item của từng shard
+    """
+    if crawler in ("girl", "movie"):
+        items = (item for _, item in iter_listing(input_file))
+    else:
+        items = iter_urls(input_file)
+
+    sinks = []
+    for shard in range(shards):
+        shard_input = os.path.join(out_dir, f"shard_{shard}", SHARD_INPUT)
+        # Chia lại từ đầu mỗi lần chạy (JsonlSink mở file ở chế độ append)
+        if os.path.exists(shard_input):
+            os.remove(shard_input)
+        sinks.append(JsonlSink(shard_input, batch_size=500, fsync_interval=60))
+
+    try:
+        for item in items:
+            sinks[shard_of(_item_key(item), shards)].write(item)
+    finally:
+        for sink in sinks:
+            sink.close()
+    return [sink.count for sink in sinks]
+
+
+def run_shard(crawler: str, shard_dir: str, options: Dict) -> Dict:
+    """Entry point của worker process"""
+    return asyncio.run(_run_shard(crawler, shard_dir, options))
+
+
+async def _run_shard(crawler: str, shard_dir: str, options: Dict) -> Dict:
+    input_file = os.path.join(shard_dir, SHARD_INPUT)
+    journal_file = os.path.join(shard_dir, SHARD_JOURNAL)
+    output_file = os.path.join(shard_dir, SHARD_OUTPUT)
+    stats = {"shard": os.path.basename(shard_dir), "pid": os.getpid()}
+
+    # Import trong worker: mỗi process tự khởi tạo Playwright / browser của mình
+    if crawler in ("girl", "movie"):
+        if crawler == "girl":
+            from main import GirlCrawler
+            instance = GirlCrawler(
+                max_concurrent=options["concurrent"],
+                block_resources=options["block_resources"],
+                use_http=options["use_http"],
+            )
+        else:
+            from movie_crawler import MovieCrawler
+            instance = MovieCrawler(
+                max_concurrent=options["concurrent"],
+                block_resources=options["block_resources"],
+            )
+        try:
+            result = await instance.crawl_details_from_listing_file(
+                input_file,
+                save_individual=options["save_individual"],
+                save_combined=True,
+                combined_jsonl=True,
+                journal_file=journal_file,
+                combined_path=output_file,
+            )
+        finally:
+            await instance.close_browser()
+        stats.update(result or {})
+        return stats
+
+    urls = list(iter_jsonl(input_file))
+
+    if crawler == "album":
+        from album_crawler import AlbumCrawler
+        instance = AlbumCrawler(
+            headless=True,
+            delay_min=0.5,
+            delay_max=1.0,
+            pool_size=options["concurrent"],
+            block_resources=options["block_resources"],
+            use_http=options["use_http"],
+        )
+        try:
+            results = await instance.crawl_multiple_albums(
+                urls,
+                output_folder=options["album_folder"],
+                max_concurrent=options["concurrent"],
+                journal_file=journal_file,
+            )
+        finally:
+            await instance.close_browser()
+        with JsonlSink(output_file) as sink:
+            for result in results:
+                sink.write(result)
+        success = [r for r in results if r.get("success")]
+        stats.update({
+            "total": len(results),
+            "success": len(success),
+            "failed": len(results) - len(success),
+            "images": sum(r.get("total_images", 0) for r in success),
+        })
+        return stats
+
+    # chat_sex: crawl_multiple chưa có journal → chạy hàng đợi ở đây, ghi journal + output ngay khi từng URL xong
+    from chat_sex_detail_crawler import ChatSexDetailCrawler
+    from crawl_journal import CrawlJournal
+    from work_queue import run_work_queue
+
+    journal = CrawlJournal(journal_file)
+    urls = [url for url in urls if journal.should_crawl(url)]
+    instance = ChatSexDetailCrawler(
+        headless=True,
+        pool_size=options["concurrent"],
+        block_resources=options["block_resources"],
+    )
+    counts = {"success": 0, "failed": 0}
+    sink = JsonlSink(output_file)
+
+    async def crawl(url):
+        journal.mark_started(url)
+        return await instance.crawl_chat_sex_detail(url)
+
+    def save_result(url, detail):
+        # detail["url"] có thể là URL sau redirect → journal luôn theo URL trong input
+        if isinstance(detail, Exception):
+            detail = {"url": url, "error": str(detail)}
+        if "error" in detail:
+            counts["failed"] += 1
+            journal.mark_failed(url, detail["error"])
+        else:
+            counts["success"] += 1
+            sink.write(detail)
+            sink.flush()
+            journal.mark_done(url, output_file)
+
+    try:
+        await run_work_queue(urls, crawl, workers=options["concurrent"], on_result=save_result)
+    finally:
+        await instance.close_browser()
+        sink.close()
+        journal.close()
+    stats.update({"total": counts["success"] + counts["failed"], **counts})
+    return stats
+
+
+def merge_outputs(out_dir: str, shards: int, merged_file: str) -> int:
+    """Gộp output.jsonl của các shard thành 1 file JSONL + export JSON array"""
+    if os.path.exists(merged_file):
+        os.remove(merged_file)
+    with JsonlSink(merged_file, batch_size=500) as sink:
+        for shard in range(shards):
+            shard_output = os.path.join(out_dir, f"shard_{shard}", SHARD_OUTPUT)
+            if os.path.exists(shard_output):
+                for record in iter_jsonl(shard_output):
+                    sink.write(record)
+        count = sink.count
+    export_jsonl_to_json(merged_file)
+    return count
+
+
+def run_sharded(crawler: str, input_file: str, workers: int, out_dir: str, options: Dict) -> Dict:
+    os.makedirs(out_dir, exist_ok=True)
+    counts = split_input(crawler, input_file, out_dir, workers)
+    print(f"🧩 Chia {sum(counts)} item thành {workers} shard: {counts}")
+
+    options = dict(options)
+    options.setdefault("album_folder", f"albums_{os.path.basename(os.path.normpath(out_dir))}")
+
+    shard_stats = []
+    # spawn: mỗi worker khởi tạo Playwright sạch, không kế thừa state của process cha
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        futures = [
+            executor.submit(run_shard, crawler, os.path.join(out_dir, f"shard_{shard}"), options)
+            for shard in range(workers)
+            if counts[shard]
+        ]
+        for future in futures:
+            try:
+                shard_stats.append(future.result())
+            except Exception as e:
+                print(f"❌ Shard lỗi: {e}")
+                shard_stats.append({"error": str(e)})
+
+    merged_file = os.path.join(out_dir, f"{crawler}_details_merged.jsonl")
+    merged = merge_outputs(out_dir, workers, merged_file)
+
+    summary = {
+        "crawler": crawler,
+        "input": input_file,
+        "workers": workers,
+        "total": sum(s.get("total", 0) for s in shard_stats),
+        "success": sum(s.get("success", 0) for s in shard_stats),
+        "failed": sum(s.get("failed", 0) for s in shard_stats),
+        "merged_records": merged,
+        "merged_file": merged_file,
+        "shards": shard_stats,
+        "finished_at": datetime.now().isoformat(),
+    }
+    if crawler == "album":
+        summary["images"] = sum(s.get("images", 0) for s in shard_stats)
+        summary["album_folder"] = options["album_folder"]
+
+    with open(os.path.join(out_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main():
+    argv = sys.argv[1:]
+    if len(argv) < 2 or argv[0] not in SUPPORTED_CRAWLERS:
+        print(__doc__)
+        sys.exit(1)
+
+    crawler, input_file = argv[0], argv[1]
+    if not os.path.exists(input_file):
+        print(f"❌ Không tìm thấy file: {input_file}")
+        sys.exit(1)
+
+    workers = os.cpu_count() or 1
+    concurrent = 3
+    out_dir = None
+    for i, arg in enumerate(argv):
+        if arg == "--workers" and i + 1 < len(argv):
+            workers = int(argv[i + 1])
+        elif arg == "--concurrent" and i + 1 < len(argv):
+            concurrent = int(argv[i + 1])
+        elif arg == "--out-dir" and i + 1 < len(argv):
+            out_dir = argv[i + 1]
+
+    if not out_dir:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_dir = os.path.join("data", f"sharded_{crawler}_{timestamp}")
+
+    options = {
+        "concurrent": concurrent,
+        "block_resources": "--block-resources" in argv,
+        "use_http": "--browser-only" not in argv,
+        "save_individual": "--save-individual" in argv,
+    }
+
+    print(f"{'='*60}")
+    print(f"🚀 SHARDED CRAWL: {crawler}")
+    print(f"   📁 Input: {input_file}")
+    print(f"   🧵 Process: {workers} x {concurrent} request đồng thời")
+    print(f"   📂 Output: {out_dir}")
+    print(f"{'='*60}\n")
+
+    summary = run_sharded(crawler, input_file, max(1, workers), out_dir, options)
+
+    print(f"\n{'='*60}")
+    print(f"✅ HOÀN THÀNH SHARDED CRAWL")
+    for stats in summary["shards"]:
+        if "error" in stats:
+            print(f"   ❌ {stats['error']}")
+        else:
+            print(f"   {stats['shard']}: {stats.get('success', 0)}/{stats.get('total', 0)} thành công")
+    print(f"   ✅ Thành công: {summary['success']}")
+    print(f"   ❌ Thất bại: {summary['failed']}")
+    if "images" in summary:
+        print(f"   📸 Tổng số ảnh: {summary['images']} (folder: data/{summary['album_folder']})")
+    print(f"   💾 Gộp: {summary['merged_records']} record → {summary['merged_file']}")
+    print(f"{'='*60}")
+
+
+if __name__ == "__main__":
+    main()
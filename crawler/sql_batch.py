@@ -0,0 +1,108 @@
+"""
+Gộp nhiều dòng vào 1 câu INSERT ... VALUES (...),(...) cho file SQL import.
+
+MySQL parse + execute từng câu INSERT riêng, nên dump vài trăm nghìn dòng 1-câu-1-dòng import rất chậm.
+Mỗi BatchedInsert là 1 luồng batch cho 1 bảng: gom tối đa batch_size dòng, nhưng câu lệnh không bao giờ
+vượt max_packet byte (max_allowed_packet của server, mặc định 4MB của MySQL 5.7 cho an toàn).
+
+File SQL được ghi dần (open_sql_output): header, từng dòng, footer đi thẳng xuống file có buffer
+hoặc gzip (.sql.gz), RAM không tăng theo số album / ảnh.
+
+Usage:
+    with open_sql_output("data/albums_insert.sql.gz") as f:
+        albums = BatchedInsert(lambda sql: write_lines(f, sql), "albums", ["id", "title"], batch_size=500)
+        albums.add([escape_sql_string(album_id), escape_sql_string(title)])
+        albums.flush()
+
+Import file .gz:  gunzip -c albums_insert.sql.gz | mysql -u root -p girl_pick_db
+"""
+
+import gzip
+import os
+from typing import Callable, List, Sequence, TextIO
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_PACKET = 4 * 1024 * 1024
+# Chừa chỗ cho header của packet / câu lệnh kèm theo
+PACKET_MARGIN = 1024
+# Buffer ghi file (byte)
+WRITE_BUFFER = 1 << 20
+
+
+def open_sql_output(path: str) -> TextIO:
+    """Mở file SQL để ghi dần: *.gz → gzip, còn lại → file text có buffer lớn"""
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER)
+
+
+def write_lines(f: TextIO, *lines: str):
+    """Ghi từng dòng (mỗi dòng kết thúc bằng \\n)"""
+    for line in lines:
+        f.write(line)
+        f.write("\n")
+
+
+class BatchedInsert:
+    def __init__(
+        self,
+        write: Callable[[str], None],
+        table: str,
+        columns: Sequence[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_packet: int = DEFAULT_MAX_PACKET,
+        suffix: str = "",
+    ):
+        """
+        Args:
+            write: Hàm nhận 1 câu SQL hoàn chỉnh (list.append, file.write...)
+            table: Tên bảng
+            columns: Tên cột (tự thêm backticks)
+            batch_size: Số dòng tối đa mỗi câu INSERT
+            max_packet: Giới hạn byte mỗi câu (max_allowed_packet của server)
+            suffix: Phần sau VALUES, ví dụ "ON DUPLICATE KEY UPDATE ..."
+        """
+        self.write = write
+        self.batch_size = max(1, batch_size)
+        self.max_packet = max_packet
+        self.header = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) VALUES\n"
+        self.footer = (f"\n{suffix}" if suffix else "") + ";"
+        self.table = table
+        self.rows: List[str] = []
+        self.size = 0
+        self.count = 0
+        self.statements = 0
+        self.oversized = 0
+
+    def _base_size(self) -> int:
+        return len(self.header.encode("utf-8")) + len(self.footer.encode("utf-8")) + PACKET_MARGIN
+
+    def add(self, values: Sequence[str]):
+        """Thêm 1 dòng (các giá trị đã escape sẵn: escape_sql_string, số, NULL)"""
+        row = "(" + ", ".join(values) + ")"
+        row_size = len(row.encode("utf-8")) + 2  # ",\n"
+
+        if self.rows and self._base_size() + self.size + row_size > self.max_packet:
+            self.flush()
+        if not self.rows and self._base_size() + row_size > self.max_packet:
+            # 1 dòng đã lớn hơn max_packet: vẫn ghi riêng, server cần tăng max_allowed_packet
+            self.oversized += 1
+            print(f"⚠️  {self.table}: 1 dòng {row_size} byte > max_packet {self.max_packet}")
+
+        self.rows.append(row)
+        self.size += row_size
+        self.count += 1
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.write(self.header + ",\n".join(self.rows) + self.footer)
+        self.statements += 1
+        self.rows = []
+        self.size = 0
@@ -0,0 +1,77 @@
+"""
+Hàng đợi producer/consumer có giới hạn cho các crawl detail.
+
+- Luôn có đúng `workers` worker đang chạy: xong item nào lấy ngay item kế tiếp,
+  không phải đợi item chậm nhất của batch như asyncio.gather theo batch
+- Producer chỉ đưa trước tối đa `window` item vào hàng đợi, không tạo 1 coroutine
+  cho mỗi item → bộ nhớ không tăng theo độ dài listing
+- Kết quả được đẩy ra `on_result` ngay khi từng item xong (ghi sink, đếm, ...)
+"""
+
+import asyncio
+import inspect
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+
+# Tín hiệu báo worker dừng
+_STOP = object()
+
+
+async def run_work_queue(
+    items: Union[Iterable, AsyncIterable],
+    handler: Callable[[Any], Awaitable[Any]],
+    workers: int = 3,
+    on_result: Optional[Callable[[Any, Any], Any]] = None,
+    window: Optional[int] = None,
+) -> int:
+    """Chạy handler(item) cho mọi item bằng `workers` worker
+
+    Args:
+        items: Iterable hoặc async iterable (có thể là generator đọc dần từ file)
+        handler: Coroutine xử lý 1 item
+        workers: Số worker chạy đồng thời
+        on_result: Gọi ngay khi 1 item xong: on_result(item, result).
+                   Nếu handler raise, result là Exception đó. Có thể là hàm async.
+        window: Số item tối đa chờ trong hàng đợi (mặc định 2 * workers)
+
+    Returns:
+        Số item đã xử lý
+    """
+    workers = max(1, workers)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=window or workers * 2)
+    processed = 0
+
+    async def producer():
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+        for _ in range(workers):
+            await queue.put(_STOP)
+
+    async def consumer():
+        nonlocal processed
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            try:
+                result = await handler(item)
+            except Exception as e:
+                result = e
+            if on_result:
+                callback = on_result(item, result)
+                if inspect.isawaitable(callback):
+                    await callback
+            processed += 1
+
+    tasks = [asyncio.create_task(producer())]
+    tasks += [asyncio.create_task(consumer()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return processed
@@ -0,0 +1,114 @@
+"""
+Tạo ảnh thu nhỏ (WebP/AVIF theo các chiều rộng cấu hình) khi migrate ảnh sang Bunny CDN
+
+Mỗi ảnh chỉ decode 1 lần: resize dần từ chiều rộng lớn nhất xuống nhỏ nhất rồi encode từng format.
+Việc decode / encode tốn CPU nên chạy trong process pool, các thread tải/upload chỉ chờ kết quả.
+
+Variant nằm cạnh ảnh gốc trên CDN:
+    images/ab/<sha256>.jpg  →  images/ab/<sha256>_w320.webp, images/ab/<sha256>_w640.avif, ...
+
+Cần cài thêm: pip install Pillow
+AVIF: Pillow build có libavif (>= 11.2) hoặc pip install pillow-avif-plugin. Không có thì chỉ tạo WebP.
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+try:
+    import pillow_avif  # noqa: F401 (đăng ký plugin AVIF cho Pillow cũ)
+except ImportError:
+    pass
+
+
+# ============================================
+# CẤU HÌNH
+# ============================================
+
+VARIANT_WIDTHS = tuple(int(w) for w in os.getenv('VARIANT_WIDTHS', '320,640').split(','))
+VARIANT_FORMATS = tuple(os.getenv('VARIANT_FORMATS', 'webp,avif').split(','))
+VARIANT_QUALITY = {'webp': 80, 'avif': 55}
+VARIANT_PROCESSES = int(os.getenv('VARIANT_PROCESSES', os.cpu_count() or 2))
+
+# Ảnh dùng cho thumbUrl (grid / listing): variant nhỏ nhất của format này
+THUMB_FORMAT = 'webp'
+
+# Content-Type khi upload variant lên Bunny (CDN trả lại đúng header này cho browser)
+CONTENT_TYPES = {'webp': 'image/webp', 'avif': 'image/avif'}
+
+
+def can_encode(fmt):
+    """Pillow hiện tại có encode được format này không (thường thiếu AVIF)"""
+    if fmt in features.get_supported_modules():
+        return features.check_module(fmt)
+    # Pillow cũ không có module 'avif' → xem plugin pillow-avif đã đăng ký encoder chưa
+    Image.init()
+    return fmt.upper() in Image.SAVE
+
+
+def supported_formats(formats=VARIANT_FORMATS):
+    """Bỏ các format không encode được"""
+    if not PIL_AVAILABLE:
+        return ()
+    return tuple(fmt for fmt in formats if can_encode(fmt))
+
+
+def variant_path(remote_path, width, fmt):
+    """images/ab/<sha256>.jpg → images/ab/<sha256>_w320.webp"""
+    base = os.path.splitext(remote_path)[0]
+    return f"{base}_w{width}.{fmt}"
+
+
+def render_variants(source, widths=VARIANT_WIDTHS, formats=VARIANT_FORMATS):
+    """Decode 1 lần, trả về [(width, format, bytes)] - chạy trong process con
+
+    Args:
+        source: bytes của ảnh hoặc đường dẫn file (ảnh lớn đã tràn ra đĩa)
+    """
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    image = ImageOps.exif_transpose(image)  # Ảnh chụp điện thoại hay bị xoay theo EXIF
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    variants = []
+    current = image
+    # Từ lớn tới nhỏ: mỗi lần resize từ bản vừa tạo, đỡ tốn CPU hơn resize từ ảnh gốc
+    for width in sorted(set(widths), reverse=True):
+        # Không phóng to: ảnh nhỏ hơn width chỉ tạo 1 bản ở kích thước gốc cho width nhỏ nhất
+        if width >= current.width:
+            if width != min(widths):
+                continue
+            resized = current
+        else:
+            height = max(1, round(current.height * width / current.width))
+            resized = current.resize((width, height), Image.LANCZOS)
+            current = resized
+        for fmt in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=VARIANT_QUALITY.get(fmt, 80))
+            variants.append((width, fmt, buffer.getvalue()))
+    return variants
+
+
+class VariantRenderer:
+    """Process pool render variant, dùng chung cho mọi thread / event loop"""
+
+    def __init__(self, processes=VARIANT_PROCESSES, widths=VARIANT_WIDTHS, formats=VARIANT_FORMATS):
+        self.widths = widths
+        self.formats = supported_formats(formats)
+        self._pool = ProcessPoolExecutor(max_workers=processes)
+
+    def render(self, body):
+        """body: bytes trong RAM hoặc Path file trên đĩa (truyền đường dẫn, không pickle cả ảnh)"""
+        source = body if isinstance(body, bytes) else str(body)
+        return self._pool.submit(render_variants, source, self.widths, self.formats).result()
+
+    def close(self):
+        self._pool.shutdown()
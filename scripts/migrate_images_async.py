@@ -0,0 +1,376 @@
+"""
+Engine asyncio cho migrate ảnh sang Bunny CDN
+
+Thay cho ThreadPoolExecutor(MAX_IMAGE_WORKERS) lồng trong MAX_GIRL_WORKERS thread của
+migrate_images_to_cdn.py (tối đa 50 thread, girl 3 ảnh bỏ phí 7 slot trong khi girl 40 ảnh xếp hàng):
+- 1 hàng đợi ảnh chung cho mọi girl, tốc độ không phụ thuộc ảnh phân bố theo girl ra sao
+- Giới hạn riêng số request tải (DOWNLOAD_CONCURRENCY) và upload (UPLOAD_CONCURRENCY)
+- Giới hạn số connection đồng thời tới mỗi host (MAX_PER_HOST)
+
+Dùng chung content index (dedup SHA-256), checkpoint ảnh lỗi (--resume-failed),
+spool RAM và batch UPDATE với bản threaded. Các phần đó đồng bộ (SQLite, ghi file JSON, đọc / ghi
+file ảnh trên đĩa) nên luôn được gọi qua asyncio.to_thread, event loop chỉ lo network.
+
+Cách dùng:
+1. Cài đặt thêm: pip install httpx
+2. Chạy script: python migrate_images_async.py
+3. Chạy lại chỉ các ảnh lỗi: python migrate_images_async.py --resume-failed
+4. Tạo thêm WebP/AVIF thu nhỏ: python migrate_images_async.py --variants
+   (--albums chỉ có ở migrate_images_to_cdn.py)
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import migrate_images_to_cdn as cdn
+from migrate_images_to_cdn import (
+    BUNNY_API_KEY,
+    BUNNY_CDN_URL,
+    BUNNY_STORAGE_HOST,
+    BUNNY_STORAGE_ZONE,
+    DOWNLOAD_DIR,
+    DOWNLOAD_HEADERS,
+    REQUEST_TIMEOUT,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRYABLE_STATUSES,
+    ImageSpool,
+    content_remote_path,
+    generate_unique_filename,
+    get_file_extension,
+    hash_local_file,
+    keep_for_retry,
+    lock,
+    log,
+    normalize_source_url,
+    stats,
+)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+
+# ============================================
+# CẤU HÌNH
+# ============================================
+
+DOWNLOAD_CONCURRENCY = int(os.getenv('MIGRATE_DOWNLOAD_CONCURRENCY', 32))  # Số ảnh đang tải cùng lúc
+UPLOAD_CONCURRENCY = int(os.getenv('MIGRATE_UPLOAD_CONCURRENCY', 16))      # Số ảnh đang upload cùng lúc
+MAX_PER_HOST = int(os.getenv('MIGRATE_MAX_PER_HOST', 16))                  # Connection đồng thời mỗi host
+WORKERS = DOWNLOAD_CONCURRENCY + UPLOAD_CONCURRENCY  # Đủ để 2 giai đoạn cùng chạy hết công suất
+QUEUE_SIZE = WORKERS * 2
+
+
+class StageLimits:
+    """Semaphore theo giai đoạn (tải / upload) và theo host"""
+
+    def __init__(self):
+        self.download = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        self.upload = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        self._hosts = {}
+
+    def host(self, url):
+        host = urlsplit(url).netloc
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(MAX_PER_HOST)
+            self._hosts[host] = semaphore
+        return semaphore
+
+
+class GirlState:
+    """Gom kết quả các ảnh của 1 girl, cập nhật DB khi ảnh cuối cùng xong"""
+
+    def __init__(self, girl, images):
+        self.id = girl['id']
+        self.images = images
+        self.new_urls = [None] * len(images)
+        self.remaining = len(images)
+        self.download_dir = DOWNLOAD_DIR / f"girl_{self.id}"
+
+    async def done(self, idx, result_url, db_updates):
+        self.new_urls[idx] = result_url
+        self.remaining -= 1
+        if self.remaining:
+            return
+
+        new_image_urls = [url for url in self.new_urls if url is not None]
+        if new_image_urls and new_image_urls != self.images:
+            # DbUpdateBuffer ghi MySQL đồng bộ → chạy ngoài event loop
+            await asyncio.to_thread(db_updates.add, self.id, json.dumps(new_image_urls))
+
+        with lock:
+            stats['processed_girls'] += 1
+            processed = stats['processed_girls']
+            total = stats['total_girls']
+        if processed % 10 == 0:
+            log(f"📊 Tiến độ: {processed}/{total} girls ({processed*100//total}%)")
+
+
+def is_retryable(error):
+    """Lỗi mạng / timeout / 5xx / 429 → retry; lỗi HTTP khác (404, 401...) → bỏ cuộc ngay"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+async def with_retry(stage, func, *args):
+    """Bản async của cdn.with_retry (exponential backoff, không chặn event loop)"""
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            return await func(*args)
+        except Exception as e:
+            if attempt >= RETRY_ATTEMPTS or not is_retryable(e):
+                raise
+            with lock:
+                stats[f'{stage}_retries'] += 1
+            await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.8, 1.2))
+
+
+async def download_image(client, limits, url, local_path):
+    """Tải ảnh vào spool RAM (tràn ra đĩa nếu quá lớn), tính SHA-256 trong lúc đọc"""
+    async with limits.download, limits.host(url):
+        async with client.stream('GET', url, headers=DOWNLOAD_HEADERS) as response:
+            response.raise_for_status()
+            spool = ImageSpool(local_path)
+            try:
+                async for chunk in response.aiter_bytes(65536):
+                    if spool.in_memory(chunk):
+                        spool.write(chunk)
+                    else:
+                        # Ảnh lớn đã tràn ra đĩa → ghi file trong thread
+                        await asyncio.to_thread(spool.write, chunk)
+            except Exception:
+                await asyncio.to_thread(spool.discard)
+                raise
+            return await asyncio.to_thread(spool.finish)
+
+
+async def file_chunks(path):
+    """Đọc dần file ảnh trên đĩa (đọc trong thread, không chặn event loop)"""
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, 65536)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def upload_image(client, limits, body, remote_path, size):
+    """PUT ảnh lên Bunny Storage (bytes trong RAM, hoặc đọc dần từ file trên đĩa)"""
+    upload_url = f"https://{BUNNY_STORAGE_HOST}/{BUNNY_STORAGE_ZONE}/{remote_path}"
+    headers = {
+        'AccessKey': BUNNY_API_KEY,
+        'Content-Type': 'application/octet-stream',
+        'Content-Length': str(size),
+    }
+    content = file_chunks(body) if isinstance(body, Path) else body
+    async with limits.upload, limits.host(upload_url):
+        response = await client.put(upload_url, headers=headers, content=content)
+    if response.status_code not in [200, 201]:
+        raise httpx.HTTPStatusError(
+            f"Bunny trả về HTTP {response.status_code}", request=response.request, response=response
+        )
+
+
+async def migrate_image(client, limits, state, idx, original_url):
+    """Giống cdn.migrate_image: tải (retry riêng) → dedup → upload (retry riêng)
+
+    Returns:
+        (url mới hoặc url gốc nếu lỗi, status, lỗi)
+    """
+    url = normalize_source_url(original_url)
+
+    local_path = state.download_dir / generate_unique_filename(state.id, idx, original_url)
+
+    # URL này đã migrate (ở girl khác / lần chạy trước) → dùng lại, không tải
+    cdn_path = await asyncio.to_thread(cdn.content_index.path_for_url, url)
+    if cdn_path:
+        if cdn.variant_renderer:
+            # Chưa có variants (migrate khi chưa bật --variants) → tải lại từ CDN để tạo bù
+            await asyncio.to_thread(cdn.upload_missing_variants, url, cdn_path, local_path)
+        with lock:
+            stats['deduplicated'] += 1
+        return f"{BUNNY_CDN_URL}/{cdn_path}", 'deduplicated', None
+
+    if await asyncio.to_thread(local_path.exists):
+        # Lần trước upload lỗi → ảnh đã nằm trên đĩa, không cần tải lại
+        body = local_path
+        content_hash, size = await asyncio.to_thread(hash_local_file, local_path)
+        with lock:
+            stats['resumed_from_disk'] += 1
+    else:
+        try:
+            body, content_hash, size = await with_retry('download', download_image, client, limits, url, local_path)
+            with lock:
+                stats['downloaded'] += 1
+        except Exception as e:
+            with lock:
+                stats['download_failed'] += 1
+            return original_url, 'download_failed', str(e)
+
+    # Cùng nội dung đã có trên CDN (URL khác) → không upload lại
+    cdn_path = await asyncio.to_thread(cdn.content_index.path_for_hash, content_hash)
+    if cdn_path:
+        await asyncio.to_thread(cdn.content_index.add_source, url, content_hash)
+        if cdn.variant_renderer and not await asyncio.to_thread(cdn.content_index.has_variants, content_hash):
+            await asyncio.to_thread(cdn.upload_variants, body, content_hash, cdn_path)
+        await asyncio.to_thread(local_path.unlink, missing_ok=True)
+        with lock:
+            stats['deduplicated'] += 1
+        return f"{BUNNY_CDN_URL}/{cdn_path}", 'deduplicated', None
+
+    remote_path = content_remote_path(content_hash, get_file_extension(url))
+    try:
+        await with_retry('upload', upload_image, client, limits, body, remote_path, size)
+    except Exception as e:
+        await asyncio.to_thread(keep_for_retry, body, local_path)
+        with lock:
+            stats['upload_failed'] += 1
+        return original_url, 'upload_failed', str(e)
+
+    await asyncio.to_thread(cdn.content_index.add_content, content_hash, remote_path, size, url)
+    if cdn.variant_renderer:
+        # Render chạy trong process pool, upload variant dùng requests → ra khỏi event loop
+        await asyncio.to_thread(cdn.upload_variants, body, content_hash, remote_path)
+    await asyncio.to_thread(local_path.unlink, missing_ok=True)
+    with lock:
+        stats['uploaded'] += 1
+    return f"{BUNNY_CDN_URL}/{remote_path}", 'success', None
+
+
+async def process_image(client, limits, state, idx, original_url):
+    """Xử lý 1 ảnh trong hàng đợi chung, trả về URL sẽ ghi vào DB"""
+    if not original_url or not isinstance(original_url, str):
+        return original_url
+
+    # Kiểm tra nếu đã là CDN URL thì bỏ qua
+    if BUNNY_CDN_URL in original_url:
+        with lock:
+            stats['skipped'] += 1
+        await asyncio.to_thread(cdn.progress.record, state.id, idx, original_url, 'already_cdn')
+        return original_url
+
+    result_url, status, error = await migrate_image(client, limits, state, idx, original_url)
+    # Checkpoint: ảnh lỗi vào PROGRESS_FILE, ảnh xong thì xóa khỏi danh sách lỗi
+    # (record định kỳ ghi lại cả file JSON → chạy trong thread)
+    await asyncio.to_thread(cdn.progress.record, state.id, idx, original_url, status, error)
+    return result_url
+
+
+def iter_images(girls):
+    """Trải phẳng ảnh của mọi girl thành (GirlState, idx, url)"""
+    for girl in girls:
+        try:
+            images = girl['images']
+            if isinstance(images, str):
+                images = json.loads(images)
+        except ValueError:
+            with lock:
+                stats['errors'] += 1
+            continue
+        if not images:
+            continue
+        state = GirlState(girl, images)
+        for idx, url in enumerate(images):
+            yield state, idx, url
+
+
+async def run_async_migration(resume_failed=False, variants=False):
+    """Chạy migration bằng asyncio với 1 hàng đợi ảnh chung"""
+    log("=" * 60)
+    log("BẮT ĐẦU MIGRATION ẢNH SANG BUNNY CDN (asyncio)")
+    log("=" * 60)
+
+    girls, db_updates = await asyncio.to_thread(cdn.prepare_migration, resume_failed, False, variants)
+    if not girls:
+        return
+
+    start_time = time.time()
+    log(f"🚀 Bắt đầu với {DOWNLOAD_CONCURRENCY} tải + {UPLOAD_CONCURRENCY} upload đồng thời, "
+        f"tối đa {MAX_PER_HOST} connection/host")
+
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    limits = StageLimits()
+    client_limits = httpx.Limits(max_connections=WORKERS, max_keepalive_connections=WORKERS)
+
+    async with httpx.AsyncClient(verify=False, timeout=REQUEST_TIMEOUT, limits=client_limits) as client:
+
+        async def producer():
+            for item in iter_images(girls):
+                await queue.put(item)
+            for _ in range(WORKERS):
+                await queue.put(None)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                state, idx, original_url = item
+                try:
+                    result_url = await process_image(client, limits, state, idx, original_url)
+                except Exception as e:
+                    log(f"Lỗi ảnh {idx} của girl {state.id}: {e}", "ERROR")
+                    with lock:
+                        stats['errors'] += 1
+                    result_url = original_url
+                await state.done(idx, result_url, db_updates)
+
+        await asyncio.gather(producer(), *[worker() for _ in range(WORKERS)])
+
+    # Ghi nốt batch UPDATE còn lại
+    await asyncio.to_thread(db_updates.flush)
+    await asyncio.to_thread(cdn.progress.save)
+
+    cdn.finish_migration(time.time() - start_time)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+if __name__ == "__main__":
+    if not HTTPX_AVAILABLE:
+        print("❌ Cần cài httpx: pip install httpx (hoặc dùng migrate_images_to_cdn.py)")
+        sys.exit(1)
+    if '--albums' in sys.argv:
+        print("❌ --albums chỉ hỗ trợ ở migrate_images_to_cdn.py")
+        sys.exit(1)
+
+    print(f"\n⚡ CẤU HÌNH TỐC ĐỘ (asyncio):")
+    print(f"   - Tải đồng thời: {DOWNLOAD_CONCURRENCY}")
+    print(f"   - Upload đồng thời: {UPLOAD_CONCURRENCY}")
+    print(f"   - Connection mỗi host: {MAX_PER_HOST}")
+
+    print(f"\n⚠️  LƯU Ý:")
+    print(f"   - Database: {cdn.DB_CONFIG['database']} ({cdn.DB_CONFIG['host']}:{cdn.DB_CONFIG['port']})")
+    print(f"   - Bunny Storage: {BUNNY_STORAGE_ZONE}")
+    print(f"   - CDN URL: {BUNNY_CDN_URL}")
+    if '--resume-failed' in sys.argv:
+        print(f"   - Chế độ: chỉ chạy lại ảnh lỗi trong {cdn.PROGRESS_FILE}")
+    if '--variants' in sys.argv:
+        print(f"   - Tạo variants WebP/AVIF (Pillow: {'có' if cdn.PIL_AVAILABLE else 'CHƯA CÀI'})")
+
+    confirm = input("\n❓ Bạn có muốn tiếp tục? (y/n): ").strip().lower()
+    if confirm != 'y':
+        print("❌ Đã hủy.")
+        sys.exit(0)
+
+    asyncio.run(run_async_migration(
+        resume_failed='--resume-failed' in sys.argv,
+        variants='--variants' in sys.argv,
+    ))
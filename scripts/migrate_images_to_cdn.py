@@ -5,26 +5,42 @@ Ngày: 2026-01-06
 
 VERSION 2.0 - Multi-threading cho tốc độ nhanh hơn!
 
+Dedup theo nội dung: ảnh lưu trên CDN theo SHA-256 của bytes (images/ab/<sha256>.jpg),
+index hash → CDN path nằm trong cdn_content_index.sqlite. Ảnh dùng chung giữa nhiều girl
+hoặc bị liệt kê dưới gaigu1/gaigu2/gaigu3 chỉ tải + upload 1 lần.
+
 Cách dùng:
 1. Cài đặt dependencies: pip install requests mysql-connector-python python-dotenv
 2. Tạo file .env với các biến môi trường
 3. Chạy script: python migrate_images_to_cdn.py
+4. Chạy lại chỉ các ảnh lỗi (theo migration_progress.json): python migrate_images_to_cdn.py --resume-failed
+
+Bản asyncio (1 hàng đợi ảnh chung, giới hạn riêng tải/upload và theo host): migrate_images_async.py
+
+Tùy chọn:
+    --variants   Tạo thêm WebP/AVIF thu nhỏ (image_variants.py, cần Pillow) cạnh ảnh gốc
+    --albums     Migrate bảng album_images: url → CDN, thumbUrl → variant nhỏ nhất
 """
 
 import os
 import sys
 import json
 import time
+import random
 import hashlib
+import sqlite3
 import requests
 from pathlib import Path
 from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import threading
 
+from image_variants import CONTENT_TYPES, PIL_AVAILABLE, THUMB_FORMAT, VariantRenderer, variant_path
+
 # Load environment variables
 load_dotenv()
 
@@ -55,12 +71,40 @@ BUNNY_CDN_URL = os.getenv('BUNNY_CDN_URL', 'https://girlpick.b-cdn.net')
 DOWNLOAD_DIR = Path('./downloaded_images')
 LOG_FILE = Path('./migration_log.json')
 PROGRESS_FILE = Path('./migration_progress.json')
+ALBUM_PROGRESS_FILE = Path('./album_migration_progress.json')  # Checkpoint riêng cho --albums
+# Index nội dung: SHA-256 của bytes ảnh → path trên CDN (ảnh giống nhau chỉ upload 1 lần)
+CONTENT_INDEX_FILE = Path('./cdn_content_index.sqlite')
+
+# Các hostname cũ của nguồn ảnh, đều trỏ về cùng 1 kho ảnh trên gaigu3.net
+SOURCE_HOST_ALIASES = ('gaigu1.net', 'gaigu2.net')
+SOURCE_HOST = 'gaigu3.net'
 
 # Threading - TĂNG SỐ WORKERS ĐỂ NHANH HƠN
 MAX_IMAGE_WORKERS = 10  # Số luồng xử lý ảnh đồng thời trong 1 girl
 MAX_GIRL_WORKERS = 5    # Số girls xử lý đồng thời
 REQUEST_TIMEOUT = 30
+# Keep-alive: đủ connection cho mọi thread ảnh cùng lúc (mỗi host)
+HTTP_POOL_SIZE = MAX_GIRL_WORKERS * MAX_IMAGE_WORKERS
+# MySQL: pool connection dùng chung + gom UPDATE thành câu nhiều dòng
+DB_POOL_SIZE = min(MAX_GIRL_WORKERS + 1, 32)  # mysql-connector giới hạn pool tối đa 32
+DB_UPDATE_BATCH_SIZE = 50
 RETRY_ATTEMPTS = 2      # Giảm retry để nhanh hơn
+RETRY_BASE_DELAY = 1.0  # Backoff: 1s, 2s, 4s... (±20% jitter)
+# Lỗi tạm thời mới retry; 404/403 của ảnh nguồn retry cũng vô ích
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+PROGRESS_SAVE_INTERVAL = 30  # Giây giữa 2 lần ghi PROGRESS_FILE
+
+# Streaming: ảnh tải về giữ trong RAM rồi PUT thẳng lên Bunny, không ghi DOWNLOAD_DIR.
+# Ảnh lớn hơn SPOOL_MAX_BYTES mới tràn ra đĩa; upload lỗi thì ghi ra đĩa để retry.
+# MIGRATE_STREAMING=0 → tải ra đĩa rồi upload như bản cũ.
+STREAMING = os.getenv('MIGRATE_STREAMING', '1') != '0'
+SPOOL_MAX_BYTES = int(os.getenv('MIGRATE_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'image/*',
+    'Referer': 'https://gaigu3.net/'
+}
 
 # Thread-safe counter
 lock = threading.Lock()
@@ -70,9 +114,17 @@ stats = {
     'downloaded': 0,
     'uploaded': 0,
     'skipped': 0,
+    'deduplicated': 0,
+    'resumed_from_disk': 0,
     'download_failed': 0,
     'upload_failed': 0,
+    'download_retries': 0,
+    'upload_retries': 0,
     'db_updated': 0,
+    'variants_uploaded': 0,
+    'variant_failed': 0,
+    'total_album_images': 0,
+    'processed_album_images': 0,
     'errors': 0,
 }
 
@@ -86,6 +138,171 @@ def log(message, level="INFO"):
     print(f"[{timestamp}] [{level}] {message}")
 
 
+# Adapter dùng chung (urllib3 pool thread-safe): mọi thread tái sử dụng connection keep-alive
+# tới gaigu3 / Bunny thay vì bắt tay TLS lại cho từng ảnh
+http_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+thread_local = threading.local()
+
+
+def get_session():
+    """requests.Session riêng cho mỗi thread, cùng chung pool connection"""
+    session = getattr(thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('https://', http_adapter)
+        session.mount('http://', http_adapter)
+        thread_local.session = session
+    return session
+
+
+class DbUpdateBuffer:
+    """Gom UPDATE của nhiều dòng, ghi 1 câu UPDATE ... CASE cho mỗi batch
+    
+    Mặc định: girls.images. Chế độ --albums: album_images.url + thumbUrl.
+    """
+
+    def __init__(self, pool, table='girls', columns=('images',), touch_updated_at=True, batch_size=DB_UPDATE_BATCH_SIZE):
+        self.pool = pool
+        self.table = table
+        self.columns = columns
+        self.touch_updated_at = touch_updated_at
+        self.batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, row_id, *values):
+        """values theo thứ tự của columns (JSON phải dump sẵn thành string)"""
+        with self._lock:
+            self._pending[row_id] = values
+            if len(self._pending) < self.batch_size:
+                return
+            batch = self._pending
+            self._pending = {}
+        self._write(batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = {}
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        ids = list(batch)
+        cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+        placeholders = ", ".join(["%s"] * len(ids))
+        assignments = [f"`{column}` = CASE id {cases} END" for column in self.columns]
+        if self.touch_updated_at:
+            assignments.append("updatedAt = NOW()")
+        params = []
+        for col_idx in range(len(self.columns)):
+            params += [value for row_id in ids for value in (row_id, batch[row_id][col_idx])]
+        params += ids
+        try:
+            connection = self.pool.get_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(
+                    f"UPDATE {self.table} SET {', '.join(assignments)} WHERE id IN ({placeholders})",
+                    params
+                )
+                connection.commit()
+                cursor.close()
+            finally:
+                connection.close()  # Trả connection về pool
+            with lock:
+                stats['db_updated'] += len(ids)
+        except Error as e:
+            log(f"Lỗi cập nhật DB cho {len(ids)} dòng {self.table}: {e}", "ERROR")
+            with lock:
+                stats['errors'] += 1
+
+
+def is_retryable(error):
+    """Lỗi mạng / timeout / 5xx / 429 → retry; lỗi HTTP khác (404, 401...) → bỏ cuộc ngay"""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+def with_retry(stage, func, *args):
+    """Chạy func(*args), retry tối đa RETRY_ATTEMPTS lần với exponential backoff
+    
+    stage ('download' / 'upload') chỉ dùng để đếm số lần retry của từng giai đoạn.
+    """
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt >= RETRY_ATTEMPTS or not is_retryable(e):
+                raise
+            with lock:
+                stats[f'{stage}_retries'] += 1
+            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.8, 1.2))
+
+
+class ProgressTracker:
+    """Checkpoint ảnh lỗi vào PROGRESS_FILE để --resume-failed chỉ chạy lại các ảnh đó
+    
+    Ảnh đã upload xong được checkpoint trong ContentIndex (URL nguồn → CDN path),
+    file này chỉ giữ ảnh lỗi: {girl_id: {idx: {url, stage, error, at}}}.
+    """
+
+    def __init__(self, path=PROGRESS_FILE):
+        self.path = path
+        self.failed = {}
+        self._lock = threading.Lock()
+        self._last_save = time.time()
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                self.failed = json.load(f).get('failed', {})
+
+    def failed_girl_ids(self):
+        with self._lock:
+            return [girl_id for girl_id, images in self.failed.items() if images]
+
+    def failed_count(self):
+        with self._lock:
+            return sum(len(images) for images in self.failed.values())
+
+    def record(self, girl_id, idx, url, status, error=None):
+        """Ghi kết quả 1 ảnh: lỗi thì lưu lại, thành công thì xóa khỏi danh sách lỗi"""
+        girl_key, idx_key = str(girl_id), str(idx)
+        with self._lock:
+            if status in ('download_failed', 'upload_failed'):
+                self.failed.setdefault(girl_key, {})[idx_key] = {
+                    'url': url,
+                    'stage': status.split('_')[0],
+                    'error': error,
+                    'at': time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+            elif girl_key in self.failed:
+                self.failed[girl_key].pop(idx_key, None)
+                if not self.failed[girl_key]:
+                    del self.failed[girl_key]
+            due = time.time() - self._last_save >= PROGRESS_SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            data = {
+                'updated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'failed_images': sum(len(images) for images in self.failed.values()),
+                'failed': self.failed,
+            }
+            # Ghi file tạm rồi đổi tên: dừng giữa chừng không làm hỏng checkpoint
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+            self._last_save = time.time()
+
+
+progress = None
+
+
 def get_file_extension(url):
     """Lấy extension từ URL"""
     parsed = urlparse(url)
@@ -103,6 +320,237 @@ def generate_unique_filename(girl_id, image_index, original_url):
     return f"girl_{girl_id}_{image_index:03d}_{url_hash}{ext}"
 
 
+def normalize_source_url(url):
+    """Đổi gaigu1/gaigu2 → gaigu3 (cùng 1 ảnh có thể được liệt kê dưới nhiều hostname)"""
+    for alias in SOURCE_HOST_ALIASES:
+        url = url.replace(alias, SOURCE_HOST)
+    return url
+
+
+def content_remote_path(content_hash, ext):
+    """Path trên CDN theo hash nội dung: images/ab/abcdef....jpg"""
+    return f"images/{content_hash[:2]}/{content_hash}{ext}"
+
+
+class ContentIndex:
+    """Index SQLite dùng chung giữa các thread:
+    - content: SHA-256 của bytes ảnh → path đã upload lên CDN
+    - sources: URL nguồn (đã chuẩn hóa) → SHA-256, để URL đã gặp không phải tải lại
+    """
+
+    def __init__(self, db_path=CONTENT_INDEX_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS content (
+                sha256 TEXT PRIMARY KEY,
+                cdn_path TEXT NOT NULL,
+                size INTEGER,
+                uploaded_at TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS variants (
+                sha256 TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                format TEXT NOT NULL,
+                cdn_path TEXT NOT NULL,
+                PRIMARY KEY (sha256, width, format)
+            )
+        """)
+        self._conn.commit()
+
+    def path_for_url(self, url):
+        """CDN path của URL nguồn đã migrate trước đó (None nếu chưa gặp)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT c.cdn_path FROM sources s JOIN content c ON c.sha256 = s.sha256 WHERE s.url = ?",
+                (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def hash_for_url(self, url):
+        """SHA-256 nội dung của URL nguồn đã migrate (None nếu chưa gặp)"""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM sources WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def path_for_hash(self, content_hash):
+        with self._lock:
+            row = self._conn.execute("SELECT cdn_path FROM content WHERE sha256 = ?", (content_hash,)).fetchone()
+        return row[0] if row else None
+
+    def add_source(self, url, content_hash):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sources (url, sha256) VALUES (?, ?)", (url, content_hash))
+            self._conn.commit()
+
+    def add_content(self, content_hash, cdn_path, size, url):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO content (sha256, cdn_path, size, uploaded_at) VALUES (?, ?, ?, ?)",
+                (content_hash, cdn_path, size, time.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            self._conn.execute("INSERT OR REPLACE INTO sources (url, sha256) VALUES (?, ?)", (url, content_hash))
+            self._conn.commit()
+
+    def has_variants(self, content_hash):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM variants WHERE sha256 = ? LIMIT 1", (content_hash,)).fetchone()
+        return row is not None
+
+    def add_variants(self, content_hash, variants):
+        """variants: [(width, format, cdn_path)]"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO variants (sha256, width, format, cdn_path) VALUES (?, ?, ?, ?)",
+                [(content_hash, width, fmt, path) for width, fmt, path in variants]
+            )
+            self._conn.commit()
+
+    def thumb_path_for_url(self, url):
+        """CDN path của variant nhỏ nhất (THUMB_FORMAT) của URL nguồn, None nếu chưa có"""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT v.cdn_path FROM sources s JOIN variants v ON v.sha256 = s.sha256
+                WHERE s.url = ? AND v.format = ? ORDER BY v.width LIMIT 1
+                """,
+                (url, THUMB_FORMAT)
+            ).fetchone()
+        return row[0] if row else None
+
+    def counts(self):
+        with self._lock:
+            contents = self._conn.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+            sources = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        return contents, sources
+
+    def close(self):
+        self._conn.close()
+
+
+content_index = None
+variant_renderer = None  # VariantRenderer khi chạy với --variants
+
+
+def download_image(url, local_path):
+    """Tải ảnh, tính SHA-256 trong lúc đọc
+    
+    STREAMING: giữ bytes trong RAM (tối đa SPOOL_MAX_BYTES), ảnh lớn hơn mới tràn ra đĩa.
+    Tắt STREAMING: luôn ghi ra đĩa như bản cũ.
+    
+    Returns:
+        (body, content_hash, size) - body là bytes, hoặc Path của file đã tải
+    """
+    with get_session().get(url, headers=DOWNLOAD_HEADERS, timeout=REQUEST_TIMEOUT, stream=True, verify=False) as response:
+        response.raise_for_status()
+        return read_image_body(response, local_path)
+
+
+class ImageSpool:
+    """Nhận từng chunk của ảnh: giữ trong RAM tới SPOOL_MAX_BYTES, lớn hơn thì tràn ra đĩa
+    
+    Ghi vào file .part rồi mới đổi tên: file tải dở không bị coi là ảnh hoàn chỉnh ở lần sau.
+    """
+
+    def __init__(self, local_path):
+        self.local_path = local_path
+        self.part_path = local_path.with_name(local_path.name + '.part')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.buffer = bytearray()
+        self.spill = None
+
+    def in_memory(self, chunk):
+        """True nếu write(chunk) chỉ ghi vào RAM (không mở / ghi file trên đĩa)"""
+        return self.spill is None and STREAMING and len(self.buffer) + len(chunk) <= SPOOL_MAX_BYTES
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        if self.spill is None and not self.in_memory(chunk):
+            self.part_path.parent.mkdir(parents=True, exist_ok=True)
+            self.spill = open(self.part_path, 'wb')
+            self.spill.write(self.buffer)
+            self.buffer = None
+        if self.spill is not None:
+            self.spill.write(chunk)
+        else:
+            self.buffer.extend(chunk)
+
+    def finish(self):
+        """Returns: (body, content_hash, size) - body là bytes hoặc Path"""
+        if self.spill is None:
+            return bytes(self.buffer), self.sha256.hexdigest(), self.size
+        self.spill.close()
+        self.part_path.replace(self.local_path)
+        return self.local_path, self.sha256.hexdigest(), self.size
+
+    def discard(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.part_path.unlink(missing_ok=True)
+
+
+def read_image_body(response, local_path):
+    """Đọc body response vào spool RAM / file trên đĩa (xem download_image)"""
+    spool = ImageSpool(local_path)
+    try:
+        for chunk in response.iter_content(chunk_size=65536):
+            spool.write(chunk)
+    except Exception:
+        spool.discard()
+        raise
+    return spool.finish()
+
+
+def hash_local_file(path):
+    """SHA-256 + kích thước của file ảnh đã có trên đĩa"""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def upload_image(body, remote_path, content_type='application/octet-stream'):
+    """PUT ảnh lên Bunny Storage (body là bytes trong RAM hoặc Path file trên đĩa)"""
+    upload_url = f"https://{BUNNY_STORAGE_HOST}/{BUNNY_STORAGE_ZONE}/{remote_path}"
+    headers = {
+        'AccessKey': BUNNY_API_KEY,
+        'Content-Type': content_type,
+    }
+    if isinstance(body, Path):
+        with open(body, 'rb') as f:
+            response = get_session().put(upload_url, headers=headers, data=f, timeout=REQUEST_TIMEOUT)
+    else:
+        response = get_session().put(upload_url, headers=headers, data=body, timeout=REQUEST_TIMEOUT)
+    if response.status_code not in [200, 201]:
+        raise requests.HTTPError(f"Bunny trả về HTTP {response.status_code}", response=response)
+
+
+def keep_for_retry(body, local_path):
+    """Upload lỗi: ghi bytes ra đĩa để lần chạy sau chỉ cần upload lại, không tải lại"""
+    if isinstance(body, Path):
+        return
+    try:
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(local_path, 'wb') as f:
+            f.write(body)
+    except OSError as e:
+        log(f"Không lưu được ảnh để retry {local_path}: {e}", "WARN")
+
+
 def download_and_upload_single_image(args):
     """Tải và upload 1 ảnh - chạy trong thread riêng"""
     idx, original_url, girl_id, girl_download_dir = args
@@ -114,70 +562,128 @@ def download_and_upload_single_image(args):
     if BUNNY_CDN_URL in original_url:
         with lock:
             stats['skipped'] += 1
+        if progress:
+            progress.record(girl_id, idx, original_url, 'already_cdn')
         return idx, original_url, 'already_cdn'
     
-    # Thay thế gaigu1/2 bằng gaigu3
-    url = original_url
-    if 'gaigu1.net' in url:
-        url = url.replace('gaigu1.net', 'gaigu3.net')
-    if 'gaigu2.net' in url:
-        url = url.replace('gaigu2.net', 'gaigu3.net')
+    idx, result_url, status, error = migrate_image(idx, original_url, girl_id, girl_download_dir)
+    # Checkpoint: ảnh lỗi vào PROGRESS_FILE, ảnh xong thì xóa khỏi danh sách lỗi
+    if progress:
+        progress.record(girl_id, idx, original_url, status, error)
+    return idx, result_url, status
+
+
+def migrate_image(idx, original_url, girl_id, girl_download_dir):
+    """Tải (retry riêng) → dedup → upload (retry riêng, dùng lại bytes đã tải)
+    
+    Returns:
+        (idx, url mới hoặc url gốc nếu lỗi, status, lỗi)
+    """
+    
+    # Chuẩn hóa gaigu1/2 → gaigu3 trước khi dedup
+    url = normalize_source_url(original_url)
     
-    # Tạo tên file
+    # File trên đĩa chỉ dùng khi ảnh quá lớn cho spool / để retry upload lỗi
     filename = generate_unique_filename(girl_id, idx, original_url)
     local_path = girl_download_dir / filename
-    remote_path = f"girls/{girl_id}/{filename}"
     
-    # Bước 1: Tải ảnh về
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'image/*',
-            'Referer': 'https://gaigu3.net/'
-        }
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True, verify=False)
-        response.raise_for_status()
-        
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        with lock:
-            stats['downloaded'] += 1
-            
-    except Exception as e:
+    # URL này đã migrate (ở girl khác / lần chạy trước) → dùng lại, không tải
+    cdn_path = content_index.path_for_url(url)
+    if cdn_path:
+        if variant_renderer:
+            upload_missing_variants(url, cdn_path, local_path)
         with lock:
-            stats['download_failed'] += 1
-        return idx, original_url, 'download_failed'
+            stats['deduplicated'] += 1
+        return idx, f"{BUNNY_CDN_URL}/{cdn_path}", 'deduplicated', None
     
-    # Bước 2: Upload lên Bunny CDN
-    try:
-        upload_url = f"https://{BUNNY_STORAGE_HOST}/{BUNNY_STORAGE_ZONE}/{remote_path}"
-        headers = {
-            'AccessKey': BUNNY_API_KEY,
-            'Content-Type': 'application/octet-stream',
-        }
-        
-        with open(local_path, 'rb') as f:
-            response = requests.put(upload_url, headers=headers, data=f, timeout=REQUEST_TIMEOUT)
-        
-        if response.status_code in [200, 201]:
-            cdn_url = f"{BUNNY_CDN_URL}/{remote_path}"
+    # Bước 1: Lấy bytes ảnh
+    if local_path.exists():
+        # Lần trước upload lỗi → ảnh đã nằm trên đĩa, không cần tải lại
+        body = local_path
+        content_hash, size = hash_local_file(local_path)
+        with lock:
+            stats['resumed_from_disk'] += 1
+    else:
+        try:
+            body, content_hash, size = with_retry('download', download_image, url, local_path)
             with lock:
-                stats['uploaded'] += 1
-            return idx, cdn_url, 'success'
-        else:
+                stats['downloaded'] += 1
+        except Exception as e:
             with lock:
-                stats['upload_failed'] += 1
-            return idx, original_url, 'upload_failed'
-            
+                stats['download_failed'] += 1
+            return idx, original_url, 'download_failed', str(e)
+    
+    # Cùng nội dung đã có trên CDN (URL khác) → không upload lại
+    cdn_path = content_index.path_for_hash(content_hash)
+    if cdn_path:
+        content_index.add_source(url, content_hash)
+        # Ảnh upload từ lần chạy không có --variants: đang có sẵn bytes thì tạo bù
+        if variant_renderer and not content_index.has_variants(content_hash):
+            upload_variants(body, content_hash, cdn_path)
+        local_path.unlink(missing_ok=True)
+        with lock:
+            stats['deduplicated'] += 1
+        return idx, f"{BUNNY_CDN_URL}/{cdn_path}", 'deduplicated', None
+    
+    remote_path = content_remote_path(content_hash, get_file_extension(url))
+    
+    # Bước 2: Upload lên Bunny CDN (thẳng từ RAM nếu ảnh nằm trong spool).
+    # Retry upload không tải lại ảnh.
+    try:
+        with_retry('upload', upload_image, body, remote_path)
     except Exception as e:
+        keep_for_retry(body, local_path)
         with lock:
             stats['upload_failed'] += 1
-        return idx, original_url, 'upload_failed'
+        return idx, original_url, 'upload_failed', str(e)
+    
+    content_index.add_content(content_hash, remote_path, size, url)
+    if variant_renderer:
+        upload_variants(body, content_hash, remote_path)
+    local_path.unlink(missing_ok=True)
+    with lock:
+        stats['uploaded'] += 1
+    return idx, f"{BUNNY_CDN_URL}/{remote_path}", 'success', None
+
+
+def upload_variants(body, content_hash, remote_path):
+    """Render WebP/AVIF trong process pool rồi upload cạnh ảnh gốc
+    
+    Lỗi ở bước này chỉ được đếm lại, ảnh gốc vẫn tính là đã migrate.
+    """
+    try:
+        uploaded = []
+        for width, fmt, data in variant_renderer.render(body):
+            path = variant_path(remote_path, width, fmt)
+            with_retry('upload', upload_image, data, path, CONTENT_TYPES[fmt])
+            uploaded.append((width, fmt, path))
+    except Exception as e:
+        log(f"Không tạo được variants cho {remote_path}: {e}", "WARN")
+        with lock:
+            stats['variant_failed'] += 1
+        return
+    content_index.add_variants(content_hash, uploaded)
+    with lock:
+        stats['variants_uploaded'] += len(uploaded)
+
+
+def upload_missing_variants(url, cdn_path, local_path):
+    """URL đã migrate ở lần chạy không có --variants: tải lại ảnh gốc từ CDN rồi tạo bù variants"""
+    content_hash = content_index.hash_for_url(url)
+    if not content_hash or content_index.has_variants(content_hash):
+        return
+    try:
+        body, _, _ = with_retry('download', download_image, f"{BUNNY_CDN_URL}/{cdn_path}", local_path)
+    except Exception as e:
+        log(f"Không tải lại được {cdn_path} từ CDN để tạo variants: {e}", "WARN")
+        with lock:
+            stats['variant_failed'] += 1
+        return
+    upload_variants(body, content_hash, cdn_path)
+    local_path.unlink(missing_ok=True)
 
 
-def process_single_girl(girl, db_config):
+def process_single_girl(girl, db_updates):
     """Xử lý migrate ảnh cho 1 girl - với multi-threading"""
     girl_id = girl['id']
     girl_name = girl['name'] or 'Unknown'
@@ -191,8 +697,8 @@ def process_single_girl(girl, db_config):
         if not images or len(images) == 0:
             return
         
+        # Thư mục chỉ được tạo khi thật sự cần ghi ảnh ra đĩa
         girl_download_dir = DOWNLOAD_DIR / f"girl_{girl_id}"
-        girl_download_dir.mkdir(parents=True, exist_ok=True)
         
         # Chuẩn bị args cho multi-threading
         args_list = [
@@ -213,20 +719,9 @@ def process_single_girl(girl, db_config):
         # Lọc bỏ None
         new_image_urls = [url for url in new_image_urls if url is not None]
         
-        # Cập nhật database
+        # Cập nhật database (gom theo batch, ghi khi đủ DB_UPDATE_BATCH_SIZE girls)
         if new_image_urls and new_image_urls != images:
-            connection = mysql.connector.connect(**db_config)
-            cursor = connection.cursor()
-            cursor.execute(
-                "UPDATE girls SET images = %s, updatedAt = NOW() WHERE id = %s",
-                (json.dumps(new_image_urls), girl_id)
-            )
-            connection.commit()
-            cursor.close()
-            connection.close()
-            
-            with lock:
-                stats['db_updated'] += 1
+            db_updates.add(girl_id, json.dumps(new_image_urls))
         
         with lock:
             stats['processed_girls'] += 1
@@ -242,52 +737,66 @@ def process_single_girl(girl, db_config):
             stats['errors'] += 1
 
 
-def run_migration():
-    """Chạy quá trình migration với multi-threading"""
+def process_album_image(row, db_updates):
+    """Migrate 1 dòng album_images: url → CDN, thumbUrl → variant nhỏ nhất (nếu có)"""
+    album_id = row['albumId']
+    try:
+        # Checkpoint theo (albumId, order) trong ALBUM_PROGRESS_FILE
+        _, new_url, status = download_and_upload_single_image(
+            (row['order'], row['url'], album_id, DOWNLOAD_DIR / f"album_{album_id}")
+        )
+        if status in ('success', 'deduplicated'):
+            thumb_path = content_index.thumb_path_for_url(normalize_source_url(row['url']))
+            thumb_url = f"{BUNNY_CDN_URL}/{thumb_path}" if thumb_path else new_url
+            db_updates.add(row['id'], new_url, thumb_url)
+        
+        with lock:
+            stats['processed_album_images'] += 1
+            processed = stats['processed_album_images']
+            total = stats['total_album_images']
+        if processed % 100 == 0:
+            log(f"📊 Tiến độ: {processed}/{total} ảnh album ({processed*100//total}%)")
+    except Exception as e:
+        with lock:
+            stats['errors'] += 1
+
+
+def run_migration(resume_failed=False, albums=False, variants=False):
+    """Chạy quá trình migration với multi-threading
+    
+    Args:
+        resume_failed: Chỉ chạy lại các girl có ảnh lỗi trong PROGRESS_FILE
+                       (girl đã có 1 phần ảnh trên CDN không còn khớp query mặc định)
+        albums: Migrate bảng album_images (ghi url + thumbUrl) thay cho girls.images
+        variants: Tạo + upload WebP/AVIF thu nhỏ cho mỗi ảnh mới
+    """
     log("=" * 60)
     log("BẮT ĐẦU MIGRATION ẢNH SANG BUNNY CDN (Multi-threaded)")
     log("=" * 60)
     
-    # Tạo thư mục download
-    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Kết nối database để lấy danh sách
-    connection = mysql.connector.connect(**DB_CONFIG)
-    if not connection.is_connected():
-        log("Không thể kết nối database. Dừng.", "ERROR")
+    rows, db_updates = prepare_migration(resume_failed, albums, variants)
+    if not rows:
         return
     
-    log(f"✅ Đã kết nối database: {DB_CONFIG['database']}")
-    
-    # Lấy danh sách girls - CHỈ LẤY NHỮNG GIRLS CHƯA MIGRATE
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT id, name, images 
-        FROM girls 
-        WHERE images IS NOT NULL 
-        AND images != '[]' 
-        AND JSON_LENGTH(images) > 0
-        AND images NOT LIKE '%girlpick.b-cdn.net%'
-        ORDER BY id
-    """)
-    girls = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    
-    stats['total_girls'] = len(girls)
-    log(f"📊 Tìm thấy {len(girls)} girls CẦN migrate (chưa có CDN URL)")
+    start_time = time.time()
     
-    if len(girls) == 0:
-        log("Không có dữ liệu để migrate.")
+    if albums:
+        # Mỗi dòng album_images là 1 ảnh → 1 pool ảnh chung
+        log(f"🚀 Bắt đầu với {MAX_GIRL_WORKERS * MAX_IMAGE_WORKERS} image workers")
+        with ThreadPoolExecutor(max_workers=MAX_GIRL_WORKERS * MAX_IMAGE_WORKERS) as executor:
+            for future in as_completed([executor.submit(process_album_image, row, db_updates) for row in rows]):
+                future.result()
+        db_updates.flush()
+        progress.save()
+        finish_migration(time.time() - start_time, albums=True)
         return
     
-    start_time = time.time()
-    
+    girls = rows
     # Xử lý SONG SONG nhiều girls cùng lúc
     log(f"🚀 Bắt đầu với {MAX_GIRL_WORKERS} girl workers x {MAX_IMAGE_WORKERS} image workers")
     
     with ThreadPoolExecutor(max_workers=MAX_GIRL_WORKERS) as executor:
-        futures = [executor.submit(process_single_girl, girl, DB_CONFIG) for girl in girls]
+        futures = [executor.submit(process_single_girl, girl, db_updates) for girl in girls]
         
         # Đợi tất cả hoàn thành
         for future in as_completed(futures):
@@ -296,29 +805,178 @@ def run_migration():
             except Exception as e:
                 log(f"Lỗi: {e}", "ERROR")
     
-    # Kết thúc
-    duration = time.time() - start_time
+    # Ghi nốt batch UPDATE còn lại
+    db_updates.flush()
+    progress.save()
+    
+    finish_migration(time.time() - start_time)
+
+
+def prepare_migration(resume_failed=False, albums=False, variants=False):
+    """Mở content index, checkpoint, pool MySQL và lấy danh sách girls (hoặc album_images) cần migrate
     
+    Returns:
+        (rows, db_updates) - rows rỗng nếu không có gì để chạy
+    """
+    global content_index, progress, variant_renderer
+    
+    # Tạo thư mục download
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    
+    content_index = ContentIndex(CONTENT_INDEX_FILE)
+    indexed_contents, indexed_sources = content_index.counts()
+    log(f"🗂️  Content index: {indexed_contents} ảnh trên CDN, {indexed_sources} URL nguồn ({CONTENT_INDEX_FILE})")
+    
+    progress_file = ALBUM_PROGRESS_FILE if albums else PROGRESS_FILE
+    progress = ProgressTracker(progress_file)
+    log(f"📌 Checkpoint: {progress.failed_count()} ảnh lỗi từ lần chạy trước ({progress_file})")
+    
+    if variants:
+        if PIL_AVAILABLE:
+            variant_renderer = VariantRenderer()
+            log(f"🖼️  Variants: {', '.join(variant_renderer.formats)} x {variant_renderer.widths}px")
+        else:
+            log("Chưa cài Pillow (pip install Pillow) → bỏ qua variants", "WARN")
+    
+    # Pool connection dùng chung cho SELECT ban đầu và các batch UPDATE
+    db_pool = pooling.MySQLConnectionPool(pool_name="migrate_images", pool_size=DB_POOL_SIZE, **DB_CONFIG)
+    if albums:
+        db_updates = DbUpdateBuffer(db_pool, table='album_images', columns=('url', 'thumbUrl'), touch_updated_at=False)
+    else:
+        db_updates = DbUpdateBuffer(db_pool)
+    
+    # Kết nối database để lấy danh sách
+    connection = db_pool.get_connection()
+    if not connection.is_connected():
+        log("Không thể kết nối database. Dừng.", "ERROR")
+        content_index.close()
+        return [], db_updates
+    
+    log(f"✅ Đã kết nối database: {DB_CONFIG['database']}")
+    
+    if albums:
+        rows = load_album_images(connection, resume_failed)
+        connection.close()
+        stats['total_album_images'] = len(rows)
+        log(f"📊 Tìm thấy {len(rows)} ảnh album CẦN migrate")
+        if not rows:
+            log("Không có dữ liệu để migrate.")
+            content_index.close()
+        return rows, db_updates
+    
+    girls = load_girls(connection, resume_failed)
+    connection.close()
+    
+    stats['total_girls'] = len(girls)
+    if resume_failed:
+        log(f"📊 Tìm thấy {len(girls)} girls có ảnh lỗi cần chạy lại")
+    else:
+        log(f"📊 Tìm thấy {len(girls)} girls CẦN migrate (chưa có CDN URL)")
+    
+    if len(girls) == 0:
+        log("Không có dữ liệu để migrate.")
+        content_index.close()
+    return girls, db_updates
+
+
+def load_girls(connection, resume_failed=False):
+    """Danh sách girls cần migrate (resume_failed: chỉ girls có ảnh lỗi trong PROGRESS_FILE)"""
+    cursor = connection.cursor(dictionary=True)
+    if resume_failed:
+        # Chỉ lấy girls có ảnh lỗi; ảnh đã lên CDN của các girl này sẽ được bỏ qua (already_cdn)
+        girl_ids = progress.failed_girl_ids()
+        girls = []
+        for start in range(0, len(girl_ids), 1000):
+            chunk = girl_ids[start:start + 1000]
+            cursor.execute(
+                f"SELECT id, name, images FROM girls WHERE id IN ({', '.join(['%s'] * len(chunk))}) ORDER BY id",
+                chunk
+            )
+            girls.extend(cursor.fetchall())
+    else:
+        # Lấy danh sách girls - CHỈ LẤY NHỮNG GIRLS CHƯA MIGRATE
+        cursor.execute("""
+            SELECT id, name, images 
+            FROM girls 
+            WHERE images IS NOT NULL 
+            AND images != '[]' 
+            AND JSON_LENGTH(images) > 0
+            AND images NOT LIKE '%girlpick.b-cdn.net%'
+            ORDER BY id
+        """)
+        girls = cursor.fetchall()
+    cursor.close()
+    return girls
+
+
+def load_album_images(connection, resume_failed=False):
+    """Các dòng album_images chưa lên CDN (resume_failed: chỉ album có ảnh lỗi trong ALBUM_PROGRESS_FILE)"""
+    cursor = connection.cursor(dictionary=True)
+    rows = []
+    if resume_failed:
+        album_ids = progress.failed_girl_ids()
+        for start in range(0, len(album_ids), 1000):
+            chunk = album_ids[start:start + 1000]
+            cursor.execute(
+                f"""
+                SELECT id, albumId, url, `order` FROM album_images
+                WHERE albumId IN ({', '.join(['%s'] * len(chunk))}) AND url NOT LIKE '%girlpick.b-cdn.net%'
+                ORDER BY albumId, `order`
+                """,
+                chunk
+            )
+            rows.extend(cursor.fetchall())
+    else:
+        cursor.execute("""
+            SELECT id, albumId, url, `order`
+            FROM album_images
+            WHERE url IS NOT NULL
+            AND url NOT LIKE '%girlpick.b-cdn.net%'
+            ORDER BY albumId, `order`
+        """)
+        rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def finish_migration(duration, albums=False):
+    """Lưu LOG_FILE, đóng content index / process pool và in kết quả"""
     # Lưu log
     stats['duration'] = duration
     with open(LOG_FILE, 'w', encoding='utf-8') as f:
         json.dump(stats, f, indent=2, ensure_ascii=False)
+    content_index.close()
+    if variant_renderer:
+        variant_renderer.close()
     
     # In kết quả
     log("\n" + "=" * 60)
     log("KẾT QUẢ MIGRATION")
     log("=" * 60)
-    log(f"📊 Tổng số girls: {stats['total_girls']}")
-    log(f"✅ Đã xử lý: {stats['processed_girls']} girls")
+    if albums:
+        log(f"📊 Tổng số ảnh album: {stats['total_album_images']}")
+        log(f"✅ Đã xử lý: {stats['processed_album_images']} ảnh album")
+    else:
+        log(f"📊 Tổng số girls: {stats['total_girls']}")
+        log(f"✅ Đã xử lý: {stats['processed_girls']} girls")
     log(f"⬇️  Đã tải: {stats['downloaded']} ảnh")
     log(f"⬆️  Đã upload: {stats['uploaded']} ảnh")
     log(f"⏭️  Bỏ qua (đã có CDN): {stats['skipped']} ảnh")
+    log(f"♻️  Dùng lại ảnh trùng: {stats['deduplicated']} ảnh")
+    log(f"💽 Upload lại từ đĩa: {stats['resumed_from_disk']} ảnh")
     log(f"❌ Tải thất bại: {stats['download_failed']} ảnh")
     log(f"❌ Upload thất bại: {stats['upload_failed']} ảnh")
-    log(f"📝 DB cập nhật: {stats['db_updated']} girls")
+    log(f"🔁 Retry: {stats['download_retries']} lần tải, {stats['upload_retries']} lần upload")
+    log(f"📝 DB cập nhật: {stats['db_updated']} {'ảnh album' if albums else 'girls'}")
+    if variant_renderer:
+        log(f"🖼️  Variants: {stats['variants_uploaded']} file, {stats['variant_failed']} ảnh lỗi")
     log(f"⚠️  Lỗi: {stats['errors']}")
     log(f"⏱️  Thời gian: {duration:.1f} giây")
     log(f"⚡ Tốc độ: {stats['uploaded'] / max(duration, 1):.1f} ảnh/giây")
+    failed_images = progress.failed_count()
+    if failed_images:
+        resume_command = "python migrate_images_to_cdn.py --resume-failed" + (" --albums" if albums else "")
+        log(f"📌 Còn {failed_images} ảnh lỗi → chạy lại: {resume_command}")
     log("=" * 60)
 
 
@@ -344,15 +1002,26 @@ if __name__ == "__main__":
     print(f"   - Girl workers: {MAX_GIRL_WORKERS}")
     print(f"   - Image workers: {MAX_IMAGE_WORKERS}")
     print(f"   - Tổng threads: {MAX_GIRL_WORKERS * MAX_IMAGE_WORKERS}")
+    print(f"   - Streaming: {'bật' if STREAMING else 'tắt'} (spool tối đa {SPOOL_MAX_BYTES // 1024} KB/ảnh)")
     
     print(f"\n⚠️  LƯU Ý:")
     print(f"   - Database: {DB_CONFIG['database']} ({DB_CONFIG['host']}:{DB_CONFIG['port']})")
     print(f"   - Bunny Storage: {BUNNY_STORAGE_ZONE}")
     print(f"   - CDN URL: {BUNNY_CDN_URL}")
+    if '--albums' in sys.argv:
+        print(f"   - Bảng: album_images (url + thumbUrl)")
+    if '--variants' in sys.argv:
+        print(f"   - Tạo variants WebP/AVIF (Pillow: {'có' if PIL_AVAILABLE else 'CHƯA CÀI'})")
+    if '--resume-failed' in sys.argv:
+        print(f"   - Chế độ: chỉ chạy lại ảnh lỗi trong {ALBUM_PROGRESS_FILE if '--albums' in sys.argv else PROGRESS_FILE}")
     
     confirm = input("\n❓ Bạn có muốn tiếp tục? (y/n): ").strip().lower()
     if confirm != 'y':
         print("❌ Đã hủy.")
         sys.exit(0)
     
-    run_migration()
+    run_migration(
+        resume_failed='--resume-failed' in sys.argv,
+        albums='--albums' in sys.argv,
+        variants='--variants' in sys.argv,
+    )